@@ -1,4 +1,25 @@
 """
 Klout API
 """
-from .api import Klout, KloutError, KloutHTTPError
+from .api import (Klout, KloutError, KloutHTTPError, KloutRateLimitError,
+                  KloutCircuitOpenError)
+from .breaker import CircuitBreaker
+from .cache import LRUCache, DiskCache
+from .concurrency import AdaptiveConcurrency
+from .conditional import ValidatorCache
+from .hedge import Hedge
+from .hooks import Hooks, MetricsCollector
+from .identity import IdentityMap
+from .keys import KeyPool
+from .pool import ConnectionPool
+from .ratelimit import RateLimiter
+from .retry import Retry
+from .singleflight import SingleFlight
+from .timeout import Timeout
+from .transport import UrllibTransport
+
+try:
+    from .aio import AsyncKlout, AsyncConnectionPool, AsyncSingleFlight
+except (ImportError, SyntaxError):
+    # asyncio support requires Python >= 3.5
+    pass
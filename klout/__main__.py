@@ -0,0 +1,8 @@
+"""
+Runs the `klout` command line bulk runner, see `klout.cli`
+"""
+import sys
+
+from .cli import main
+
+sys.exit(main())
@@ -0,0 +1,682 @@
+# -*- coding: utf-8 -*-
+
+"""
+asyncio flavour of the Klout API interface. Requires Python >= 3.6.
+
+`AsyncKlout` keeps the attribute chaining of `Klout`, calls simply
+have to be awaited::
+
+    import asyncio
+    from klout import AsyncKlout
+
+    async def main():
+        async with AsyncKlout('YOUR_KEY_HERE', concurrency=20) as k:
+            kloutId = (await k.identity.klout(screenName="erfaan")).get('id')
+            score = (await k.user.score(kloutId=kloutId)).get('score')
+
+    asyncio.get_event_loop().run_until_complete(main())
+
+All calls made through an `AsyncKlout` object share one
+`AsyncConnectionPool`, which never has more than `concurrency` requests
+in flight to api.klout.com.
+"""
+
+import asyncio
+import http.client
+import io
+import socket
+import sys
+import time
+import urllib.error as urllib_error
+import urllib.parse as urllib_parse
+
+from .api import (Klout, KloutCall, KloutError, KloutHTTPError,
+                  KloutRateLimitError, _DEFAULT, _keys_exhausted)
+from .breaker import CircuitBreaker
+from .cache import LRUCache
+from .concurrency import AdaptiveConcurrency
+from .conditional import ValidatorCache
+from .hedge import Hedge
+from .identity import IdentityMap
+from .keys import KeyPool
+from .retry import Retry
+from .pool import PooledResponse
+from .timeout import start_timer
+
+
+class AsyncConnectionPool(object):
+    """
+    Pool of persistent HTTP/1.1 connections built on asyncio streams.
+
+    `maxsize` bounds the number of concurrent requests (and so the
+    number of open connections) per host. Idle connections older than
+    `idle_timeout` seconds are closed instead of being reused.
+    """
+
+    def __init__(self, maxsize=10, idle_timeout=60):
+        self.maxsize = maxsize
+        self.idle_timeout = idle_timeout
+        self._idle = {}
+        self._semaphores = {}
+        self._stats = {'requests': 0, 'created': 0,
+                       'reused': 0, 'discarded': 0}
+
+    def stats(self):
+        """
+        Returns a dict of counters describing pool usage, see
+        `ConnectionPool.stats`.
+        """
+        stats = dict(self._stats)
+        stats['idle'] = sum(len(conns) for conns in self._idle.values())
+        return stats
+
+    async def close(self):
+        """
+        Closes all idle connections.
+        """
+        for conns in self._idle.values():
+            while conns:
+                _, writer, _ = conns.pop()
+                self._discard(writer)
+
+    def _discard(self, writer):
+        writer.close()
+        self._stats['discarded'] += 1
+
+    async def _acquire(self, host_key, timer):
+        idle = self._idle.setdefault(host_key, [])
+        now = time.time()
+        while idle:
+            reader, writer, last_used = idle.pop()
+            if now - last_used < self.idle_timeout and \
+                    not reader.at_eof():
+                self._stats['reused'] += 1
+                return reader, writer, True
+            self._discard(writer)
+
+        scheme, host, port = host_key
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(host, port, ssl=(scheme == 'https')),
+            timer.connect_timeout())
+        timer.mark('connect')
+        self._stats['created'] += 1
+        return reader, writer, False
+
+    async def urlopen(self, url, headers, timeout=None):
+        """
+        GETs `url` on a pooled connection.
+
+        `timeout` is a number of seconds, a `Timeout` or the
+        `TimeoutTimer` of a running call. The read timeout bounds the
+        time taken by the whole response once the request is sent.
+
+        Behaves like `ConnectionPool.urlopen`: raises `HTTPError` on HTTP
+        error statuses and `URLError` when the server can not be reached.
+        """
+        parsed = urllib_parse.urlparse(url)
+        port = parsed.port or (443 if parsed.scheme == 'https' else 80)
+        host_key = (parsed.scheme, parsed.hostname, port)
+        selector = parsed.path
+        if parsed.query:
+            selector += '?' + parsed.query
+
+        lines = ['GET %s HTTP/1.1' % selector, 'Host: %s' % parsed.netloc,
+                 'Connection: keep-alive']
+        lines.extend('%s: %s' % item for item in headers.items())
+        request = ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+
+        semaphore = self._semaphores.get(host_key)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.maxsize)
+            self._semaphores[host_key] = semaphore
+
+        timer = start_timer(timeout)
+        self._stats['requests'] += 1
+        async with semaphore:
+            timer.mark('wait')
+            while True:
+                try:
+                    reader, writer, reused = await self._acquire(host_key,
+                                                                 timer)
+                except asyncio.TimeoutError:
+                    raise urllib_error.URLError(socket.timeout('timed out'))
+                except OSError:
+                    raise urllib_error.URLError(sys.exc_info()[1])
+                try:
+                    writer.write(request)
+                    code, msg, response_headers, body, will_close = \
+                        await asyncio.wait_for(
+                            self._read_response(reader, timer),
+                            timer.read_timeout())
+                except (OSError, EOFError, ValueError,
+                        asyncio.IncompleteReadError, asyncio.TimeoutError):
+                    _, error, _ = sys.exc_info()
+                    self._discard(writer)
+                    if isinstance(error, asyncio.TimeoutError):
+                        error = socket.timeout('timed out')
+                    elif reused and not isinstance(error, socket.timeout):
+                        # The server closed an idle keep-alive connection,
+                        # try again on a fresh one.
+                        continue
+                    raise urllib_error.URLError(error)
+                except BaseException:
+                    # Cancelled or timed out half way through a response,
+                    # the connection can not be reused.
+                    self._discard(writer)
+                    raise
+                break
+
+            if will_close:
+                self._discard(writer)
+            else:
+                self._idle.setdefault(host_key, []).append(
+                    (reader, writer, time.time()))
+
+        result = PooledResponse(url, code, msg, response_headers, body)
+        if code >= 400:
+            raise urllib_error.HTTPError(url, code, msg, response_headers,
+                                         result)
+        return result
+
+    @staticmethod
+    async def _read_response(reader, timer):
+        """
+        Returns `(code, msg, headers, body, will_close)`
+        """
+        status_line = await reader.readline()
+        if not status_line:
+            raise EOFError('Connection closed by server')
+        version, code, msg = (status_line.decode('latin-1').rstrip('\r\n')
+                              .split(' ', 2) + [''])[:3]
+        code = int(code)
+
+        raw_headers = []
+        while True:
+            line = await reader.readline()
+            raw_headers.append(line)
+            if line in (b'\r\n', b'\n', b''):
+                break
+        headers = http.client.parse_headers(io.BytesIO(b''.join(raw_headers)))
+        timer.mark('ttfb')
+
+        will_close = version == 'HTTP/1.0' or \
+            headers.get('Connection', '').lower() == 'close'
+
+        if code < 200 or code in (204, 304):
+            # No body, whatever the headers say (RFC 7230, section 3.3.3)
+            body = b''
+        elif headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b';')[0], 16)
+                if not size:
+                    # Skip trailers
+                    while (await reader.readline()) not in (b'\r\n', b''):
+                        pass
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+            body = b''.join(chunks)
+        elif headers.get('Content-Length') is not None:
+            body = await reader.readexactly(int(headers['Content-Length']))
+        else:
+            body = await reader.read()
+            will_close = True
+        timer.mark('download')
+
+        return code, msg, headers, body, will_close
+
+
+class AsyncSingleFlight(object):
+    """
+    asyncio version of `SingleFlight`: concurrent identical calls share a
+    single request.
+    """
+
+    def __init__(self):
+        self._flights = {}
+        self._stats = {'calls': 0, 'coalesced': 0}
+
+    async def do(self, key, func, timeout=None):
+        """
+        Awaits `func()`, unless a call with the same `key` is already in
+        progress in which case its result is shared.
+
+        Calls waiting for another one raise `asyncio.TimeoutError` after
+        `timeout` seconds. Cancelling a call doesn't cancel the request
+        other calls are waiting for.
+        """
+        self._stats['calls'] += 1
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = asyncio.ensure_future(func())
+            self._flights[key] = flight
+            flight.add_done_callback(
+                lambda _: self._flights.pop(key, None))
+        else:
+            self._stats['coalesced'] += 1
+        return await asyncio.wait_for(asyncio.shield(flight), timeout)
+
+    def stats(self):
+        """
+        Returns a dict of `calls` made and `coalesced` calls, see
+        `SingleFlight.stats`
+        """
+        return dict(self._stats)
+
+
+def _wake(waiter):
+    """
+    Resolves the future `waiter` unless it was cancelled
+    """
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+class AsyncKloutCall(KloutCall):
+    """
+    Klout interface base class for asyncio. Calling an object returns a
+    coroutine.
+    """
+    __slots__ = ()
+
+    async def __call__(self, **kwargs):
+        timer = start_timer(kwargs.pop('timeout', self.timeout))
+        stream = kwargs.pop('stream', None)
+        uri, uri_base, cache_key = self._build_uri(kwargs)
+
+        store = None
+        if not stream:
+            store = self._store()
+        if store is not None:
+            res = store.get(cache_key)
+            if res is not None:
+                return res
+
+        validated = None
+        if self.validators is not None and not stream:
+            validated = self.validators.lookup(cache_key)
+
+        if self.singleflight is None or stream:
+            res = await self._request(uri_base, uri, timer, stream,
+                                      validated)
+        else:
+            try:
+                res = await self.singleflight.do(
+                    cache_key,
+                    lambda: self._request(uri_base, uri, timer, stream,
+                                          validated),
+                    timer.remaining())
+            except asyncio.TimeoutError:
+                raise KloutHTTPError(
+                    urllib_error.URLError(socket.timeout('timed out')), uri)
+
+        if store is not None:
+            store.set(cache_key, res, (self._template or
+                                       self._uri_template())[4])
+        return res
+
+    # pylint: disable=too-many-arguments
+    async def _request(self, uri_base, uri, timer, stream=None,
+                       validated=None):
+        """
+        Makes the call, hedged if this object has a `Hedge`
+        """
+        if self.hedge is None or stream:
+            return await self._fetch(uri_base, uri, timer, stream, validated)
+        return await self._hedged(uri_base, uri, timer, validated)
+
+    async def _hedged(self, uri_base, uri, timer, validated=None):
+        """
+        asyncio version of `KloutCall._hedged`: the slower request is
+        cancelled outright
+        """
+        hedge = self.hedge
+        name = (self._template or self._uri_template())[4]
+        delay = hedge.delay_for(name)
+        if delay is None:
+            result = await self._fetch(uri_base, uri, timer, None, validated)
+            hedge.record(name, timer.response_time())
+            return result
+
+        timers = {}
+
+        def start():
+            """
+            Starts a request in a task of its own
+            """
+            copy = timer.fork()
+            task = asyncio.ensure_future(self._fetch(
+                uri_base, uri, copy, None, validated))
+            timers[task] = copy
+            return task
+
+        tasks = [start()]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done and hedge.allow():
+                tasks.append(start())
+
+            pending = tasks
+            failed = None
+            winner = None
+            while winner is None:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        winner = task
+                        break
+                    failed = failed or task.exception()
+                else:
+                    if not pending:
+                        raise failed
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+        hedge.record(name, timers[winner].response_time(),
+                     winner is not tasks[0])
+        return winner.result()
+
+    # pylint: disable=too-many-arguments
+    async def _fetch(self, uri_base, uri, timer, stream=None,
+                     validated=None):
+        attempts = []
+        while True:
+            started = time.time()
+            event = self._start_event(timer, len(attempts) + 1)
+            try:
+                handle = await self._guarded(uri_base, uri, timer,
+                                             validated)
+                break
+            except KloutHTTPError:
+                _, error, _ = sys.exc_info()
+                self._end_event(event, error.errors)
+                attempts.append({'started': started,
+                                 'elapsed': time.time() - started,
+                                 'errors': error.errors})
+                error.attempts = attempts
+                delay = self._retry_delay(len(attempts), error, timer)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+
+        if event is not None:
+            event.status = handle.getcode()
+        if stream:
+            self._end_event(event)
+            # The body is already in memory, only decoding is incremental
+            return self._iter_response(handle, uri, stream)
+
+        res = self._read_result(handle, event, validated)
+        self._end_event(event)
+        return res
+
+    async def _guarded(self, uri_base, uri, timer, validated=None):
+        """
+        asyncio version of `KloutCall._guarded`
+        """
+        if self.breaker is None and self.concurrency is None:
+            return await self._attempt(uri_base, uri, timer, validated)
+        name, probe = self._circuit(uri)
+        if self.concurrency is not None and \
+                not await self._acquire_slot(timer):
+            if self.breaker is not None:
+                self.breaker.release(name, probe)
+            raise KloutRateLimitError("Concurrency limit exceeded", uri)
+        started = time.time()
+        try:
+            handle = await self._attempt(uri_base, uri, timer, validated)
+        except KloutHTTPError:
+            _, error, _ = sys.exc_info()
+            if self._interrupted(error, timer):
+                self._leave(name, probe)
+            else:
+                self._leave(name, probe, started, error.errors)
+            raise
+        except BaseException:
+            self._leave(name, probe)
+            raise
+        self._leave(name, probe, started)
+        return handle
+
+    async def _acquire_slot(self, timer):
+        """
+        Waits for a slot of the concurrency limit, returns False if none
+        is free before the deadline of `timer`
+        """
+        loop = asyncio.get_event_loop()
+        while True:
+            waiter = loop.create_future()
+
+            def wake(waiter=waiter):
+                """
+                Wakes the call up, from any thread
+                """
+                try:
+                    loop.call_soon_threadsafe(_wake, waiter)
+                except RuntimeError:
+                    # The loop is closed
+                    pass
+
+            if self.concurrency.try_acquire(wake):
+                return True
+            try:
+                await asyncio.wait_for(waiter, timer.remaining())
+            except asyncio.TimeoutError:
+                return False
+
+    async def _attempt(self, uri_base, uri, timer, validated=None):
+        keys = self.key
+        if not isinstance(keys, KeyPool):
+            return await self._send(uri_base, uri, timer, validated)
+
+        # Fail over to the next key when one is over quota
+        for _ in range(len(keys)):
+            reserved = keys.reserve(timer.remaining())
+            if reserved is None:
+                break
+            key, wait = reserved
+            if wait:
+                await asyncio.sleep(wait)
+            try:
+                handle = await self._send(keys.sign(uri_base, key), uri,
+                                          timer, validated)
+            except KloutHTTPError:
+                _, error, _ = sys.exc_info()
+                if not keys.release(key, error.errors):
+                    raise
+            except BaseException:
+                keys.release(key)
+                raise
+            else:
+                keys.release(key)
+                return handle
+        raise _keys_exhausted(keys, uri)
+
+    async def _send(self, uri_base, uri, timer, validated=None):
+        if self.limiter is not None:
+            wait = self.limiter.reserve(timer.remaining())
+            if wait is None:
+                raise KloutRateLimitError("Rate limit exceeded", uri)
+            if wait:
+                await asyncio.sleep(wait)
+        timer.mark('wait')
+        timer.sent = time.time()
+
+        headers = {'Accept-Encoding': 'gzip'}
+        if validated is not None:
+            headers.update(validated.headers())
+        try:
+            return await asyncio.wait_for(
+                self.transport.urlopen(uri_base, headers, timer),
+                timer.remaining())
+        except (urllib_error.HTTPError, urllib_error.URLError):
+            _, errors, _ = sys.exc_info()
+            raise KloutHTTPError(errors, uri)
+        except asyncio.TimeoutError:
+            raise KloutHTTPError(
+                urllib_error.URLError(socket.timeout('timed out')), uri)
+
+    async def many(self, params, concurrency=None, ordered=True):
+        """
+        Async generator version of `KloutCall.many`::
+
+            async for kwargs, result in k.user.score.many(params):
+                ...
+
+        `concurrency` defaults to the `maxsize` of the pool, which bounds
+        the number of requests in flight in any case.
+        """
+        if concurrency is None:
+            concurrency = self.transport.maxsize
+        window = concurrency * 2
+
+        async def call(kwargs):
+            try:
+                return kwargs, await self(**dict(kwargs))
+            except KloutError:
+                return kwargs, sys.exc_info()[1]
+
+        params = iter(params)
+        tasks = []
+        try:
+            while True:
+                for kwargs in params:
+                    tasks.append(asyncio.ensure_future(call(kwargs)))
+                    if len(tasks) >= window:
+                        break
+                if not tasks:
+                    return
+                if ordered:
+                    task = tasks.pop(0)
+                    yield await task
+                else:
+                    done, _ = await asyncio.wait(
+                        tasks, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        tasks.remove(task)
+                        yield task.result()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+
+# pylint: disable=too-few-public-methods
+class AsyncKlout(AsyncKloutCall):
+    """
+    asyncio version of `Klout`.
+
+    Takes the same arguments as `Klout`. `concurrency` bounds the number
+    of requests in flight at the same time; it's ignored if a `pool` (or
+    `transport`) is given, in which case the pool's `maxsize` applies.
+    It can also be an `AdaptiveConcurrency` limit, whose `max_limit` is
+    then the size of the pool.
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, key, domain="api.klout.com", secure=False,
+                 api_version=_DEFAULT, concurrency=10, pool=None,
+                 cache=None, identities=None, timeout=None, limiter=None,
+                 retry=None, singleflight=None, transport=None,
+                 hooks=None, lazy=False, validators=None, hedge=None,
+                 breaker=None):
+        if api_version is _DEFAULT:
+            api_version = "v2"
+
+        limit = None
+        if concurrency is True:
+            concurrency = AdaptiveConcurrency()
+        if isinstance(concurrency, AdaptiveConcurrency):
+            limit, concurrency = concurrency, concurrency.max_limit
+
+        if isinstance(key, (list, tuple)):
+            key = KeyPool(key)
+
+        if transport is None:
+            transport = pool
+        if transport is None or transport is True:
+            transport = AsyncConnectionPool(maxsize=concurrency)
+
+        if cache is True:
+            cache = LRUCache()
+
+        if identities is True:
+            identities = IdentityMap()
+
+        if retry is True:
+            retry = Retry()
+
+        if singleflight is True:
+            singleflight = AsyncSingleFlight()
+
+        if hooks is not None and not isinstance(hooks, (list, tuple)):
+            hooks = [hooks]
+
+        if validators is True:
+            validators = ValidatorCache()
+
+        if hedge is True:
+            hedge = Hedge()
+
+        if breaker is True:
+            breaker = CircuitBreaker()
+
+        AsyncKloutCall.__init__(
+            self, key=key, domain=domain,
+            api_version=api_version,
+            callable_cls=AsyncKloutCall, secure=secure,
+            uriparts=(), transport=transport, cache=cache,
+            identities=identities,
+            timeout=timeout, limiter=limiter, retry=retry,
+            singleflight=singleflight, hooks=hooks, lazy=lazy,
+            validators=validators, hedge=hedge, breaker=breaker,
+            concurrency=limit)
+
+    async def resolve_and_get(self, resource="score", **kwargs):
+        """
+        asyncio version of `Klout.resolve_and_get`
+        """
+        timeout = kwargs.get('timeout', self.timeout)
+        kloutId = (await self.identity.klout(**kwargs)).get('id')
+        return await self.user._(resource)(kloutId=kloutId, timeout=timeout)
+
+    async def profile(self, kloutId=None, parts=Klout.PROFILE_PARTS,
+                      **kwargs):
+        """
+        asyncio version of `Klout.profile`
+        """
+        timeout = kwargs.pop('timeout', self.timeout)
+        if kloutId is None:
+            kloutId = (await self.identity.klout(timeout=timeout,
+                                                 **kwargs)).get('id')
+
+        results = await asyncio.gather(
+            *[self.user._(part)(kloutId=kloutId, timeout=timeout)
+              for part in parts], return_exceptions=True)
+
+        profile = {'kloutId': kloutId, 'errors': {}}
+        for part, result in zip(parts, results):
+            if isinstance(result, KloutError):
+                profile['errors'][part] = result
+            elif isinstance(result, BaseException):
+                raise result
+            else:
+                profile[part] = result
+        return profile
+
+    async def close(self):
+        """
+        Closes pooled connections.
+        """
+        await self.transport.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+__all__ = ["AsyncKlout", "AsyncConnectionPool", "AsyncSingleFlight"]
@@ -7,7 +7,7 @@ get a key at
 
     <http://klout.com/s/developers/v2>
 
-Supports Python >= 2.5 and Python 3
+Supports Python >= 2.6 and Python 3
 
 ====================
 Quickstart
@@ -36,6 +36,85 @@ using that kloutId::
     # Optionally a timeout parameter (seconds) can also be sent with all calls
     score = k.user.score(kloutId=kloutId, timeout=5).get('score')
 
+    # Connect, read and total timeouts can be set separately, for all
+    # calls or per call
+    k = Klout('YOUR_KEY_HERE', timeout=Timeout(connect=1, read=5, total=8))
+
+    # Stay within the rate limits of the developer key
+    k = Klout('YOUR_KEY_HERE', limiter=RateLimiter(per_second=10,
+                                                   per_day=20000))
+
+    # Spread calls over several keys, the least used first
+    k = Klout(KeyPool(['KEY_1', 'KEY_2'], policy='quota', per_day=20000))
+
+    # Retry transient errors with exponential backoff
+    k = Klout('YOUR_KEY_HERE', retry=Retry(total=3))
+
+    # Share one request between threads making the same call concurrently
+    k = Klout('YOUR_KEY_HERE', singleflight=True)
+
+    # Collect latency histograms per endpoint
+    metrics = MetricsCollector()
+    k = Klout('YOUR_KEY_HERE', hooks=metrics)
+
+    # Decode results on demand, only as far as needed
+    k = Klout('YOUR_KEY_HERE', lazy=True)
+
+    # Bind an API function once when calling it in a tight loop
+    score = k.endpoint('user.score')
+    for kloutId in ('11747', '635263'):
+        print score(kloutId=kloutId).get('score')
+
+    # Large lists can be decoded one element at a time
+    for influencer in k.user.influence(kloutId=kloutId,
+                                       stream='myInfluencers'):
+        print influencer['entity']['id']
+
+    # Reuse keep-alive connections across calls
+    k = Klout('YOUR_KEY_HERE', pool=ConnectionPool(maxsize=4))
+
+    # Cache results, identities for a day and everything else for a minute
+    k = Klout('YOUR_KEY_HERE', cache=LRUCache(ttl=60))
+
+    # Share cached results between processes and across restarts
+    k = Klout('YOUR_KEY_HERE', cache=DiskCache('klout-cache.db'))
+
+    # Keep as many requests in flight as api.klout.com can take
+    k = Klout('YOUR_KEY_HERE', pool=True, concurrency=AdaptiveConcurrency())
+
+    # Fail fast while an endpoint is down
+    k = Klout('YOUR_KEY_HERE', breaker=CircuitBreaker(cooldown=30))
+
+    # Cut tail latency by sending a copy of unusually slow calls
+    k = Klout('YOUR_KEY_HERE', pool=True, hedge=Hedge(max_rate=0.05))
+
+    # Only download results again if they changed
+    k = Klout('YOUR_KEY_HERE', cache=LRUCache(ttl=60), validators=True)
+
+    # Remember identities on disk and skip the identity call when possible
+    k = Klout('YOUR_KEY_HERE', identities=IdentityMap(path='identities'))
+    score = k.resolve_and_get(screenName="erfaan", resource="score")
+
+Many calls can be made in parallel with `many`::
+
+    for kwargs, result in k.user.score.many([{'kloutId': '11747'},
+                                             {'kloutId': '635263'}]):
+        print kwargs['kloutId'], result.get('score')
+
+the parts of a user's profile fetched at the same time::
+
+    profile = k.profile(screenName="erfaan")
+    print profile['score']['score'], profile['topics'], profile['errors']
+
+and feeds of any length streamed through a `pipeline`::
+
+    for record in k.pipeline(open('screen_names.txt')).resolve_identity() \\
+                   .fetch('user.score', 'user.topics').results():
+        print record['input'], record.get('user.score')
+
+With Python >= 3.6 an asyncio interface, `klout.aio.AsyncKlout`, is also
+available.
+
 
 """
 
@@ -49,18 +128,31 @@ except ImportError:
     import urllib2 as urllib_error
 
 try:
-    from cStringIO import StringIO
+    import queue
 except ImportError:
-    from io import BytesIO as StringIO
-
-import gzip
-
-try:
-    import json
-except ImportError:
-    import simplejson as json
+    import Queue as queue
 
 import socket
+import threading
+import time
+
+from .batch import imap
+from .breaker import CircuitBreaker
+from .cache import DiskCache, LRUCache
+from .concurrency import AdaptiveConcurrency
+from .conditional import ValidatorCache
+from .hedge import Hedge
+from .hooks import Hooks, MetricsCollector, RequestEvent
+from .identity import IdentityMap
+from .keys import KeyPool
+from .lazy import decode_lazy
+from .pool import ConnectionPool
+from .ratelimit import RateLimiter
+from .retry import Retry
+from .singleflight import SingleFlight
+from .stream import decode, iter_body, iter_items
+from .timeout import Timeout, start_timer
+from .transport import UrllibTransport
 
 
 class _DEFAULT(object):  # pylint: disable=too-few-public-methods
@@ -88,65 +180,384 @@ class KloutHTTPError(KloutError):
     """
     Exception thrown by Klout object when there is an
     HTTP error interacting with api.klout.com.
+
+    `attempts` lists a dict for every attempt made, with its `started`
+    time, `elapsed` seconds and `errors`.
     """
 
-    def __init__(self, errors, uri):
+    def __init__(self, errors, uri, attempts=None):
         self.uri = uri
+        if attempts is None:
+            attempts = []
+        self.attempts = attempts
         super(KloutHTTPError, self).__init__(errors)
 
 
+class KloutRateLimitError(KloutHTTPError):
+    """
+    Exception thrown by Klout object when a call can not be made within
+    its timeout without going over the rate limit.
+
+    When no developer key of a `KeyPool` can be used, `errors` is the
+    last quota error (an `HTTPError`) the keys were answered with and
+    `retry_in` the number of seconds before a key can be used again.
+    """
+
+    def __init__(self, errors, uri, attempts=None, retry_in=None):
+        self.retry_in = retry_in
+        super(KloutRateLimitError, self).__init__(errors, uri, attempts)
+
+
+class KloutCircuitOpenError(KloutHTTPError):
+    """
+    Exception thrown by Klout object when a call is not made because the
+    circuit of its `endpoint` is open, see `klout.breaker`. `retry_in` is
+    the number of seconds before the circuit lets calls through again.
+    """
+
+    def __init__(self, errors, uri, endpoint=None, retry_in=None):
+        self.endpoint = endpoint
+        self.retry_in = retry_in
+        super(KloutCircuitOpenError, self).__init__(errors, uri)
+
+
+def _keys_exhausted(keys, uri):
+    """
+    Returns the `KloutRateLimitError` of a call to `uri` for which no key
+    of the `KeyPool` `keys` could be used
+    """
+    return KloutRateLimitError(
+        keys.last_quota_error or "No developer key available", uri,
+        retry_in=keys.retry_in())
+
+
+class _Settings(object):  # pylint: disable=too-few-public-methods
+    """
+    Settings shared by a `Klout` object and all the calls derived from it
+    """
+    __slots__ = ('key', 'domain', 'api_version', 'callable_cls', 'secure',
+                 'transport', 'cache', 'identities', 'timeout', 'limiter',
+                 'retry', 'singleflight', 'hooks', 'lazy', 'validators',
+                 'hedge', 'breaker', 'concurrency')
+
+
+def _setting(name):
+    """
+    Returns a property reading and writing setting `name`
+    """
+    def getter(self):
+        return getattr(self._settings, name)
+
+    def setter(self, value):
+        setattr(self._settings, name, value)
+    return property(getter, setter)
+
+
 # pylint: disable=too-few-public-methods
 class KloutCall(object):
     """
     Klout interface base class.
     """
+    __slots__ = ('_settings', 'uri', 'uriparts', '_template')
+
     # pylint: disable=too-many-arguments
     def __init__(self, key, domain,
                  callable_cls, api_version="",
-                 uri="", uriparts=None, secure=False):
-
-        self.key = key
-        self.domain = domain
-        self.api_version = api_version
-        self.callable_cls = callable_cls
+                 uri="", uriparts=None, secure=False, pool=None,
+                 cache=None, identities=None, timeout=None, limiter=None,
+                 retry=None, singleflight=None, transport=None, hooks=None,
+                 lazy=False, validators=None, hedge=None, breaker=None,
+                 concurrency=None):
+
+        if transport is None:
+            transport = pool
+        if transport is None:
+            transport = UrllibTransport()
+
+        settings = _Settings()
+        settings.key = key
+        settings.domain = domain
+        settings.api_version = api_version
+        settings.callable_cls = callable_cls
+        settings.secure = secure
+        settings.transport = transport
+        settings.cache = cache
+        settings.identities = identities
+        settings.timeout = timeout
+        settings.limiter = limiter
+        settings.retry = retry
+        settings.singleflight = singleflight
+        settings.hooks = hooks
+        settings.lazy = lazy
+        settings.validators = validators
+        settings.hedge = hedge
+        settings.breaker = breaker
+        settings.concurrency = concurrency
+        self._settings = settings
         self.uri = uri
-        self.secure = secure
         self.uriparts = uriparts
+        self._template = None
+
+    key = _setting('key')
+    domain = _setting('domain')
+    api_version = _setting('api_version')
+    callable_cls = _setting('callable_cls')
+    secure = _setting('secure')
+    transport = _setting('transport')
+    pool = transport
+    cache = _setting('cache')
+    identities = _setting('identities')
+    timeout = _setting('timeout')
+    limiter = _setting('limiter')
+    retry = _setting('retry')
+    singleflight = _setting('singleflight')
+    hooks = _setting('hooks')
+    lazy = _setting('lazy')
+    validators = _setting('validators')
+    hedge = _setting('hedge')
+    breaker = _setting('breaker')
+    concurrency = _setting('concurrency')
 
     def __getattr__(self, k):
         """
         Generic Attribute Handler
         """
-        try:
-            return object.__getattr__(self, k)
-        except AttributeError:
-            def extend_call(arg):
-                """
-                Extend the method call
-                """
-                return self.callable_cls(
-                    key=self.key, domain=self.domain,
-                    api_version=self.api_version,
-                    callable_cls=self.callable_cls, secure=self.secure,
-                    uriparts=self.uriparts + (arg,))
-            if k == "_":
-                return extend_call
-            return extend_call(k)
+        if k.startswith('__') or k in KloutCall.__slots__:
+            raise AttributeError(k)
+        if k == "_":
+            return self._extend
+        return self._extend(k)
+
+    def _extend(self, arg):
+        """
+        Extend the method call
+        """
+        call = object.__new__(self._settings.callable_cls)
+        call._settings = self._settings
+        call.uri = ""
+        call.uriparts = self.uriparts + (arg,)
+        call._template = None
+        return call
+
+    def endpoint(self, name):
+        """
+        Returns the API function `name`, a dotted path such as
+        `'user.score'`, with its uri template computed once for all::
+
+            score = k.endpoint('user.score')
+            for kloutId in kloutIds:
+                print score(kloutId=kloutId).get('score')
+
+        Calling it is the same as calling `k.user.score` but avoids the
+        attribute lookups and the work repeated on every call.
+        """
+        call = self
+        for part in name.split('.'):
+            call = call._extend(part)
+        call._template = call._uri_template()
+        return call
 
     def __call__(self, **kwargs):
-        # Build the uri.
-        uriparts = []
-        api_version = self.api_version
-        resource = "%s.json" % self.uriparts[0]
+        timeout = kwargs.pop('timeout', self.timeout)
+        stream = kwargs.pop('stream', None)
+        uri, uri_base, cache_key = self._build_uri(kwargs)
+
+        headers = {'Accept-Encoding': 'gzip'}
 
-        uriparts.append(api_version)
-        uriparts.append(resource)
+        if stream:
+            req = urllib_request.Request(uri_base, headers=headers)
+            return self._handle_response(req, uri, timeout, stream)
 
-        params = {}
-        if self.key:
-            params['key'] = self.key
+        store = self._store()
+        if store is not None:
+            res = store.get(cache_key)
+            if res is not None:
+                return res
+
+        validated = None
+        if self.validators is not None:
+            validated = self.validators.lookup(cache_key)
+            headers.update(validated.headers())
 
-        timeout = kwargs.pop('timeout', None)
+        req = urllib_request.Request(uri_base, headers=headers)
+
+        if self.singleflight is None:
+            res = self._request(req, uri, timeout, validated)
+        else:
+            res = self._coalesce(req, uri, timeout, cache_key, validated)
+        if store is not None:
+            store.set(cache_key, res, (self._template or
+                                       self._uri_template())[4])
+        return res
+
+    # pylint: disable=too-many-arguments
+    def _coalesce(self, req, uri, timeout, cache_key, validated=None):
+        """
+        Makes the call unless an identical one is in flight, in which
+        case its result is shared
+        """
+        timer = start_timer(timeout)
+        try:
+            return self.singleflight.do(
+                cache_key,
+                lambda: self._request(req, uri, timer, validated),
+                timer.remaining())
+        except socket.timeout:
+            import sys
+            _, errors, _ = sys.exc_info()
+            raise KloutHTTPError(urllib_error.URLError(errors), uri)
+
+    def _request(self, req, uri, timeout, validated=None):
+        """
+        Makes the call, hedged if this object has a `Hedge`
+        """
+        if self.hedge is None:
+            return self._handle_response(req, uri, timeout,
+                                         validated=validated)
+        return self._hedged(req, uri, start_timer(timeout), validated)
+
+    def _hedged(self, req, uri, timer, validated=None):
+        """
+        Makes the call, and a copy of it if it's still running after the
+        hedge delay. Returns the first result, cancelling the other
+        request; fails only if both requests fail.
+        """
+        hedge = self.hedge
+        name = (self._template or self._uri_template())[4]
+        delay = hedge.delay_for(name)
+        if delay is None:
+            result = self._handle_response(req, uri, timer,
+                                           validated=validated)
+            hedge.record(name, timer.response_time())
+            return result
+
+        outcomes = queue.Queue()
+        timers = []
+
+        def run(request, copy):
+            """
+            Makes one of the requests
+            """
+            try:
+                outcomes.put((copy, self._handle_response(
+                    request, uri, copy, validated=validated), None))
+            except BaseException:  # pylint: disable=broad-except
+                import sys
+                outcomes.put((copy, None, sys.exc_info()))
+
+        def start(request):
+            """
+            Starts a request in a thread of its own
+            """
+            copy = timer.fork()
+            timers.append(copy)
+            thread = threading.Thread(target=run, args=(request, copy))
+            thread.daemon = True
+            thread.start()
+
+        start(req)
+        try:
+            outcome = outcomes.get(True, delay)
+        except queue.Empty:
+            outcome = None
+            if hedge.allow():
+                # A request of its own: transports attach the timer to it
+                start(urllib_request.Request(
+                    req.get_full_url(), headers=dict(req.header_items())))
+
+        pending = len(timers)
+        failed = None
+        while True:
+            if outcome is None:
+                outcome = outcomes.get()
+            pending -= 1
+            copy, result, exc_info = outcome
+            if exc_info is None:
+                break
+            failed = failed or exc_info
+            if not pending:
+                raise failed[1]
+            outcome = None
+
+        for other in timers:
+            if other is not copy:
+                other.cancel()
+        hedge.record(name, copy.response_time(), copy is not timers[0])
+        return result
+
+    def _store(self):
+        """
+        Returns the cache the results of this call are kept in, if any
+        """
+        if self.identities is not None and self.uriparts[0] == 'identity':
+            return self.identities
+        return self.cache
+
+    def many(self, params, concurrency=10, ordered=True):
+        """
+        Calls this API function once for every dict of keyword arguments
+        in `params`, using `concurrency` threads::
+
+            for kwargs, result in k.user.score.many(
+                    ({'kloutId': kloutId} for kloutId in kloutIds),
+                    concurrency=20):
+                if isinstance(result, KloutError):
+                    ...
+
+        Yields `(kwargs, result)` pairs in input order, or as soon as
+        each result is ready if `ordered` is False. A call failing with
+        a `KloutError` yields the exception as its result instead of
+        stopping the batch.
+
+        `params` is consumed lazily, so it can be a generator over a
+        large input.
+        """
+        def call(kwargs):
+            """
+            Make a single call
+            """
+            return self(**dict(kwargs))
+
+        for kwargs, result, exc_info in imap(call, params, concurrency,
+                                             ordered):
+            if exc_info is not None:
+                if not isinstance(exc_info[1], KloutError):
+                    raise exc_info[1]
+                result = exc_info[1]
+            yield kwargs, result
+
+    def _uri_template(self):
+        """
+        Returns the parts of the uri which don't depend on the call
+        arguments: `(prefix, suffix, base, key_query, name)`
+        """
+        prefix = [self.api_version, "%s.json" % self.uriparts[0]]
+        suffix = [str(uripart) for uripart in self.uriparts[1:]
+                  if not uripart == 'klout']
+
+        secure_str = ''
+        if self.secure:
+            secure_str = 's'
+        base = "http%s://%s/" % (secure_str, self.domain)
+
+        key_query = ''
+        if self.key and not isinstance(self.key, KeyPool):
+            key_query = urllib_parse.urlencode({'key': self.key})
+
+        return prefix, suffix, base, key_query, '.'.join(self.uriparts)
+
+    def _build_uri(self, kwargs):
+        """
+        Returns the `(uri, uri_base, cache_key)` tuple for a call with
+        `kwargs`. `uri` is relative to the domain and `cache_key` is
+        `uri` without the developer key.
+        """
+        prefix, suffix, base, key_query, _ = \
+            self._template or self._uri_template()
+
+        # Build the uri.
+        uriparts = list(prefix)
+        params = {}
 
         # append input variables
         for key, value in kwargs.items():
@@ -159,48 +570,268 @@ class KloutCall(object):
                 uriparts.append(key)
                 uriparts.append(str(value))
 
-        for uripart in self.uriparts[1:]:
-            if not uripart == 'klout':
-                uriparts.append(str(uripart))
+        uriparts.extend(suffix)
 
-        uri = '/'.join(uriparts)
+        uri = cache_key = '/'.join(uriparts)
         if params:
-            uri += '?' + urllib_parse.urlencode(params)
+            uri = cache_key = cache_key + '?' + urllib_parse.urlencode(params)
+            if key_query:
+                uri += '&' + key_query
+        elif key_query:
+            uri += '?' + key_query
 
-        secure_str = ''
-        if self.secure:
-            secure_str = 's'
+        return uri, base + uri, cache_key
 
-        uri_base = "http%s://%s/%s" % (
-            secure_str, self.domain, uri)
+    # pylint: disable=too-many-arguments
+    def _handle_response(self, req, uri, timeout=None, stream=None,
+                         validated=None):
+        timer = start_timer(timeout)
+        attempts = []
+        while True:
+            started = time.time()
+            event = self._start_event(timer, len(attempts) + 1)
+            try:
+                result = self._guarded(req, uri, timer, stream, validated)
+            except KloutHTTPError:
+                import sys
+                _, error, _ = sys.exc_info()
+                if not timer.cancelled:
+                    # A cancelled hedged request didn't fail, its copy won
+                    self._end_event(event, error.errors)
+                attempts.append({'started': started,
+                                 'elapsed': time.time() - started,
+                                 'errors': error.errors})
+                error.attempts = attempts
+                delay = self._retry_delay(len(attempts), error, timer)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+            else:
+                self._end_event(event)
+                return result
 
-        headers = {'Accept-Encoding': 'gzip'}
+    def _start_event(self, timer, attempt):
+        """
+        Tells the hooks an attempt is starting, returns its `RequestEvent`
+        or None without hooks
+        """
+        hooks = self.hooks
+        if not hooks:
+            return None
+        event = RequestEvent((self._template or self._uri_template())[4],
+                             attempt)
+        timer.event = event
+        for hook in hooks:
+            hook.before_request(event)
+        return event
+
+    def _end_event(self, event, errors=None):
+        """
+        Tells the hooks an attempt succeeded, or failed with `errors`
+        """
+        if event is None:
+            return
+        event.finish(errors)
+        for hook in self.hooks:
+            if errors is None:
+                hook.after_response(event)
+            else:
+                hook.on_error(event)
 
-        req = urllib_request.Request(uri_base, headers=headers)
+    def _retry_delay(self, retries, error, timer):
+        """
+        Returns how long to wait before retrying after `error`, or None
+        if the call shouldn't be retried
+        """
+        if self.retry is None or \
+                isinstance(error, (KloutRateLimitError,
+                                   KloutCircuitOpenError)):
+            return None
+        delay = self.retry.delay(retries, error.errors)
+        remaining = timer.remaining()
+        if delay is not None and remaining is not None and \
+                delay >= remaining:
+            return None
+        return delay
+
+    def _circuit(self, uri):
+        """
+        Returns the name of the endpoint and whether the attempt is a
+        probe of its circuit, raises `KloutCircuitOpenError` if this
+        object has a circuit breaker and its circuit is open
+        """
+        name = (self._template or self._uri_template())[4]
+        if self.breaker is None:
+            return name, False
+        retry_in, probe = self.breaker.allow(name)
+        if retry_in is not None:
+            raise KloutCircuitOpenError(
+                "Circuit of %s is open, retry in %.1fs"
+                % (name, retry_in), uri, name, retry_in)
+        return name, probe
+
+    def _enter(self, uri, timer):
+        """
+        Returns the name of the endpoint and whether the attempt is a
+        probe once an attempt to call it can be made: its circuit is
+        closed and the concurrency limit allows one more request in flight
+        """
+        name, probe = self._circuit(uri)
+        if self.concurrency is not None and \
+                not self.concurrency.acquire(timer.remaining()):
+            if self.breaker is not None:
+                self.breaker.release(name, probe)
+            raise KloutRateLimitError("Concurrency limit exceeded", uri)
+        return name, probe
 
-        return self._handle_response(req, uri, timeout)
+    # pylint: disable=too-many-arguments
+    def _leave(self, name, probe, started=None, errors=None):
+        """
+        Tells the circuit breaker and the concurrency limit an attempt
+        started at `started` succeeded, failed with `errors`, or was
+        interrupted if `started` is None
+        """
+        if self.breaker is not None:
+            if started is None:
+                self.breaker.release(name, probe)
+            else:
+                self.breaker.record(name, errors, probe)
+        if self.concurrency is not None:
+            self.concurrency.release(name, started, errors)
 
-    # pylint: disable=no-self-use
-    def _handle_response(self, req, uri, timeout=None):
-        if timeout:
-            socket.setdefaulttimeout(timeout)
+    @staticmethod
+    def _interrupted(error, timer):
+        """
+        Returns True if the attempt which failed with the `KloutHTTPError`
+        `error` says nothing about the health of the endpoint: it was
+        rejected by a client side rate limit, or cancelled as the losing
+        request of a hedged call
+        """
+        return isinstance(error, KloutRateLimitError) or timer.cancelled
+
+    # pylint: disable=too-many-arguments
+    def _guarded(self, req, uri, timer, stream=None, validated=None):
+        """
+        Makes an attempt through the circuit breaker and within the
+        concurrency limit, if any
+        """
+        if self.breaker is None and self.concurrency is None:
+            return self._attempt(req, uri, timer, stream, validated)
+        name, probe = self._enter(uri, timer)
+        started = time.time()
         try:
-            handle = urllib_request.urlopen(req)
-            if handle.info().get('Content-Encoding') == 'gzip':
-                # Handle gzip decompression
-                buf = StringIO(handle.read())
-                zip_file = gzip.GzipFile(fileobj=buf)
-                data = zip_file.read()
+            result = self._attempt(req, uri, timer, stream, validated)
+        except KloutHTTPError:
+            import sys
+            _, error, _ = sys.exc_info()
+            if self._interrupted(error, timer):
+                self._leave(name, probe)
+            else:
+                self._leave(name, probe, started, error.errors)
+            raise
+        except BaseException:
+            self._leave(name, probe)
+            raise
+        self._leave(name, probe, started)
+        return result
+
+    # pylint: disable=too-many-arguments
+    def _attempt(self, req, uri, timer, stream=None, validated=None):
+        keys = self.key
+        if not isinstance(keys, KeyPool):
+            return self._send(req, uri, timer, stream, validated)
+
+        # Fail over to the next key when one is over quota
+        for _ in range(len(keys)):
+            key = keys.acquire(timer.remaining())
+            if key is None:
+                break
+            signed = urllib_request.Request(
+                keys.sign(req.get_full_url(), key),
+                headers=dict(req.header_items()))
+            try:
+                result = self._send(signed, uri, timer, stream, validated)
+            except KloutHTTPError:
+                import sys
+                _, error, _ = sys.exc_info()
+                if not keys.release(key, error.errors):
+                    raise
+            except BaseException:
+                keys.release(key)
+                raise
             else:
-                data = handle.read()
+                keys.release(key)
+                return result
+        raise _keys_exhausted(keys, uri)
 
-            res = json.loads(data.decode('utf8'))
-            return res
-        except (urllib_error.HTTPError, urllib_error.URLError):
+    # pylint: disable=too-many-arguments
+    def _send(self, req, uri, timer, stream=None, validated=None):
+        if self.limiter is not None and \
+                not self.limiter.acquire(timer.remaining()):
+            raise KloutRateLimitError("Rate limit exceeded", uri)
+        timer.mark('wait')
+        timer.sent = time.time()
+        try:
+            handle = self.transport.urlopen(req, timer)
+            timer.mark('ttfb')
+            if timer.event is not None:
+                timer.event.status = handle.getcode()
+            if stream:
+                return self._iter_response(handle, uri, stream)
+            return self._read_result(handle, timer.event, validated)
+        except (urllib_error.URLError, socket.error):
             import sys
             _, errors, _ = sys.exc_info()
+            if validated is not None and getattr(errors, 'code', 0) == 304:
+                # urllib treats 304 Not Modified as an error
+                if timer.event is not None:
+                    timer.event.status = 304
+                return self.validators.not_modified(validated)
+            if not isinstance(errors, urllib_error.URLError):
+                errors = urllib_error.URLError(errors)
             raise KloutHTTPError(errors, uri)
 
+    def _read_result(self, handle, event, validated):
+        """
+        Returns the result of a response, revalidating `validated` if the
+        request was made with a `ValidatorCache`
+        """
+        if validated is None:
+            return self._decode_response(handle, event)
+        if handle.getcode() == 304:
+            handle.close()
+            return self.validators.not_modified(validated)
+        result = self._decode_response(handle, event)
+        self.validators.update(validated, handle.info(), result)
+        return result
+
+    def _decode_response(self, handle, event=None):
+        if self.lazy:
+            return decode_lazy(handle,
+                               (self._template or self._uri_template())[4],
+                               event=event)
+        return decode(handle, event=event)
+
+    # pylint: disable=no-self-use
+    def _iter_response(self, handle, uri, stream):
+        """
+        Yields the elements of the `stream` list of the response, or of
+        the response itself if `stream` is True.
+        """
+        if stream is True:
+            stream = None
+        try:
+            for item in iter_items(iter_body(handle), stream):
+                yield item
+        except (urllib_error.URLError, socket.error):
+            import sys
+            _, errors, _ = sys.exc_info()
+            if not isinstance(errors, urllib_error.URLError):
+                errors = urllib_error.URLError(errors)
+            raise KloutHTTPError(errors, uri)
+        finally:
+            handle.close()
+
 
 # pylint: disable=too-few-public-methods
 class Klout(KloutCall):
@@ -277,8 +908,13 @@ class Klout(KloutCall):
 
     """
 
+    # pylint: disable=too-many-arguments
     def __init__(self, key, domain="api.klout.com", secure=False,
-                 api_version=_DEFAULT):
+                 api_version=_DEFAULT, pool=None, cache=None,
+                 identities=None, timeout=None, limiter=None, retry=None,
+                 singleflight=None, transport=None, hooks=None,
+                 lazy=False, validators=None, hedge=None, breaker=None,
+                 concurrency=None):
         """
         Create a new klout API connector.
 
@@ -286,6 +922,9 @@ class Klout(KloutCall):
 
             k = Klout(key='YOUR_KEY_HERE')
 
+        `key` can also be a list of keys, or a `KeyPool`, to spread calls
+        over several keys (see `klout.keys`).
+
         `domain` lets you change the domain you are connecting. By
         default it's `api.klout.com`
 
@@ -294,15 +933,185 @@ class Klout(KloutCall):
 
         `api_version` is used to set the base uri. By default it's
         'v2'.
+
+        `transport` sends the requests of all calls made through this
+        object, see `klout.transport`. By default each call opens its own
+        connection with `urllib`.
+
+        `pool` is a shortcut for passing a `ConnectionPool` as transport,
+        keeping HTTP/1.1 connections alive between calls. Pass `True` to
+        use a pool with default settings.
+
+        `cache` is an optional response cache such as `LRUCache`. Calls
+        answered from the cache return the very same (read-only) objects.
+        Pass `True` to use an `LRUCache` with default settings.
+
+        `identities` is an optional `IdentityMap` answering `identity`
+        calls instead of `cache`. Pass `True` to use an in-memory one.
+
+        `timeout` is the default timeout of all calls, either a number of
+        seconds used for both connecting and reading or a `Timeout`. It
+        can be overridden per call with a `timeout` keyword argument.
+
+        `limiter` is an optional `RateLimiter` all calls wait on before
+        hitting api.klout.com.
+
+        `retry` is an optional `Retry` policy for calls failing with
+        transient errors. Pass `True` to use the default policy.
+
+        `singleflight` is an optional `SingleFlight` making concurrent
+        identical calls share a single request. Pass `True` to use one.
+
+        `hooks` is an optional object, or list of objects, told about
+        every request made, see `klout.hooks`.
+
+        If `lazy` is True, results are read-only mappings decoded on
+        demand instead of dicts, see `klout.lazy`.
+
+        `validators` is an optional `ValidatorCache` used to make
+        conditional requests, revalidating results instead of downloading
+        them again. Pass `True` to use one.
+
+        `hedge` is an optional `Hedge` sending a copy of the calls which
+        take unusually long, and using whichever answers first, see
+        `klout.hedge`. Pass `True` to use the default policy; it's best
+        combined with a `ConnectionPool`.
+
+        `breaker` is an optional `CircuitBreaker` failing calls to an
+        endpoint with `KloutCircuitOpenError` right away while it's down,
+        see `klout.breaker`. Pass `True` to use the default thresholds.
+
+        `concurrency` is an optional `AdaptiveConcurrency` limit on the
+        number of requests in flight, adjusted to the latencies and
+        errors seen, see `klout.concurrency`. Pass `True` to use the
+        default settings.
         """
 
         if api_version is _DEFAULT:
             api_version = "v2"
 
+        if isinstance(key, (list, tuple)):
+            key = KeyPool(key)
+
+        if pool is True:
+            pool = ConnectionPool()
+
+        if transport is None:
+            transport = pool
+
+        if cache is True:
+            cache = LRUCache()
+
+        if identities is True:
+            identities = IdentityMap()
+
+        if retry is True:
+            retry = Retry()
+
+        if singleflight is True:
+            singleflight = SingleFlight()
+
+        if hooks is not None and not isinstance(hooks, (list, tuple)):
+            hooks = [hooks]
+
+        if validators is True:
+            validators = ValidatorCache()
+
+        if hedge is True:
+            hedge = Hedge()
+
+        if breaker is True:
+            breaker = CircuitBreaker()
+
+        if concurrency is True:
+            concurrency = AdaptiveConcurrency()
+
         KloutCall.__init__(
             self, key=key, domain=domain,
             api_version=api_version,
             callable_cls=KloutCall, secure=secure,
-            uriparts=())
+            uriparts=(), transport=transport, cache=cache,
+            identities=identities,
+            timeout=timeout, limiter=limiter, retry=retry,
+            singleflight=singleflight, hooks=hooks, lazy=lazy,
+            validators=validators, hedge=hedge, breaker=breaker,
+            concurrency=concurrency)
+
+    def resolve_and_get(self, resource="score", **kwargs):
+        """
+        Looks up the kloutId of an identity and returns the `resource`
+        of the `user` resource for it::
+
+            k.resolve_and_get(screenName='erfaan', resource='topics')
+
+        is the same as::
+
+            kloutId = k.identity.klout(screenName='erfaan').get('id')
+            k.user.topics(kloutId=kloutId)
+
+        but doesn't call the identity resource when the kloutId is
+        already known to the `identities` map.
+        """
+        timeout = kwargs.get('timeout', self.timeout)
+        kloutId = self.identity.klout(**kwargs).get('id')
+        return self.user._(resource)(kloutId=kloutId, timeout=timeout)
 
-__all__ = ["Klout", "KloutError", "KloutHTTPError"]
+    PROFILE_PARTS = ('score', 'influence', 'topics')
+
+    def profile(self, kloutId=None, parts=PROFILE_PARTS, **kwargs):
+        """
+        Calls the `parts` actions of the `user` resource for `kloutId` at
+        the same time, and returns their results in a dict keyed by part
+        along with the `kloutId` and the `errors` of the failed parts::
+
+            profile = k.profile(kloutId='11747')
+            print profile['score']['score'], len(profile['topics'])
+
+        Instead of `kloutId`, the keyword arguments of `identity.klout`
+        (`screenName`, `tw` or `gp`) can be given to look it up first. A
+        `timeout` keyword argument applies to every call.
+
+        Takes about as long as the slowest call. With a `ConnectionPool`
+        the calls share its connections.
+        """
+        timeout = kwargs.pop('timeout', self.timeout)
+        if kloutId is None:
+            kloutId = self.identity.klout(timeout=timeout, **kwargs).get('id')
+
+        def call(part):
+            """
+            Calls one part
+            """
+            return self.user._(part)(kloutId=kloutId, timeout=timeout)
+
+        profile = {'kloutId': kloutId, 'errors': {}}
+        for part, result, exc_info in imap(call, parts, len(parts)):
+            if exc_info is not None:
+                if not isinstance(exc_info[1], KloutError):
+                    raise exc_info[1]
+                profile['errors'][part] = exc_info[1]
+            else:
+                profile[part] = result
+        return profile
+
+    def pipeline(self, source, concurrency=10, ordered=False, window=None):
+        """
+        Returns a `Pipeline` streaming the identities of `source`, an
+        iterable such as an open file of twitter screen names::
+
+            for record in k.pipeline(feed).resolve_identity() \\
+                           .fetch('user.score').results():
+                print record['input'], record['user.score']['score']
+
+        See `klout.pipeline`.
+        """
+        from .pipeline import Pipeline
+        return Pipeline(self, source, concurrency, ordered, window)
+
+__all__ = ["Klout", "KloutError", "KloutHTTPError", "KloutRateLimitError",
+           "KloutCircuitOpenError", "CircuitBreaker", "AdaptiveConcurrency",
+           "ConnectionPool", "UrllibTransport", "LRUCache", "DiskCache",
+           "IdentityMap",
+           "Timeout",
+           "RateLimiter", "Retry", "SingleFlight", "Hooks",
+           "MetricsCollector", "ValidatorCache", "KeyPool", "Hedge"]
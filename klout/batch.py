@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+
+"""
+Thread pool helper used to run many Klout API calls in parallel, see
+`KloutCall.many`.
+"""
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+import sys
+import threading
+
+
+def _worker(func, tasks, results):
+    while True:
+        task = tasks.get()
+        if task is None:
+            return
+        index, item = task
+        try:
+            results.put((index, item, func(item), None))
+        except Exception:  # pylint: disable=broad-except
+            results.put((index, item, None, sys.exc_info()))
+
+
+def imap(func, items, concurrency=10, ordered=True, window=None):
+    """
+    Calls `func` on every element of `items` using `concurrency` threads.
+
+    Yields `(item, result, exc_info)` tuples, `exc_info` being None unless
+    `func` raised. Results are yielded in input order when `ordered` is
+    True, as soon as they are ready otherwise.
+
+    `items` is consumed lazily: at most `window` items (twice the
+    concurrency by default) are in flight or waiting to be yielded at
+    any time, so arbitrarily long iterables can be processed.
+    """
+    if window is None:
+        window = concurrency * 2
+    window = max(window, concurrency)
+
+    tasks = queue.Queue()
+    results = queue.Queue()
+    threads = []
+    for _ in range(concurrency):
+        thread = threading.Thread(target=_worker,
+                                  args=(func, tasks, results))
+        thread.daemon = True
+        thread.start()
+        threads.append(thread)
+
+    items = iter(items)
+    exhausted = False
+    submitted = 0
+    yielded = 0
+    pending = {}
+    try:
+        while True:
+            while not exhausted and submitted - yielded < window:
+                try:
+                    item = next(items)
+                except StopIteration:
+                    exhausted = True
+                    break
+                tasks.put((submitted, item))
+                submitted += 1
+
+            if yielded == submitted:
+                return
+
+            if ordered and yielded in pending:
+                result = pending.pop(yielded)
+            else:
+                result = results.get()
+                if ordered and result[0] != yielded:
+                    pending[result[0]] = result
+                    continue
+            yielded += 1
+            yield result[1:]
+    finally:
+        # Drop what was not started yet, let the workers finish what
+        # they are doing and exit.
+        while True:
+            try:
+                tasks.get_nowait()
+            except queue.Empty:
+                break
+        for _ in threads:
+            tasks.put(None)
+
+__all__ = ["imap"]
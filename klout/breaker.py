@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+
+"""
+Circuit breakers.
+
+A `Klout` object with a `CircuitBreaker` stops calling an endpoint that
+keeps failing, and fails fast with `KloutCircuitOpenError` instead of
+waiting for the timeout of every call::
+
+    from klout import Klout, CircuitBreaker, KloutCircuitOpenError
+
+    k = Klout('YOUR_KEY_HERE', breaker=CircuitBreaker(failure_rate=0.5,
+                                                      cooldown=30))
+    try:
+        score = k.user.score(kloutId='11747')
+    except KloutCircuitOpenError:
+        score = None  # api.klout.com is having a bad time
+
+Each endpoint (`user.score`, `identity.klout`...) has a circuit of its
+own:
+
+* closed: calls go through. Once at least `min_calls` of the last
+  `window` attempts were made, and `failure_rate` of them or more failed,
+  the circuit opens.
+* open: calls fail right away for `cooldown` seconds, then the circuit
+  is half-open.
+* half-open: `probes` calls at a time go through, others fail fast. A
+  successful probe closes the circuit, a failed one opens it again.
+
+Only errors of api.klout.com itself count as failures: connection
+errors, timeouts and 5xx statuses. A 404, a rate limit error or a
+hedged request cancelled once its copy won doesn't say anything about
+the health of the endpoint.
+"""
+from __future__ import with_statement
+
+try:
+    import urllib.error as urllib_error
+except ImportError:
+    import urllib2 as urllib_error
+
+from collections import deque
+
+import threading
+import time
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class _Circuit(object):  # pylint: disable=too-few-public-methods
+    """
+    State of the circuit of an endpoint
+    """
+    __slots__ = ('state', 'outcomes', 'opened_at', 'probes', 'opened',
+                 'rejected')
+
+    def __init__(self, window):
+        self.state = CLOSED
+        # True for every failed attempt of the window
+        self.outcomes = deque(maxlen=window)
+        self.opened_at = None
+        self.probes = 0
+        self.opened = 0
+        self.rejected = 0
+
+
+class CircuitBreaker(object):
+    """
+    Thread safe circuit breakers of the endpoints of the API.
+
+    * failure_rate: share of failed attempts opening the circuit
+    * min_calls: attempts needed before the failure rate is trusted
+    * window: number of recent attempts the failure rate is computed on
+    * cooldown: seconds an open circuit waits before letting probes
+      through
+    * probes: calls let through at a time while half-open
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, failure_rate=0.5, min_calls=10, window=50,
+                 cooldown=30, probes=1):
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window = window
+        self.cooldown = cooldown
+        self.probes = probes
+        self._lock = threading.Lock()
+        self._circuits = {}
+
+    def _circuit(self, endpoint):
+        circuit = self._circuits.get(endpoint)
+        if circuit is None:
+            circuit = self._circuits[endpoint] = _Circuit(self.window)
+        return circuit
+
+    def allow(self, endpoint):
+        """
+        Returns a `(retry_in, probe)` pair. `retry_in` is None if an
+        attempt to call `endpoint` can be made now, otherwise the number
+        of seconds before the circuit lets probes through. `probe` is True
+        if the attempt allowed is a probe of the half-open circuit.
+
+        An attempt allowed must be followed by a call to `record` or
+        `release`, passing them `probe`.
+        """
+        with self._lock:
+            circuit = self._circuit(endpoint)
+            if circuit.state == OPEN:
+                retry_in = circuit.opened_at + self.cooldown - time.time()
+                if retry_in > 0:
+                    circuit.rejected += 1
+                    return retry_in, False
+                circuit.state = HALF_OPEN
+            if circuit.state == HALF_OPEN:
+                if circuit.probes >= self.probes:
+                    circuit.rejected += 1
+                    return 0.0, False
+                circuit.probes += 1
+                return None, True
+            return None, False
+
+    @staticmethod
+    def is_failure(errors):
+        """
+        Returns True if the `HTTPError` or `URLError` `errors` an attempt
+        failed with says the endpoint is unhealthy
+        """
+        if not isinstance(errors, urllib_error.URLError):
+            return False
+        code = getattr(errors, 'code', None)
+        return code is None or code >= 500
+
+    def record(self, endpoint, errors=None, probe=False):
+        """
+        Records the outcome of an attempt to call `endpoint`: a success,
+        or a failure with the `HTTPError` or `URLError` `errors`. `probe`
+        is the one `allow` returned for the attempt.
+        """
+        failed = errors is not None and self.is_failure(errors)
+        with self._lock:
+            circuit = self._circuit(endpoint)
+            if circuit.state == HALF_OPEN and probe:
+                circuit.probes = max(0, circuit.probes - 1)
+                if failed:
+                    self._open(circuit)
+                else:
+                    self._close(circuit)
+            elif circuit.state == CLOSED:
+                circuit.outcomes.append(failed)
+                if failed and len(circuit.outcomes) >= self.min_calls and \
+                        sum(circuit.outcomes) >= \
+                        self.failure_rate * len(circuit.outcomes):
+                    self._open(circuit)
+            # Otherwise the attempt was allowed before the circuit opened,
+            # its outcome is out of date
+
+    def release(self, endpoint, probe=False):
+        """
+        Ends an attempt to call `endpoint` which was interrupted, without
+        recording an outcome. `probe` is the one `allow` returned for the
+        attempt.
+        """
+        with self._lock:
+            circuit = self._circuit(endpoint)
+            if circuit.state == HALF_OPEN and probe:
+                circuit.probes = max(0, circuit.probes - 1)
+
+    @staticmethod
+    def _open(circuit):
+        circuit.state = OPEN
+        circuit.opened_at = time.time()
+        circuit.opened += 1
+        circuit.probes = 0
+        circuit.outcomes.clear()
+
+    @staticmethod
+    def _close(circuit):
+        circuit.state = CLOSED
+        circuit.probes = 0
+        circuit.outcomes.clear()
+
+    def state(self, endpoint):
+        """
+        Returns the state of the circuit of `endpoint`: `'closed'`,
+        `'open'` or `'half_open'`
+        """
+        with self._lock:
+            circuit = self._circuits.get(endpoint)
+            if circuit is None:
+                return CLOSED
+            if circuit.state == OPEN and \
+                    circuit.opened_at + self.cooldown <= time.time():
+                return HALF_OPEN
+            return circuit.state
+
+    def reset(self, endpoint=None):
+        """
+        Closes the circuit of `endpoint`, or of every endpoint
+        """
+        with self._lock:
+            if endpoint is None:
+                self._circuits.clear()
+            else:
+                self._circuits.pop(endpoint, None)
+
+    def stats(self):
+        """
+        Returns a dict of the circuit of every endpoint called: its
+        `state`, the `calls` and `failures` of the window, the number of
+        times it `opened`, the calls `rejected` and, when open, the
+        seconds left before it lets probes through as `retry_in`
+        """
+        now = time.time()
+        with self._lock:
+            stats = {}
+            for endpoint, circuit in self._circuits.items():
+                state, retry_in = circuit.state, None
+                if state == OPEN:
+                    retry_in = circuit.opened_at + self.cooldown - now
+                    if retry_in <= 0:
+                        state, retry_in = HALF_OPEN, None
+                stats[endpoint] = {'state': state,
+                                   'calls': len(circuit.outcomes),
+                                   'failures': sum(circuit.outcomes),
+                                   'opened': circuit.opened,
+                                   'rejected': circuit.rejected,
+                                   'retry_in': retry_in}
+        return stats
+
+__all__ = ["CircuitBreaker"]
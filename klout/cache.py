@@ -0,0 +1,307 @@
+# -*- coding: utf-8 -*-
+
+"""
+Response caches for `Klout` objects.
+
+A cache is any object with the two methods below, keys being the uri of
+a call without the developer key (e.g. `v2/user.json/11747/score`) and
+`endpoint` the dotted name of the API function (e.g. `user.score`)::
+
+    cache.get(key)                    # cached result or None
+    cache.set(key, value, endpoint)
+
+Results returned from a cache are shared between callers and must be
+treated as read-only.
+
+Two caches are provided: `LRUCache`, in memory, and `DiskCache`, an
+SQLite database that several processes can share and that survives
+restarts.
+"""
+from __future__ import with_statement
+
+try:
+    from collections import OrderedDict
+except ImportError:
+    from ordereddict import OrderedDict
+
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
+import os
+import sqlite3
+import threading
+import time
+
+from .lazy import json_default
+
+
+class _TTLCache(object):  # pylint: disable=too-few-public-methods
+    """
+    Per endpoint TTLs of a cache: `ttl` is the default time to live in
+    seconds, `ttls` overrides it per endpoint or per resource.
+    """
+
+    DEFAULT_TTLS = {'identity': 86400}
+
+    def __init__(self, ttl=300, ttls=None):
+        self.ttl = ttl
+        if ttls is None:
+            ttls = self.DEFAULT_TTLS
+        self.ttls = dict(ttls)
+
+    def ttl_for(self, endpoint):
+        """
+        Returns the TTL of `endpoint`
+        """
+        if endpoint in self.ttls:
+            return self.ttls[endpoint]
+        return self.ttls.get(endpoint.split('.')[0], self.ttl)
+
+
+class LRUCache(_TTLCache):
+    """
+    Thread safe in-memory cache with LRU eviction and per endpoint TTLs.
+
+    At most `maxsize` results are kept. `ttl` is the default time to
+    live in seconds, `ttls` overrides it per endpoint (`user.score`) or
+    per resource (`identity`)::
+
+        cache = LRUCache(maxsize=10000, ttl=60,
+                         ttls={'identity': 86400, 'user.topics': 3600})
+        k = Klout('YOUR_KEY_HERE', cache=cache)
+
+    A TTL of 0 disables caching for that endpoint.
+    """
+
+    def __init__(self, maxsize=1024, ttl=300, ttls=None):
+        _TTLCache.__init__(self, ttl, ttls)
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._data = OrderedDict()
+        self._stats = {'hits': 0, 'misses': 0,
+                       'evictions': 0, 'expirations': 0}
+
+    def get(self, key):
+        """
+        Returns the result cached for `key` or None
+        """
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self._stats['misses'] += 1
+                return None
+            value, expires = item
+            if expires <= time.time():
+                del self._data[key]
+                self._stats['expirations'] += 1
+                self._stats['misses'] += 1
+                return None
+            # Mark as recently used
+            del self._data[key]
+            self._data[key] = item
+            self._stats['hits'] += 1
+            return value
+
+    def set(self, key, value, endpoint):
+        """
+        Caches `value` for `key` for the TTL of `endpoint`
+        """
+        ttl = self.ttl_for(endpoint)
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = (value, time.time() + ttl)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def clear(self):
+        """
+        Removes all cached results
+        """
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        """
+        Returns a dict of `hits`, `misses`, `evictions` (dropped to keep
+        the cache under `maxsize`), `expirations` and current `size`.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = len(self._data)
+        return stats
+
+    def __len__(self):
+        return len(self._data)
+
+
+class DiskCache(_TTLCache):
+    """
+    Cache stored in an SQLite database at `path`, with per endpoint TTLs
+    like `LRUCache`::
+
+        cache = DiskCache('klout-cache.db', max_bytes=256 * 1024 * 1024)
+        k = Klout('YOUR_KEY_HERE', cache=cache)
+
+    Any number of threads and processes can use the same database: it
+    is opened in WAL mode so readers never wait for writers, and writers
+    wait up to `busy_timeout` seconds for each other.
+
+    Results take at most about `max_bytes` bytes (None for no limit).
+    Every `compact_every` writes, expired results are deleted and, if
+    the cache is still too big, the results closest to expiring are
+    evicted until it uses 90% of `max_bytes`. `compact` can also be
+    called at any time.
+
+    Results are stored as JSON, so they come back as plain dicts and
+    lists even when they were `klout.lazy` results.
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, path, ttl=300, ttls=None, max_bytes=None,
+                 compact_every=1000, busy_timeout=30):
+        _TTLCache.__init__(self, ttl, ttls)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.compact_every = compact_every
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._stats = {'hits': 0, 'misses': 0,
+                       'evictions': 0, 'expirations': 0}
+        with self._connection() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS results ("
+                         "key TEXT PRIMARY KEY, value BLOB NOT NULL, "
+                         "expires REAL NOT NULL, size INTEGER NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS results_expires "
+                         "ON results (expires)")
+
+    def _connection(self):
+        """
+        Returns the connection of the current thread, opening it if
+        needed (sqlite connections can't be shared between threads nor
+        survive a fork)
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _count(self, stat, value=1):
+        with self._lock:
+            self._stats[stat] += value
+
+    def get(self, key):
+        """
+        Returns the result cached for `key` or None
+        """
+        row = self._connection().execute(
+            "SELECT value, expires FROM results WHERE key = ?",
+            (key,)).fetchone()
+        if row is None:
+            self._count('misses')
+            return None
+        value, expires = row
+        if expires <= time.time():
+            # Deleted by the next compaction
+            self._count('expirations')
+            self._count('misses')
+            return None
+        self._count('hits')
+        return json.loads(bytes(value).decode('utf8'))
+
+    def set(self, key, value, endpoint):
+        """
+        Caches `value` for `key` for the TTL of `endpoint`
+        """
+        ttl = self.ttl_for(endpoint)
+        if ttl <= 0:
+            return
+        data = json.dumps(value, default=json_default).encode('utf8')
+        with self._connection() as conn:
+            conn.execute("INSERT OR REPLACE INTO results "
+                         "(key, value, expires, size) VALUES (?, ?, ?, ?)",
+                         (key, sqlite3.Binary(data), time.time() + ttl,
+                          len(key) + len(data)))
+        with self._lock:
+            self._writes += 1
+            compact = self._writes % self.compact_every == 0
+        if compact:
+            self.compact()
+
+    def compact(self, vacuum=False):
+        """
+        Deletes expired results and evicts results over `max_bytes`. If
+        `vacuum` is True the database file is also shrunk, which blocks
+        other processes while it runs.
+        """
+        with self._connection() as conn:
+            expired = conn.execute("DELETE FROM results WHERE expires <= ?",
+                                   (time.time(),)).rowcount
+            self._count('expirations', max(expired, 0))
+            if self.max_bytes is not None:
+                total = conn.execute(
+                    "SELECT COALESCE(SUM(size), 0) FROM results"
+                    ).fetchone()[0]
+                if total > self.max_bytes:
+                    evicted = 0
+                    target = total - self.max_bytes * 0.9
+                    rows = conn.execute(
+                        "SELECT key, size FROM results ORDER BY expires"
+                        ).fetchall()
+                    keys = []
+                    for key, size in rows:
+                        if evicted >= target:
+                            break
+                        keys.append((key,))
+                        evicted += size
+                    conn.executemany("DELETE FROM results WHERE key = ?",
+                                     keys)
+                    self._count('evictions', len(keys))
+        if vacuum:
+            self._connection().execute("VACUUM")
+
+    def clear(self):
+        """
+        Removes all cached results
+        """
+        with self._connection() as conn:
+            conn.execute("DELETE FROM results")
+
+    def stats(self):
+        """
+        Returns a dict of this object's `hits`, `misses`, `evictions` and
+        `expirations`, along with the number of results in the database
+        (`size`, expired ones included) and their total `bytes`
+        """
+        size, total = self._connection().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results"
+            ).fetchone()
+        with self._lock:
+            stats = dict(self._stats)
+        stats['size'] = size
+        stats['bytes'] = total
+        return stats
+
+    def __len__(self):
+        return self.stats()['size']
+
+    def close(self):
+        """
+        Closes the connection of the current thread
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+__all__ = ["LRUCache", "DiskCache"]
@@ -0,0 +1,309 @@
+# -*- coding: utf-8 -*-
+
+"""
+Command line bulk runner.
+
+Reads identities from a file or stdin, fetches their scores (or other
+resources of the `user` resource) and writes one JSON object per input
+row::
+
+    $ klout --key YOUR_KEY_HERE -i screen_names.txt -o scores.ndjson \\
+            --resource score,topics --concurrency 20 --rate 10 \\
+            --checkpoint scores.checkpoint
+
+    $ cut -d, -f3 users.csv | python -m klout -k YOUR_KEY_HERE --ids
+
+Inputs are one identity per line, a CSV file with a header row or
+NDJSON (`--format`, guessed from the file name by default). `--column`
+names the CSV column or JSON field holding the identity, by default the
+one named after `--type` or else the first column.
+
+Every output row has the `input`, its `kloutId` and one member per
+resource, or an `error`. Rows are written in input order. With
+`--checkpoint`, progress is saved regularly and an interrupted run
+started again with the same arguments resumes where it stopped. A
+throughput summary is printed on stderr at the end.
+"""
+from __future__ import with_statement
+
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
+import csv
+import optparse
+import os
+import sys
+import time
+
+from .api import Klout, KloutError
+from .lazy import json_default
+from .pipeline import Pipeline
+from .pool import ConnectionPool
+from .ratelimit import RateLimiter
+from .retry import Retry
+from .timeout import Timeout
+
+FORMATS = ('lines', 'csv', 'ndjson')
+TYPES = ('screenName', 'kloutId', 'tw', 'gp')
+
+
+def _parser():
+    parser = optparse.OptionParser(
+        usage="%prog [options]",
+        description="Fetches Klout resources for the identities read from "
+                    "a file or stdin, and writes them as NDJSON.")
+    parser.add_option('-k', '--key', action='append', default=[],
+                      help="developer key, repeat to spread calls over "
+                           "several keys (default: $KLOUT_KEY)")
+    parser.add_option('-i', '--input', default='-',
+                      help="input file, - for stdin (default)")
+    parser.add_option('-o', '--output', default='-',
+                      help="output file, - for stdout (default)")
+    parser.add_option('-f', '--format', choices=FORMATS,
+                      help="input format: %s (default: from the input "
+                           "file name, else lines)" % ', '.join(FORMATS))
+    parser.add_option('-t', '--type', choices=TYPES, default='screenName',
+                      help="kind of identities read: %s (default: "
+                           "screenName)" % ', '.join(TYPES))
+    parser.add_option('--ids', action='store_const', dest='type',
+                      const='kloutId', help="same as --type kloutId")
+    parser.add_option('--column',
+                      help="CSV column or JSON field holding the identity")
+    parser.add_option('-r', '--resource', default='score',
+                      help="comma separated resources of the user "
+                           "resource to fetch (default: score)")
+    parser.add_option('-c', '--concurrency', type='int', default=10,
+                      help="requests in flight (default: 10)")
+    parser.add_option('--rate', type='float',
+                      help="maximum calls per second")
+    parser.add_option('--per-day', type='int',
+                      help="maximum calls per day")
+    parser.add_option('--retry', type='int', default=3,
+                      help="retries of transient errors (default: 3)")
+    parser.add_option('--timeout', type='float', default=30,
+                      help="seconds allowed per call (default: 30)")
+    parser.add_option('--checkpoint',
+                      help="file recording progress, to resume an "
+                           "interrupted run")
+    parser.add_option('--checkpoint-every', type='int', default=100,
+                      help="rows between two checkpoints (default: 100)")
+    parser.add_option('--secure', action='store_true', default=False,
+                      help="use HTTPS")
+    parser.add_option('--domain', default='api.klout.com',
+                      help=optparse.SUPPRESS_HELP)
+    return parser
+
+
+def _guess_format(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.csv':
+        return 'csv'
+    if extension in ('.ndjson', '.jsonl', '.json'):
+        return 'ndjson'
+    return 'lines'
+
+
+def read_identities(lines, fmt='lines', column=None, kind='screenName'):
+    """
+    Yields the identities of the input `lines` in format `fmt`, skipping
+    empty ones
+    """
+    if fmt == 'csv':
+        reader = csv.reader(lines)
+        header = next(reader, None)
+        if header is None:
+            return
+        if column is None:
+            column = kind if kind in header else header[0]
+        if column not in header:
+            raise ValueError("No column %r in %s" % (column, header))
+        index = header.index(column)
+        values = (row[index] if len(row) > index else ''
+                  for row in reader)
+    elif fmt == 'ndjson':
+        values = (json.loads(line).get(column or kind, '')
+                  for line in lines if line.strip())
+    else:
+        values = lines
+    for value in values:
+        if not hasattr(value, 'strip'):
+            value = str(value)
+        value = value.strip()
+        if value:
+            yield value
+
+
+def _load_checkpoint(path):
+    """
+    Returns the `(rows, offset)` of the checkpoint at `path`, `(0, 0)` if
+    there is none
+    """
+    try:
+        with open(path) as handle:
+            checkpoint = json.load(handle)
+    except EnvironmentError:
+        return 0, 0
+    return checkpoint['rows'], checkpoint['offset']
+
+
+def _save_checkpoint(path, rows, offset):
+    """
+    Atomically records that `rows` input rows were written, up to byte
+    `offset` of the output
+    """
+    temporary = path + '.tmp'
+    with open(temporary, 'w') as handle:
+        json.dump({'rows': rows, 'offset': offset}, handle)
+    if os.name == 'nt' and os.path.exists(path):
+        os.remove(path)
+    os.rename(temporary, path)
+
+
+def _output_row(record, resources):
+    """
+    Returns the output row of a pipeline record
+    """
+    row = {'input': record['input']}
+    if 'kloutId' in record:
+        row['kloutId'] = record['kloutId']
+    for resource in resources:
+        name = 'user.' + resource
+        if name in record:
+            row[resource] = record[name]
+    if 'error' in record:
+        row['error'] = str(record['error'].errors)
+    return row
+
+
+def run(klout, identities, output, resources, kind='screenName',
+        concurrency=10, skip=0, progress=None):
+    """
+    Fetches `resources` for `identities`, writing a NDJSON row to the
+    binary file `output` for each of them, in order. The first `skip`
+    identities are left out. `progress(rows, errors)` is called after
+    every row written with the numbers written so far.
+
+    Returns the number of `(rows, errors)` written.
+    """
+    def source():
+        """
+        Yields the identities left, as pipeline inputs
+        """
+        for index, identity in enumerate(identities):
+            if index < skip:
+                continue
+            if kind in ('tw', 'gp'):
+                identity = {kind: identity}
+            yield identity
+
+    pipeline = Pipeline(klout, source(), concurrency, ordered=True)
+    if kind != 'kloutId':
+        pipeline.resolve_identity()
+    pipeline.fetch(*['user.' + resource for resource in resources])
+
+    rows = errors = 0
+    for record in pipeline:
+        row = _output_row(record, resources)
+        if isinstance(row['input'], dict):
+            row['input'] = row['input'][kind]
+        output.write(json.dumps(row, default=json_default).encode('utf8')
+                     + b'\n')
+        rows += 1
+        errors += 'error' in row
+        if progress is not None:
+            progress(rows, errors)
+    return rows, errors
+
+
+def main(argv=None):
+    """
+    Entry point of the `klout` command
+    """
+    parser = _parser()
+    options, args = parser.parse_args(argv)
+    if args:
+        parser.error("unexpected arguments: %s" % ' '.join(args))
+    keys = options.key or [key for key in
+                           [os.environ.get('KLOUT_KEY')] if key]
+    if not keys:
+        parser.error("a developer key is required, use --key or KLOUT_KEY")
+    if options.checkpoint and options.output == '-':
+        parser.error("--checkpoint requires an --output file")
+    resources = [resource.strip() for resource
+                 in options.resource.split(',') if resource.strip()]
+
+    limiter = None
+    if options.rate or options.per_day:
+        limiter = RateLimiter(per_second=options.rate,
+                              per_day=options.per_day)
+    klout = Klout(keys if len(keys) > 1 else keys[0],
+                  domain=options.domain, secure=options.secure,
+                  pool=ConnectionPool(maxsize=options.concurrency),
+                  timeout=Timeout(connect=options.timeout,
+                                  read=options.timeout,
+                                  total=options.timeout),
+                  limiter=limiter, retry=Retry(total=options.retry),
+                  identities=options.type != 'kloutId')
+
+    skip = offset = 0
+    if options.checkpoint:
+        skip, offset = _load_checkpoint(options.checkpoint)
+
+    if options.input == '-':
+        lines = sys.stdin
+    else:
+        lines = open(options.input)
+    if options.output == '-':
+        output = getattr(sys.stdout, 'buffer', sys.stdout)
+    else:
+        output = open(options.output, 'ab')
+        # Rows written after the last checkpoint are written again
+        output.seek(offset)
+        output.truncate()
+
+    written = {'rows': 0, 'errors': 0}
+
+    def progress(rows, errors):
+        """
+        Saves a checkpoint every `checkpoint_every` rows
+        """
+        written['rows'], written['errors'] = rows, errors
+        if options.checkpoint and rows % options.checkpoint_every == 0:
+            output.flush()
+            _save_checkpoint(options.checkpoint, skip + rows, output.tell())
+
+    fmt = options.format
+    if fmt is None:
+        fmt = _guess_format(options.input)
+    identities = read_identities(lines, fmt, options.column, options.type)
+
+    started = time.time()
+    status = 0
+    try:
+        run(klout, identities, output, resources, options.type,
+            options.concurrency, skip, progress)
+    except KeyboardInterrupt:
+        status = 130
+    except (KloutError, ValueError):
+        status = 1
+        sys.stderr.write("%s\n" % sys.exc_info()[1])
+    finally:
+        output.flush()
+        if options.checkpoint:
+            _save_checkpoint(options.checkpoint, skip + written['rows'],
+                             output.tell())
+        if options.output != '-':
+            output.close()
+        if options.input != '-':
+            lines.close()
+        klout.pool.close()
+
+    elapsed = max(time.time() - started, 1e-9)
+    sys.stderr.write("%d rows, %d errors in %.1fs (%.1f rows/s)\n"
+                     % (written['rows'], written['errors'], elapsed,
+                        written['rows'] / elapsed))
+    return status
+
+__all__ = ["main", "run", "read_identities"]
@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+
+"""
+Adaptive concurrency.
+
+A `Klout` object with an `AdaptiveConcurrency` limit never has more
+requests in flight than the limit allows, and the limit follows what
+api.klout.com can take (additive increase, multiplicative decrease)::
+
+    from klout import Klout, AdaptiveConcurrency
+
+    limit = AdaptiveConcurrency(initial=8, max_limit=64)
+    k = Klout('YOUR_KEY_HERE', pool=True, concurrency=limit)
+
+    # As many threads as the limit may ever allow, the limit decides how
+    # many of them have a request in flight
+    for kwargs, result in k.user.score.many(params, concurrency=64):
+        ...
+
+    print limit.stats()['limit']
+
+* every successful attempt answered quickly while the limit is in use
+  grows the limit by `increase / limit`, so roughly by `increase` once
+  per `limit` requests
+* a throttling or server error, a timeout, or an attempt much slower
+  than the median of the recent ones of its endpoint multiplies the
+  limit by `decrease`, at most once per round of requests
+
+`AsyncKlout` takes one as its `concurrency` argument.
+"""
+from __future__ import with_statement
+
+try:
+    import urllib.error as urllib_error
+except ImportError:
+    import urllib2 as urllib_error
+
+from collections import deque
+
+import threading
+import time
+
+# Latencies under this many seconds are never taken as congestion
+_MIN_LATENCY = 0.01
+
+
+class AdaptiveConcurrency(object):
+    """
+    Thread safe AIMD limit on the number of requests in flight.
+
+    * initial, min_limit, max_limit: starting limit and its bounds
+    * increase: additive increase, spread over a round of `limit`
+      successful requests
+    * decrease: factor applied to the limit on congestion
+    * latency_tolerance: an attempt slower than this many times the
+      median of the last `samples` attempts of its endpoint is taken as
+      congestion
+    * statuses: HTTP statuses taken as congestion, on top of 5xx ones
+    """
+
+    STATUSES = frozenset([429])
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, initial=10, min_limit=1, max_limit=100, increase=1,
+                 decrease=0.5, latency_tolerance=3.0, samples=100,
+                 statuses=STATUSES):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_tolerance = latency_tolerance
+        self.samples = samples
+        self.statuses = frozenset(statuses)
+        self._limit = float(max(min_limit, min(initial, max_limit)))
+        self._in_flight = 0
+        self._decreased_at = 0
+        self._latencies = {}
+        self._waiters = []
+        self._cond = threading.Condition(threading.Lock())
+        self._stats = {'increases': 0, 'decreases': 0, 'max_in_flight': 0}
+
+    @property
+    def limit(self):
+        """
+        Number of requests currently allowed in flight
+        """
+        return max(self.min_limit, int(self._limit))
+
+    def try_acquire(self, waiter=None):
+        """
+        Takes a slot and returns True if a request can be sent now.
+        Otherwise returns False, and calls `waiter()` (once, from the
+        thread releasing it) the next time a slot may be available.
+        """
+        with self._cond:
+            if self._in_flight < self.limit:
+                self._in_flight += 1
+                if self._in_flight > self._stats['max_in_flight']:
+                    self._stats['max_in_flight'] = self._in_flight
+                return True
+            if waiter is not None:
+                self._waiters.append(waiter)
+            return False
+
+    def acquire(self, max_wait=None):
+        """
+        Takes a slot once a request can be sent, returns False if none is
+        free within `max_wait` seconds
+        """
+        deadline = None
+        if max_wait is not None:
+            deadline = time.time() + max_wait
+        with self._cond:
+            while self._in_flight >= self.limit:
+                if deadline is None:
+                    self._cond.wait()
+                else:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        return False
+                    self._cond.wait(remaining)
+            self._in_flight += 1
+            if self._in_flight > self._stats['max_in_flight']:
+                self._stats['max_in_flight'] = self._in_flight
+            return True
+
+    def is_congestion(self, errors):
+        """
+        Returns True if the `HTTPError` or `URLError` `errors` an attempt
+        failed with means too many requests are in flight
+        """
+        if not isinstance(errors, urllib_error.URLError):
+            return False
+        code = getattr(errors, 'code', None)
+        return code is None or code >= 500 or code in self.statuses
+
+    def release(self, endpoint, started=None, errors=None):
+        """
+        Frees the slot of an attempt to call `endpoint` started at
+        `started`, which succeeded or failed with the `HTTPError` or
+        `URLError` `errors`, and adjusts the limit. With `started` None the
+        attempt was interrupted and the limit is left alone.
+        """
+        now = time.time()
+        with self._cond:
+            busy = self._in_flight >= self.limit
+            self._in_flight -= 1
+            if started is not None:
+                if errors is not None:
+                    if self.is_congestion(errors):
+                        self._decrease(started, now)
+                elif self._slow(endpoint, now - started):
+                    self._decrease(started, now)
+                elif busy:
+                    # Only grow a limit which is actually reached
+                    self._limit = min(self.max_limit,
+                                      self._limit + self.increase /
+                                      self._limit)
+                    self._stats['increases'] += 1
+            self._cond.notify_all()
+            waiters, self._waiters = self._waiters, []
+        for waiter in waiters:
+            waiter()
+
+    def _slow(self, endpoint, elapsed):
+        """
+        Records the latency of a successful attempt, returns True if it's
+        much slower than the recent ones
+        """
+        latencies = self._latencies.get(endpoint)
+        if latencies is None:
+            latencies = self._latencies[endpoint] = \
+                deque(maxlen=self.samples)
+        slow = False
+        if latencies:
+            # The median, unlike the fastest attempt, isn't moved by the
+            # odd lucky request, so ordinary jitter isn't congestion
+            ordered = sorted(latencies)
+            typical = max(ordered[len(ordered) // 2], _MIN_LATENCY)
+            slow = elapsed > typical * self.latency_tolerance
+        latencies.append(elapsed)
+        return slow
+
+    def _decrease(self, started, now):
+        # Attempts started before the last decrease saw the old limit,
+        # they don't decrease it again
+        if started < self._decreased_at:
+            return
+        self._decreased_at = now
+        self._limit = max(self.min_limit, self._limit * self.decrease)
+        self._stats['decreases'] += 1
+
+    def stats(self):
+        """
+        Returns a dict of the current `limit`, requests `in_flight`, the
+        `max_in_flight` reached and the number of `increases` and
+        `decreases` of the limit
+        """
+        with self._cond:
+            stats = dict(self._stats)
+            stats['limit'] = self.limit
+            stats['in_flight'] = self._in_flight
+        return stats
+
+__all__ = ["AdaptiveConcurrency"]
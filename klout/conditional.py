@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+
+"""
+Conditional requests.
+
+A `Klout` object with a `ValidatorCache` remembers the `ETag` and
+`Last-Modified` headers of responses, sends them back as
+`If-None-Match` and `If-Modified-Since` the next time the same call is
+made, and reuses the result it already has when api.klout.com answers
+`304 Not Modified`::
+
+    from klout import Klout, LRUCache, ValidatorCache
+
+    k = Klout('YOUR_KEY_HERE', cache=LRUCache(ttl=60),
+              validators=ValidatorCache())
+
+Results are fresh for a minute, then revalidated: unchanged ones aren't
+downloaded nor decoded again.
+"""
+from __future__ import with_statement
+
+try:
+    from collections import OrderedDict
+except ImportError:
+    from ordereddict import OrderedDict
+
+import threading
+
+
+class Validated(object):  # pylint: disable=too-few-public-methods
+    """
+    Validators of the last response to the call `key`, along with its
+    decoded `result`. `etag` and `last_modified` are None when unknown.
+    """
+    __slots__ = ('key', 'etag', 'last_modified', 'result')
+
+    def __init__(self, key, etag=None, last_modified=None, result=None):
+        self.key = key
+        self.etag = etag
+        self.last_modified = last_modified
+        self.result = result
+
+    def headers(self):
+        """
+        Returns the headers making a request conditional
+        """
+        headers = {}
+        if self.etag is not None:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified is not None:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+class ValidatorCache(object):
+    """
+    Thread safe store of the validators and results of at most
+    `maxsize` calls, evicting the least recently used.
+    """
+
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._data = OrderedDict()
+        self._stats = {'conditional': 0, 'not_modified': 0}
+
+    def lookup(self, key):
+        """
+        Returns the `Validated` of call `key`, with no validators if it
+        wasn't made yet
+        """
+        with self._lock:
+            validated = self._data.get(key)
+            if validated is None:
+                return Validated(key)
+            self._stats['conditional'] += 1
+            return validated
+
+    def update(self, validated, headers, result):
+        """
+        Remembers the validators in the response `headers` of the call
+        `validated` was looked up for, with its `result`
+        """
+        etag = headers.get('ETag')
+        last_modified = headers.get('Last-Modified')
+        with self._lock:
+            self._data.pop(validated.key, None)
+            if etag is None and last_modified is None:
+                return
+            self._data[validated.key] = Validated(validated.key, etag,
+                                                  last_modified, result)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def not_modified(self, validated):
+        """
+        Returns the result of `validated`, to which the server answered
+        `304 Not Modified`
+        """
+        with self._lock:
+            self._stats['not_modified'] += 1
+            if self._data.get(validated.key) is validated:
+                # Mark as recently used
+                del self._data[validated.key]
+                self._data[validated.key] = validated
+        return validated.result
+
+    def clear(self):
+        """
+        Forgets all validators
+        """
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        """
+        Returns a dict of `conditional` requests sent, `not_modified`
+        responses received and current `size`
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = len(self._data)
+        return stats
+
+    def __len__(self):
+        return len(self._data)
+
+__all__ = ["ValidatorCache"]
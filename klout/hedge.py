@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+
+"""
+Hedged requests.
+
+A `Klout` object with a `Hedge` sends a second copy of a call that is
+taking unusually long, and returns whichever copy answers first; the
+other one is cancelled::
+
+    from klout import Klout, ConnectionPool, Hedge
+
+    # Hedge after the 95th percentile latency of each endpoint, at most
+    # for 5% of the calls
+    k = Klout('YOUR_KEY_HERE', pool=ConnectionPool(),
+              hedge=Hedge(percentile=0.95, max_rate=0.05))
+
+    # Hedge calls still running after 200ms
+    k = Klout('YOUR_KEY_HERE', hedge=Hedge(delay=0.2))
+
+Slow responses usually come from a slow connection or server, so the
+copy, sent on another connection, often answers first and cuts the tail
+latency for a small increase in the number of requests.
+"""
+from __future__ import with_statement
+
+from collections import deque
+
+import threading
+
+
+class Hedge(object):
+    """
+    Thread safe hedging policy.
+
+    * delay: seconds after which a call is hedged, None to use the
+      `percentile` of the latencies of the last `samples` calls to the
+      same endpoint (calls aren't hedged until `min_samples` are known)
+    * max_rate: fraction of the calls which may be hedged; up to
+      `burst` hedges can be saved up
+    * min_delay: lower bound of the adaptive delay
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, delay=None, percentile=0.95, max_rate=0.05,
+                 burst=10, samples=200, min_samples=20, min_delay=0.005):
+        self.delay = delay
+        self.percentile = percentile
+        self.max_rate = max_rate
+        self.burst = burst
+        self.samples = samples
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self._lock = threading.Lock()
+        self._budget = 0.0
+        self._latencies = {}
+        self._delays = {}
+        self._stats = {'calls': 0, 'hedged': 0, 'hedge_wins': 0}
+
+    def delay_for(self, endpoint):
+        """
+        Returns the delay after which a call to `endpoint` is hedged, or
+        None if it shouldn't be. Counts the call towards the hedge
+        budget.
+        """
+        with self._lock:
+            self._stats['calls'] += 1
+            self._budget = min(self.burst, self._budget + self.max_rate)
+            if self.delay is not None:
+                return self.delay
+            return self._delays.get(endpoint)
+
+    def allow(self):
+        """
+        Returns True, and takes it from the budget, if a call can be
+        hedged now
+        """
+        with self._lock:
+            if self._budget < 1:
+                return False
+            self._budget -= 1
+            self._stats['hedged'] += 1
+            return True
+
+    def record(self, endpoint, elapsed, hedge_won=False):
+        """
+        Records the latency of a successful call to `endpoint`
+        """
+        with self._lock:
+            if hedge_won:
+                self._stats['hedge_wins'] += 1
+            if self.delay is not None:
+                return
+            latencies = self._latencies.get(endpoint)
+            if latencies is None:
+                latencies = self._latencies[endpoint] = \
+                    deque(maxlen=self.samples)
+            latencies.append(elapsed)
+            count = len(latencies)
+            # Sorting is cheap but not free, refresh the delay now and then
+            if count >= self.min_samples and \
+                    (endpoint not in self._delays or count % 16 == 0):
+                ordered = sorted(latencies)
+                index = min(count - 1, int(count * self.percentile))
+                self._delays[endpoint] = max(self.min_delay,
+                                             ordered[index])
+
+    def stats(self):
+        """
+        Returns a dict of `calls` made, `hedged` calls, `hedge_wins`
+        (hedged calls answered by the copy first) and the current
+        adaptive `delays` per endpoint
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats['delays'] = dict(self._delays)
+        return stats
+
+__all__ = ["Hedge"]
@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+
+"""
+Instrumentation hooks.
+
+Objects passed as `hooks` to `Klout` are told about every request sent
+to api.klout.com (retries included, cache hits excluded)::
+
+    from klout import Klout, Hooks
+
+    class LogErrors(Hooks):
+        def on_error(self, event):
+            print event.endpoint, event.status, event.error
+
+    k = Klout('YOUR_KEY_HERE', hooks=LogErrors())
+
+`MetricsCollector` is a ready made hook aggregating latency histograms
+per endpoint, for export to a metrics system::
+
+    metrics = MetricsCollector()
+    k = Klout('YOUR_KEY_HERE', hooks=[metrics, LogErrors()])
+    ...
+    print metrics.snapshot()['user.score']['latency']
+
+Each request is described by a `RequestEvent` whose `phases` splits the
+time it took into:
+
+* wait: waiting for the rate limiter or for a pooled connection
+* connect: opening a connection, DNS and TLS handshake included
+* ttfb: sending the request and waiting for the response headers
+* download: reading the response body
+* decompress: gunzipping the body
+* decode: decoding the JSON
+
+Phases a request didn't go through (such as `connect` on a reused
+connection) are missing. Streamed calls are reported once their
+response headers are received, without `download` and later phases.
+"""
+from __future__ import with_statement
+
+import threading
+import time
+
+
+class RequestEvent(object):  # pylint: disable=too-many-instance-attributes
+    """
+    A request to api.klout.com.
+
+    * endpoint: dotted name of the API function, such as `'user.score'`
+    * attempt: 1 for the first attempt of a call, 2 for its first retry...
+    * started: time the request started at
+    * elapsed: seconds the request took, once it's over
+    * phases: dict of seconds spent in each phase
+    * status: HTTP status of the response, None if there was none
+    * error: the `HTTPError` or `URLError` the request failed with
+    * bytes_received: size of the body as received
+    * bytes_decoded: size of the body once decompressed
+    """
+    __slots__ = ('endpoint', 'attempt', 'started', 'elapsed', 'phases',
+                 'status', 'error', 'bytes_received', 'bytes_decoded',
+                 '_last')
+
+    def __init__(self, endpoint, attempt=1):
+        self.endpoint = endpoint
+        self.attempt = attempt
+        self.started = self._last = time.time()
+        self.elapsed = None
+        self.phases = {}
+        self.status = None
+        self.error = None
+        self.bytes_received = 0
+        self.bytes_decoded = 0
+
+    def mark(self, phase):
+        """
+        Adds the time since the previous mark to `phase`
+        """
+        now = time.time()
+        self.phases[phase] = self.phases.get(phase, 0.0) + now - self._last
+        self._last = now
+
+    def finish(self, error=None):
+        """
+        Records the end of the request, failed with `error` if not None
+        """
+        self.elapsed = time.time() - self.started
+        if error is not None:
+            self.error = error
+            self.status = getattr(error, 'code', None)
+
+    def __repr__(self):
+        return "RequestEvent(%r, attempt=%r, status=%r, elapsed=%r)" % (
+            self.endpoint, self.attempt, self.status, self.elapsed)
+
+
+class Hooks(object):
+    """
+    Base class of hooks, doing nothing. Override the methods of interest.
+    """
+
+    def before_request(self, event):
+        """
+        Called before a request is sent
+        """
+        pass
+
+    def after_response(self, event):
+        """
+        Called once a request succeeded
+        """
+        pass
+
+    def on_error(self, event):
+        """
+        Called when a request failed
+        """
+        pass
+
+
+class Histogram(object):
+    """
+    Cumulative histogram of observed values, Prometheus style: `counts[i]`
+    is the number of values lower than or equal to `buckets[i]`.
+    """
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        """
+        Records `value`
+        """
+        self.count += 1
+        self.sum += value
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+
+    def to_dict(self):
+        """
+        Returns the histogram as a dict of `buckets` (pairs of upper bound
+        and count), `count` and `sum`
+        """
+        return {'buckets': list(zip(self.buckets, self.counts)),
+                'count': self.count, 'sum': self.sum}
+
+
+class MetricsCollector(Hooks):
+    """
+    Thread safe hook aggregating requests per endpoint.
+
+    `buckets` are the upper bounds, in seconds, of the latency histograms.
+    """
+
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def _endpoint(self, name):
+        endpoint = self._endpoints.get(name)
+        if endpoint is None:
+            endpoint = self._endpoints[name] = {
+                'requests': 0, 'errors': 0, 'statuses': {},
+                'bytes_received': 0, 'bytes_decoded': 0,
+                'latency': Histogram(self.buckets), 'phases': {}}
+        return endpoint
+
+    def _record(self, event):
+        with self._lock:
+            endpoint = self._endpoint(event.endpoint)
+            endpoint['requests'] += 1
+            if event.error is not None:
+                endpoint['errors'] += 1
+            statuses = endpoint['statuses']
+            statuses[event.status] = statuses.get(event.status, 0) + 1
+            endpoint['bytes_received'] += event.bytes_received
+            endpoint['bytes_decoded'] += event.bytes_decoded
+            endpoint['latency'].observe(event.elapsed)
+            phases = endpoint['phases']
+            for phase, seconds in event.phases.items():
+                histogram = phases.get(phase)
+                if histogram is None:
+                    histogram = phases[phase] = Histogram(self.buckets)
+                histogram.observe(seconds)
+
+    after_response = _record
+    on_error = _record
+
+    def snapshot(self):
+        """
+        Returns a dict of the stats of every endpoint: number of
+        `requests` and `errors`, count of each HTTP status in `statuses`
+        (None for requests which got no response), `bytes_received`,
+        `bytes_decoded`, the `latency` histogram and a histogram of each
+        phase in `phases`. Histograms are dicts, see `Histogram.to_dict`.
+        """
+        with self._lock:
+            snapshot = {}
+            for name, endpoint in self._endpoints.items():
+                stats = dict(endpoint)
+                stats['statuses'] = dict(endpoint['statuses'])
+                stats['latency'] = endpoint['latency'].to_dict()
+                stats['phases'] = dict(
+                    (phase, histogram.to_dict())
+                    for phase, histogram in endpoint['phases'].items())
+                snapshot[name] = stats
+            return snapshot
+
+    def reset(self):
+        """
+        Forgets everything recorded so far
+        """
+        with self._lock:
+            self._endpoints = {}
+
+__all__ = ["RequestEvent", "Hooks", "MetricsCollector"]
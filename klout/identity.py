@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+
+"""
+Identity map remembering results of the `identity` resource.
+
+Identities (twitter screenName, twitter id or google plus id to kloutId
+and back) almost never change, so a `Klout` object with an
+`IdentityMap` only asks api.klout.com once per identity::
+
+    from klout import Klout, IdentityMap
+
+    k = Klout('YOUR_KEY_HERE', identities=IdentityMap(path='identities'))
+
+    # First call hits the API, next ones (even after a restart) don't
+    score = k.resolve_and_get(screenName='erfaan', resource='score')
+
+"""
+from __future__ import with_statement
+
+try:
+    from collections import OrderedDict
+except ImportError:
+    from ordereddict import OrderedDict
+
+try:
+    import dbm
+except ImportError:
+    import anydbm as dbm
+
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
+import threading
+
+from .lazy import json_default
+
+
+class IdentityMap(object):
+    """
+    Thread safe, bounded map of identity calls to their results.
+
+    At most `maxsize` identities are kept in memory, least recently used
+    ones being dropped first. If `path` is given, identities are also
+    written to a `dbm` database at that path, which is read back when an
+    identity is not in memory. The database is not bounded.
+
+    Follows the cache interface described in `klout.cache`, so keys are
+    call uris without the developer key.
+    """
+
+    def __init__(self, maxsize=100000, path=None):
+        self.maxsize = maxsize
+        self.path = path
+        self._lock = threading.Lock()
+        self._data = OrderedDict()
+        self._db = None
+        if path is not None:
+            self._db = dbm.open(path, 'c')
+        self._stats = {'hits': 0, 'misses': 0}
+
+    def get(self, key):
+        """
+        Returns the identity stored for `key` or None
+        """
+        with self._lock:
+            value = self._data.pop(key, None)
+            if value is None and self._db is not None:
+                raw = self._db.get(key.encode('utf8'))
+                if raw is not None:
+                    value = json.loads(raw.decode('utf8'))
+            if value is None:
+                self._stats['misses'] += 1
+                return None
+            self._stats['hits'] += 1
+            self._remember(key, value)
+            return value
+
+    # pylint: disable=unused-argument
+    def set(self, key, value, endpoint=None):
+        """
+        Stores identity `value` for `key`
+        """
+        with self._lock:
+            self._data.pop(key, None)
+            self._remember(key, value)
+            if self._db is not None:
+                self._db[key.encode('utf8')] = \
+                    json.dumps(value, default=json_default).encode('utf8')
+
+    def _remember(self, key, value):
+        self._data[key] = value
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def stats(self):
+        """
+        Returns a dict of `hits`, `misses` and in-memory `size`
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = len(self._data)
+        return stats
+
+    def close(self):
+        """
+        Closes the database, if any
+        """
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+__all__ = ["IdentityMap"]
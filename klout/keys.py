@@ -0,0 +1,272 @@
+# -*- coding: utf-8 -*-
+
+"""
+Spreading calls over several developer keys.
+
+A `Klout` object created with a list of keys, or a `KeyPool`, picks a
+key for every request instead of always sending the same one::
+
+    from klout import Klout, KeyPool
+
+    k = Klout(KeyPool(['KEY_1', 'KEY_2', 'KEY_3'], policy='quota',
+                      per_second=10, per_day=20000))
+
+A key answered with a quota error (HTTP 429, or a 403 saying the key
+is over its rate) is sidelined for `cooldown` seconds, or as long as
+the `Retry-After` header asks, and the request is sent again right away
+with another key. Other errors, such as the 403 of an invalid key, are
+raised as they are.
+"""
+from __future__ import with_statement
+
+try:
+    import urllib.parse as urllib_parse
+except ImportError:
+    import urllib as urllib_parse
+
+import threading
+import time
+
+from .ratelimit import RateLimiter
+from .retry import Retry
+
+_retry_after = Retry().retry_after
+
+
+class _KeyState(object):  # pylint: disable=too-few-public-methods
+    """
+    Usage of a key
+    """
+    __slots__ = ('key', 'limiter', 'calls', 'errors', 'quota_errors',
+                 'in_flight', 'sidelined_until', 'day', 'day_calls')
+
+    def __init__(self, key, limiter):
+        self.key = key
+        self.limiter = limiter
+        self.calls = 0
+        self.errors = 0
+        self.quota_errors = 0
+        self.in_flight = 0
+        self.sidelined_until = 0
+        self.day = None
+        self.day_calls = 0
+
+    def calls_today(self, day):
+        """
+        Returns the number of calls made on `day` (days since the epoch)
+        """
+        if self.day != day:
+            return 0
+        return self.day_calls
+
+
+class KeyPool(object):
+    """
+    Thread safe pool of developer keys.
+
+    `policy` is how a key is picked among the available ones:
+
+    * round_robin: each key in turn
+    * least_used: the key with the fewest requests in flight, then the
+      fewest calls today
+    * quota: the key with the fewest calls today (so the most quota
+      left), then the fewest requests in flight
+
+    `per_second` and `per_day` are the limits of each key, None if
+    unknown. Keys over their daily limit are skipped until the next day
+    (UTC); a call waits when every key is over its per second limit.
+
+    `quota_statuses` are the HTTP statuses of quota errors. A 403 is a
+    quota error too when its reason or `X-Mashery-Error-Code` header says
+    the key is over its rate. `last_quota_error` is the last quota error
+    a key was answered with.
+    """
+
+    POLICIES = ('round_robin', 'least_used', 'quota')
+    QUOTA_STATUSES = frozenset([429])
+    # Words of the reasons ("Developer Over Rate") and Mashery error codes
+    # ("ERR_403_DEVELOPER_OVER_QPS") of quota errors
+    QUOTA_MARKERS = ('over rate', 'over qps')
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, keys, policy='round_robin', per_second=None,
+                 per_day=None, cooldown=60, quota_statuses=QUOTA_STATUSES):
+        if policy not in self.POLICIES:
+            raise ValueError("Unknown policy %r, expected one of %s"
+                             % (policy, ', '.join(self.POLICIES)))
+        if not keys:
+            raise ValueError("At least one key is required")
+        self.policy = policy
+        self.per_day = per_day
+        self.cooldown = cooldown
+        self.quota_statuses = frozenset(quota_statuses)
+        self.last_quota_error = None
+        self._lock = threading.Lock()
+        self._next = 0
+        self._states = []
+        self._by_key = {}
+        for key in keys:
+            limiter = None
+            if per_second is not None:
+                limiter = RateLimiter(per_second=per_second)
+            state = _KeyState(key, limiter)
+            self._states.append(state)
+            self._by_key[key] = state
+
+    def __len__(self):
+        return len(self._states)
+
+    def _candidates(self, now):
+        """
+        Returns the states of the keys which can be used, best first
+        """
+        day = int(now // 86400)
+        states = [state for state in self._states
+                  if state.sidelined_until <= now and
+                  (self.per_day is None or
+                   state.calls_today(day) < self.per_day)]
+        if self.policy == 'round_robin':
+            start = self._next % len(self._states)
+            states.sort(key=lambda state: (
+                self._states.index(state) - start) % len(self._states))
+        elif self.policy == 'least_used':
+            states.sort(key=lambda state: (state.in_flight,
+                                           state.calls_today(day)))
+        else:
+            states.sort(key=lambda state: (state.calls_today(day),
+                                           state.in_flight))
+        return states
+
+    def reserve(self, max_wait=None):
+        """
+        Picks a key, returns a `(key, wait)` pair where `wait` is the
+        number of seconds to wait before using it, or None if no key can
+        be used within `max_wait` seconds
+        """
+        with self._lock:
+            now = time.time()
+            candidates = self._candidates(now)
+            chosen = None
+            for state in candidates:
+                if state.limiter is None:
+                    chosen, wait = state, 0.0
+                    break
+                wait = state.limiter.reserve(0)
+                if wait is not None:
+                    chosen = state
+                    break
+            else:
+                # Every key is over its per second limit
+                for state in candidates:
+                    wait = state.limiter.reserve(max_wait)
+                    if wait is not None:
+                        chosen = state
+                        break
+            if chosen is None:
+                return None
+
+            day = int(now // 86400)
+            if chosen.day != day:
+                chosen.day = day
+                chosen.day_calls = 0
+            chosen.day_calls += 1
+            chosen.calls += 1
+            chosen.in_flight += 1
+            self._next = self._states.index(chosen) + 1
+            return chosen.key, wait
+
+    def acquire(self, max_wait=None):
+        """
+        Returns a key once it can be used, None if no key can be used
+        within `max_wait` seconds
+        """
+        reserved = self.reserve(max_wait)
+        if reserved is None:
+            return None
+        key, wait = reserved
+        if wait:
+            time.sleep(wait)
+        return key
+
+    def release(self, key, error=None):
+        """
+        Releases `key` after a request, failed with the `HTTPError` or
+        `URLError` `error` if not None. Returns True if `error` is a quota
+        error, in which case the key was sidelined.
+        """
+        with self._lock:
+            state = self._by_key[key]
+            state.in_flight -= 1
+            if error is None:
+                return False
+            state.errors += 1
+            if not self.is_quota_error(error):
+                return False
+            state.quota_errors += 1
+            self.last_quota_error = error
+            cooldown = _retry_after(error)
+            if cooldown is None:
+                cooldown = self.cooldown
+            state.sidelined_until = time.time() + cooldown
+            return True
+
+    def is_quota_error(self, error):
+        """
+        Returns True if the `HTTPError` or `URLError` `error` says the key
+        is over quota
+        """
+        code = getattr(error, 'code', None)
+        if code in self.quota_statuses:
+            return True
+        if code != 403:
+            return False
+        headers = getattr(error, 'hdrs', None) or {}
+        text = ('%s %s' % (getattr(error, 'msg', ''),
+                           headers.get('X-Mashery-Error-Code', '')))
+        text = text.lower().replace('_', ' ')
+        return any(marker in text for marker in self.QUOTA_MARKERS)
+
+    def retry_in(self):
+        """
+        Returns the number of seconds before a key can be used again,
+        0 if one can be used now
+        """
+        with self._lock:
+            now = time.time()
+            day = int(now // 86400)
+            available = []
+            for state in self._states:
+                when = state.sidelined_until
+                if self.per_day is not None and \
+                        state.calls_today(day) >= self.per_day:
+                    when = max(when, (day + 1) * 86400)
+                available.append(when)
+            return max(0.0, min(available) - now)
+
+    @staticmethod
+    def sign(url, key):
+        """
+        Returns `url` with the developer `key` added to its query
+        """
+        separator = '&' if '?' in url else '?'
+        return url + separator + urllib_parse.urlencode({'key': key})
+
+    def stats(self):
+        """
+        Returns a dict of the usage of every key: total `calls`, `today`
+        calls, `errors`, `quota_errors`, requests `in_flight` and seconds
+        left while `sidelined`
+        """
+        with self._lock:
+            now = time.time()
+            day = int(now // 86400)
+            return dict(
+                (state.key, {'calls': state.calls,
+                             'today': state.calls_today(day),
+                             'errors': state.errors,
+                             'quota_errors': state.quota_errors,
+                             'in_flight': state.in_flight,
+                             'sidelined': max(0, state.sidelined_until - now)})
+                for state in self._states)
+
+__all__ = ["KeyPool"]
@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+
+"""
+Lazy results.
+
+A `Klout` object created with `lazy=True` doesn't decode responses into
+dicts and lists up front::
+
+    k = Klout('YOUR_KEY_HERE', lazy=True)
+    score = k.user.score(kloutId='11747')
+    print score.score, score.get('scoreDelta').dayChange
+
+* results of known shapes are compact `Record` objects: `Score` for
+  `user.score` and `Identity` for `identity` calls
+* other JSON objects are returned as a `LazyObject`, which decodes the
+  members of the response one at a time and only as far as needed to
+  answer the lookups made
+* lists are decoded as usual
+
+Records and lazy objects are read-only mappings: `result['score']`,
+`result.get('score')`, `'score' in result`, `dict(result)` and
+comparisons with dicts work as with decoded results.
+"""
+
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
+import re
+
+from .stream import CHUNK_SIZE, iter_body
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_DECODER = json.JSONDecoder()
+
+
+class _Mapping(object):
+    """
+    Read-only mapping methods, built on `__getitem__` and `keys`
+    """
+    __slots__ = ()
+
+    def get(self, key, default=None):
+        """
+        Returns the value of `key`, or `default` if there is none
+        """
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key):
+        try:
+            self[key]
+        except KeyError:
+            return False
+        return True
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def items(self):
+        """
+        Returns the list of `(key, value)` pairs
+        """
+        return [(key, self[key]) for key in self.keys()]
+
+    def values(self):
+        """
+        Returns the list of values
+        """
+        return [self[key] for key in self.keys()]
+
+    def __eq__(self, other):
+        if isinstance(other, _Mapping):
+            other = dict(other.items())
+        return dict(self.items()) == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return "%s(%r)" % (type(self).__name__, dict(self.items()))
+
+
+class Record(_Mapping):
+    """
+    Base class of the results of known shapes. Fields are both
+    attributes and keys.
+    """
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def keys(self):
+        """
+        Returns the list of fields
+        """
+        return list(self.__slots__)
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Returns a record of the decoded object `data`, None if its fields
+        aren't those of the record
+        """
+        if not isinstance(data, dict) or len(data) != len(cls.__slots__):
+            return None
+        record = object.__new__(cls)
+        for name in cls.__slots__:
+            if name not in data:
+                return None
+            object.__setattr__(record, name, data[name])
+        return record
+
+    def __setattr__(self, name, value):
+        raise AttributeError("%s is read-only" % type(self).__name__)
+
+
+class ScoreDelta(Record):  # pylint: disable=too-few-public-methods
+    """
+    `scoreDelta` of a `Score`
+    """
+    __slots__ = ('dayChange', 'monthChange')
+
+
+class Score(Record):  # pylint: disable=too-few-public-methods
+    """
+    Result of `user.score`
+    """
+    __slots__ = ('score', 'scoreDelta')
+
+    @classmethod
+    def from_dict(cls, data):
+        record = super(Score, cls).from_dict(data)
+        if record is not None:
+            delta = ScoreDelta.from_dict(record.scoreDelta)
+            if delta is None:
+                return None
+            object.__setattr__(record, 'scoreDelta', delta)
+        return record
+
+
+class Identity(Record):  # pylint: disable=too-few-public-methods
+    """
+    Result of `identity` calls
+    """
+    __slots__ = ('id', 'network')
+
+
+# (endpoint name prefix, record class)
+RECORDS = (('user.score', Score), ('identity.', Identity))
+
+
+class LazyObject(_Mapping):
+    """
+    Read-only mapping over the text `raw` of a JSON object, decoding its
+    members in order the first time one of them is looked up.
+
+    Lookups only decode the members up to the one looked up; iterating
+    over the object, or looking up a missing key, decodes all of them.
+    """
+    __slots__ = ('raw', '_state')
+
+    def __init__(self, raw):
+        pos = _WHITESPACE.match(raw, 0).end()
+        if raw[pos:pos + 1] != '{':
+            raise ValueError("Expected a JSON object")
+        self.raw = raw
+        # (offset of the next member or None once all are decoded,
+        #  members decoded so far). Replaced as a whole, so concurrent
+        # lookups never see a half updated state.
+        self._state = (pos + 1, {})
+
+    def _decode(self, key=None):
+        """
+        Decodes the members up to `key` (or all of them), returns the
+        dict of the members decoded so far
+        """
+        pos, values = self._state
+        if pos is None:
+            return values
+        raw = self.raw
+        values = dict(values)
+
+        pos = _WHITESPACE.match(raw, pos).end()
+        if raw[pos:pos + 1] == '}':
+            pos = None
+        while pos is not None:
+            name, pos = _DECODER.raw_decode(raw, pos)
+            pos = _WHITESPACE.match(raw, pos).end()
+            if raw[pos:pos + 1] != ':':
+                raise ValueError("Expected ':' at offset %d" % pos)
+            pos = _WHITESPACE.match(raw, pos + 1).end()
+            values[name], pos = _DECODER.raw_decode(raw, pos)
+            pos = _WHITESPACE.match(raw, pos).end()
+            separator = raw[pos:pos + 1]
+            pos = _WHITESPACE.match(raw, pos + 1).end()
+            if separator == '}':
+                pos = None
+            elif separator != ',':
+                raise ValueError("Expected ',' or '}' at offset %d" % pos)
+            elif name == key:
+                break
+
+        self._state = (pos, values)
+        return values
+
+    def __getitem__(self, key):
+        values = self._state[1]
+        if key not in values:
+            values = self._decode(key)
+        return values[key]
+
+    def keys(self):
+        """
+        Returns the list of member names
+        """
+        return list(self._decode())
+
+
+def json_default(obj):
+    """
+    `default` function of `json.dumps` encoding records and lazy objects
+    as JSON objects
+    """
+    if isinstance(obj, _Mapping):
+        return dict(obj.items())
+    raise TypeError("%r is not JSON serializable" % (obj,))
+
+
+def decode_lazy(handle, endpoint, chunk_size=CHUNK_SIZE, event=None):
+    """
+    Returns the body of the response `handle` to a call to `endpoint` as
+    a `Record`, a `LazyObject` or, if it's not an object, decoded
+    """
+    raw = b''.join(iter_body(handle, chunk_size, event)).decode('utf8')
+    result = None
+    for prefix, record_cls in RECORDS:
+        if endpoint.startswith(prefix):
+            result = record_cls.from_dict(json.loads(raw))
+            break
+    if result is None:
+        try:
+            result = LazyObject(raw)
+        except ValueError:
+            result = json.loads(raw)
+    if event is not None:
+        event.mark('decode')
+    return result
+
+__all__ = ["LazyObject", "Record", "Score", "ScoreDelta", "Identity"]
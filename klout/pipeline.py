@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+
+"""
+Streaming pipelines over feeds of identities.
+
+A pipeline reads its input lazily and runs each stage in its own pool of
+threads, with a bounded number of items in flight per stage, so memory
+use doesn't depend on the size of the feed::
+
+    k = Klout('YOUR_KEY_HERE', identities=True)
+
+    with open('screen_names.txt') as feed:
+        for record in k.pipeline(feed).resolve_identity() \\
+                       .fetch('user.score', 'user.topics').results():
+            if 'error' in record:
+                print record['input'], record['error']
+            else:
+                print record['input'], record['user.score']['score']
+
+Every input item becomes a record, a dict with the item as `input`.
+`resolve_identity` adds its `kloutId` and `fetch` the result of each
+API function under its name. A stage failing with a `KloutError` stores
+it as the record's `error`; later stages leave such records alone, and
+they are still yielded.
+"""
+
+from .api import KloutError
+from .batch import imap
+
+
+class Pipeline(object):
+    """
+    Lazily evaluated chain of stages over the items of `source`.
+
+    Items are strings (twitter screen names, or kloutIds when there is
+    no `resolve_identity` stage), stripped and skipped when empty, or
+    dicts of keyword arguments for `identity.klout` such as
+    `{'tw': '11158872'}`.
+
+    Each stage runs `concurrency` threads and holds at most `window`
+    records (twice `concurrency` by default). With `ordered` False,
+    records come out of each stage as soon as they are ready instead of
+    in input order.
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, klout, source, concurrency=10, ordered=False,
+                 window=None):
+        self.klout = klout
+        self.concurrency = concurrency
+        self.ordered = ordered
+        self.window = window
+        self._records = self._read(source)
+
+    @staticmethod
+    def _read(source):
+        for item in source:
+            if not isinstance(item, dict):
+                item = item.strip()
+                if not item:
+                    continue
+            yield {'input': item}
+
+    def map(self, func, concurrency=None):
+        """
+        Adds a stage calling `func(record)` on every record that has no
+        `error`. `func` updates the record in place; a `KloutError` it
+        raises is stored as the record's `error`.
+
+        `concurrency` defaults to the pipeline's.
+        """
+        if concurrency is None:
+            concurrency = self.concurrency
+
+        def stage(record):
+            """
+            Runs `func` on a record
+            """
+            if 'error' not in record:
+                func(record)
+            return record
+
+        records = self._records
+
+        def run():
+            """
+            Yields the records once `func` ran on them
+            """
+            for record, _, exc_info in imap(stage, records, concurrency,
+                                            self.ordered, self.window):
+                if exc_info is not None:
+                    if not isinstance(exc_info[1], KloutError):
+                        raise exc_info[1]
+                    record['error'] = exc_info[1]
+                yield record
+
+        self._records = run()
+        return self
+
+    def resolve_identity(self, concurrency=None):
+        """
+        Adds a stage looking up the `kloutId` of every input, through the
+        `identities` map of the `Klout` object if it has one
+        """
+        identity = self.klout.endpoint('identity.klout')
+
+        def resolve(record):
+            """
+            Looks the kloutId of a record up
+            """
+            kwargs = record['input']
+            if not isinstance(kwargs, dict):
+                kwargs = {'screenName': kwargs}
+            record['kloutId'] = identity(**kwargs).get('id')
+
+        return self.map(resolve, concurrency)
+
+    def fetch(self, *names, **kwargs):
+        """
+        Adds a stage calling the API functions `names`, such as
+        `'user.score'`, for every `kloutId` (or input if there is no
+        `resolve_identity` stage). A `concurrency` keyword argument
+        overrides the pipeline's.
+        """
+        endpoints = [(name, self.klout.endpoint(name)) for name in names]
+
+        def fetch(record):
+            """
+            Calls every API function for a record
+            """
+            kloutId = record.get('kloutId', record['input'])
+            for name, endpoint in endpoints:
+                record[name] = endpoint(kloutId=kloutId)
+
+        return self.map(fetch, kwargs.get('concurrency'))
+
+    def results(self):
+        """
+        Runs the pipeline, yielding records as they come out of the last
+        stage
+        """
+        return self._records
+
+    def __iter__(self):
+        return self.results()
+
+__all__ = ["Pipeline"]
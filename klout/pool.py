@@ -0,0 +1,296 @@
+# -*- coding: utf-8 -*-
+
+"""
+HTTP/1.1 keep-alive connection pool used by `Klout` objects.
+
+A pool keeps a bounded number of persistent connections per host and
+hands them out to `KloutCall` objects, so consecutive calls skip the
+TCP (and TLS) handshake::
+
+    from klout import Klout, ConnectionPool
+
+    k = Klout('YOUR_KEY_HERE', pool=ConnectionPool(maxsize=4,
+                                                   idle_timeout=30))
+    k.user.score(kloutId='11747')
+    print k.pool.stats()
+
+"""
+from __future__ import with_statement
+
+try:
+    import http.client as httplib
+except ImportError:
+    import httplib
+
+try:
+    import urllib.error as urllib_error
+    import urllib.parse as urllib_parse
+except ImportError:
+    import urllib2 as urllib_error
+    import urlparse as urllib_parse
+
+try:
+    from cStringIO import StringIO
+except ImportError:
+    from io import BytesIO as StringIO
+
+import socket
+import sys
+import threading
+import time
+
+from .timeout import start_timer
+
+CHUNK_SIZE = 16 * 1024
+
+
+class PooledResponse(object):  # pylint: disable=too-few-public-methods
+    """
+    Fully read response returned by `ConnectionPool.urlopen`.
+
+    Mimics the parts of the object returned by `urllib.urlopen` that
+    `KloutCall` relies on. The body is read eagerly so the underlying
+    connection can go back to the pool straight away.
+    """
+
+    def __init__(self, url, code, msg, headers, body):
+        self.url = url
+        self.code = code
+        self.msg = msg
+        self.headers = headers
+        self._body = StringIO(body)
+
+    def info(self):
+        """
+        Response headers
+        """
+        return self.headers
+
+    def getcode(self):
+        """
+        HTTP status code
+        """
+        return self.code
+
+    def geturl(self):
+        """
+        Requested url
+        """
+        return self.url
+
+    def read(self, amt=None):
+        """
+        Read the response body
+        """
+        if amt is None:
+            return self._body.read()
+        return self._body.read(amt)
+
+    def readline(self, limit=-1):
+        """
+        Read a line of the response body
+        """
+        if limit < 0:
+            return self._body.readline()
+        return self._body.readline(limit)
+
+    def readlines(self, hint=-1):
+        """
+        Read the lines of the response body
+        """
+        if hint < 0:
+            return self._body.readlines()
+        return self._body.readlines(hint)
+
+    def __iter__(self):
+        return iter(self.readline, b'')
+
+    # pylint: disable=no-self-use
+    def fileno(self):
+        """
+        There is no file descriptor, the body is in memory
+        """
+        raise IOError("PooledResponse has no file descriptor")
+
+    def close(self):
+        """
+        Nothing to release, the connection is already back in the pool
+        """
+        pass
+
+
+class ConnectionPool(object):
+    """
+    Thread safe pool of persistent HTTP/1.1 connections, usable as the
+    transport of a `Klout` object (see `klout.transport`).
+
+    `maxsize` is the maximum number of connections (busy and idle) kept
+    open to a single host. When all of them are busy further requests
+    wait for one to be released.
+
+    Idle connections older than `idle_timeout` seconds are closed
+    instead of being reused, as servers tend to drop them anyway.
+    """
+
+    def __init__(self, maxsize=10, idle_timeout=60):
+        self.maxsize = maxsize
+        self.idle_timeout = idle_timeout
+        self._lock = threading.Condition()
+        self._idle = {}
+        self._open = {}
+        self._stats = {'requests': 0, 'created': 0,
+                       'reused': 0, 'discarded': 0}
+
+    def stats(self):
+        """
+        Returns a dict of counters describing pool usage.
+
+        * requests: number of requests sent through the pool
+        * created: number of new connections opened
+        * reused: number of requests sent on an already open connection
+        * discarded: number of connections closed (expired, broken or
+          refused by the server)
+        * open: number of connections currently open
+        * idle: number of connections currently waiting to be reused
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats['open'] = sum(self._open.values())
+            stats['idle'] = sum(len(conns) for conns in self._idle.values())
+        return stats
+
+    def close(self):
+        """
+        Closes all idle connections.
+        """
+        with self._lock:
+            for host_key, conns in self._idle.items():
+                for conn, _ in conns:
+                    conn.close()
+                    self._open[host_key] -= 1
+                    self._stats['discarded'] += 1
+                self._idle[host_key] = []
+            self._lock.notify_all()
+
+    def _acquire(self, host_key, timer):
+        """
+        Returns a `(connection, reused)` pair for `host_key`, raises
+        `socket.timeout` if none is free before the deadline of `timer`
+        """
+        with self._lock:
+            while True:
+                idle = self._idle.setdefault(host_key, [])
+                now = time.time()
+                while idle:
+                    conn, last_used = idle.pop()
+                    if now - last_used < self.idle_timeout:
+                        self._stats['reused'] += 1
+                        return conn, True
+                    conn.close()
+                    self._open[host_key] -= 1
+                    self._stats['discarded'] += 1
+                if self._open.get(host_key, 0) < self.maxsize:
+                    self._open[host_key] = self._open.get(host_key, 0) + 1
+                    self._stats['created'] += 1
+                    break
+                remaining = timer.remaining()
+                if remaining is None:
+                    self._lock.wait()
+                elif remaining > 0:
+                    self._lock.wait(remaining)
+                else:
+                    raise socket.timeout("Deadline exceeded waiting for a "
+                                         "pooled connection")
+
+        scheme, host, port = host_key
+        if scheme == 'https':
+            conn_cls = httplib.HTTPSConnection
+        else:
+            conn_cls = httplib.HTTPConnection
+        return conn_cls(host, port, timeout=timer.connect_timeout()), False
+
+    def _release(self, host_key, conn, reusable):
+        with self._lock:
+            if reusable:
+                self._idle.setdefault(host_key, []).append(
+                    (conn, time.time()))
+            else:
+                conn.close()
+                self._open[host_key] -= 1
+                self._stats['discarded'] += 1
+            self._lock.notify()
+
+    def urlopen(self, req, timeout=None):
+        """
+        Sends the `urllib` request `req` on a pooled connection.
+
+        `timeout` is a number of seconds, a `Timeout` or the
+        `TimeoutTimer` of a running call.
+
+        Behaves like `urllib.urlopen`: raises `HTTPError` on HTTP error
+        statuses and `URLError` when the server can not be reached.
+        """
+        timer = start_timer(timeout)
+
+        url = req.get_full_url()
+        parsed = urllib_parse.urlparse(url)
+        host_key = (parsed.scheme, parsed.hostname, parsed.port)
+        selector = parsed.path
+        if parsed.query:
+            selector += '?' + parsed.query
+        headers = dict(req.header_items())
+        headers['Connection'] = 'keep-alive'
+
+        with self._lock:
+            self._stats['requests'] += 1
+
+        while True:
+            try:
+                conn, reused = self._acquire(host_key, timer)
+            except socket.timeout:
+                raise urllib_error.URLError(sys.exc_info()[1])
+            timer.mark('wait')
+            try:
+                if conn.sock is None:
+                    conn.connect()
+                    timer.mark('connect')
+                timer.arm(conn.sock)
+                conn.request(req.get_method(), selector, headers=headers)
+                response = conn.getresponse()
+                timer.mark('ttfb')
+                read = getattr(response, 'read1', response.read)
+                chunks = []
+                while True:
+                    timer.arm()
+                    chunk = read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    chunks.append(chunk)
+                body = b''.join(chunks)
+                timer.mark('download')
+                # read1 leaves the response open at the end of the body,
+                # the connection can't send another request until closed
+                response.close()
+            except (httplib.HTTPException, socket.error):
+                _, error, _ = sys.exc_info()
+                timer.disarm()
+                self._release(host_key, conn, False)
+                if reused and not isinstance(error, socket.timeout):
+                    # The server closed an idle keep-alive connection,
+                    # try again on a fresh one.
+                    continue
+                raise urllib_error.URLError(error)
+            break
+
+        self._release(host_key, conn,
+                      timer.disarm() and not response.will_close)
+
+        result = PooledResponse(url, response.status, response.reason,
+                                response.msg, body)
+        if response.status >= 400:
+            raise urllib_error.HTTPError(url, response.status,
+                                         response.reason, response.msg,
+                                         result)
+        return result
+
+__all__ = ["ConnectionPool"]
@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+
+"""
+Client side rate limiting.
+
+Klout enforces a number of calls per second and per day for each
+developer key. A `RateLimiter` shared by all calls of a `Klout` object
+spaces calls out so those limits are never hit::
+
+    from klout import Klout, RateLimiter
+
+    k = Klout('YOUR_KEY_HERE',
+              limiter=RateLimiter(per_second=10, per_day=20000))
+
+Calls wait for their turn. A call that would have to wait longer than
+`max_wait` (or than its total timeout) raises `KloutRateLimitError`
+instead.
+"""
+from __future__ import with_statement
+
+import threading
+import time
+
+
+class TokenBucket(object):
+    """
+    Token bucket refilled with `rate` tokens per second, holding at
+    most `capacity` tokens.
+
+    Tokens are reserved in advance: the bucket goes negative and callers
+    are told how long to wait for their token to become available.
+    """
+
+    def __init__(self, rate, capacity=None):
+        if capacity is None:
+            capacity = max(rate, 1)
+        self.rate = float(rate)
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.time()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity,
+                          self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, now):
+        """
+        Takes a token, returns the number of seconds to wait for it
+        """
+        self._refill(now)
+        self.tokens -= 1
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
+
+    def give_back(self):
+        """
+        Returns the token taken last
+        """
+        self.tokens += 1
+
+
+class DailyQuota(object):
+    """
+    Counter allowing `limit` calls per calendar day (UTC), the way Klout
+    counts its daily quota.
+
+    Like `TokenBucket`, calls are reserved in advance: once today's
+    quota is used up, callers are told to wait for the next day with
+    room left.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.day = None
+        # Calls reserved from the start of `day` on
+        self.reserved = 0
+
+    def take(self, now):
+        """
+        Takes a call, returns the number of seconds to wait for it
+        """
+        day = int(now // 86400)
+        if self.day is None:
+            self.day = day
+        elif day > self.day:
+            # Past days kept up to `limit` of the calls reserved
+            self.reserved = max(0, self.reserved -
+                                self.limit * (day - self.day))
+            self.day = day
+        self.reserved += 1
+        if self.reserved <= self.limit:
+            return 0.0
+        start = (self.day + (self.reserved - 1) // self.limit) * 86400
+        return start - now
+
+    def give_back(self):
+        """
+        Returns the call taken last
+        """
+        self.reserved -= 1
+
+
+class RateLimiter(object):
+    """
+    Thread safe limiter allowing `per_second` calls per second, with
+    bursts of up to `burst` calls, and `per_day` calls per calendar day
+    (UTC). Either limit can be None.
+
+    `max_wait` is the longest a call will wait for its turn, None for
+    no limit.
+    """
+
+    def __init__(self, per_second=None, per_day=None, burst=None,
+                 max_wait=None):
+        self.max_wait = max_wait
+        self._lock = threading.Lock()
+        self._buckets = []
+        if per_second is not None:
+            self._buckets.append(TokenBucket(per_second, burst))
+        if per_day is not None:
+            self._buckets.append(DailyQuota(per_day))
+        self._stats = {'calls': 0, 'delayed': 0, 'rejected': 0,
+                       'waited': 0.0}
+
+    def reserve(self, max_wait=None):
+        """
+        Reserves a call, returns the number of seconds to wait before
+        making it or None if that would be longer than `max_wait` (or
+        than the limiter's own `max_wait`), in which case nothing is
+        reserved.
+        """
+        if self.max_wait is not None and \
+                (max_wait is None or self.max_wait < max_wait):
+            max_wait = self.max_wait
+        with self._lock:
+            now = time.time()
+            wait = max([0.0] + [bucket.take(now)
+                                for bucket in self._buckets])
+            if max_wait is not None and wait > max_wait:
+                for bucket in self._buckets:
+                    bucket.give_back()
+                self._stats['rejected'] += 1
+                return None
+            self._stats['calls'] += 1
+            if wait:
+                self._stats['delayed'] += 1
+                self._stats['waited'] += wait
+            return wait
+
+    def acquire(self, max_wait=None):
+        """
+        Blocks until a call can be made, returns False without waiting
+        if that would take longer than `max_wait`
+        """
+        wait = self.reserve(max_wait)
+        if wait is None:
+            return False
+        if wait:
+            time.sleep(wait)
+        return True
+
+    def stats(self):
+        """
+        Returns a dict of `calls` allowed, `delayed` calls, `rejected`
+        calls and total seconds `waited`
+        """
+        with self._lock:
+            return dict(self._stats)
+
+__all__ = ["RateLimiter"]
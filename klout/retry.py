@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+
+"""
+Retrying failed calls.
+
+A `Klout` object with a `Retry` policy tries a call again, after an
+exponentially growing and randomized delay, when it fails with a
+transient error (a connection error, a timeout or one of
+`Retry.status_codes`)::
+
+    from klout import Klout, Retry
+
+    k = Klout('YOUR_KEY_HERE', retry=Retry(total=4, backoff=0.5))
+
+When all attempts fail, the `KloutHTTPError` raised has an `attempts`
+attribute listing every attempt with its timing and error.
+"""
+
+try:
+    import urllib.error as urllib_error
+except ImportError:
+    import urllib2 as urllib_error
+
+from email.utils import mktime_tz, parsedate_tz
+
+import random
+import time
+
+
+class Retry(object):
+    """
+    Retry policy.
+
+    * total: maximum number of retries, so a call is made at most
+      `total + 1` times
+    * backoff: delay before the first retry, doubled for every retry
+    * max_backoff: upper bound of the delay
+    * jitter: if True the delay is picked at random between 0 and the
+      exponential delay ("full jitter"), which spreads retries of
+      concurrent calls
+    * status_codes: HTTP statuses worth retrying
+    * connection_errors: whether connection errors and timeouts are
+      retried
+    * respect_retry_after: wait as long as the `Retry-After` header of
+      the response asks, when there is one. Calls asked to wait longer
+      than `max_backoff` are not retried.
+
+    Retries never go past the total timeout of a call.
+    """
+
+    STATUS_CODES = frozenset([429, 500, 502, 503, 504])
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, total=3, backoff=0.5, max_backoff=30, jitter=True,
+                 status_codes=STATUS_CODES, connection_errors=True,
+                 respect_retry_after=True):
+        self.total = total
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.status_codes = frozenset(status_codes)
+        self.connection_errors = connection_errors
+        self.respect_retry_after = respect_retry_after
+
+    def is_retryable(self, error):
+        """
+        Returns True if the `HTTPError` or `URLError` `error` is transient
+        """
+        if isinstance(error, urllib_error.HTTPError):
+            return error.code in self.status_codes
+        return self.connection_errors
+
+    def retry_after(self, error):
+        """
+        Returns the delay in seconds asked by the `Retry-After` header of
+        the response of `error`, or None
+        """
+        headers = getattr(error, 'hdrs', None)
+        if headers is None:
+            return None
+        value = headers.get('Retry-After')
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            date = parsedate_tz(value)
+            if date is None:
+                return None
+            return max(0.0, mktime_tz(date) - time.time())
+
+    def delay(self, retries, error):
+        """
+        Returns the delay before retry number `retries` (starting at 1)
+        of a call which failed with `error`, or None if it shouldn't be
+        retried
+        """
+        if retries > self.total or not self.is_retryable(error):
+            return None
+        if self.respect_retry_after:
+            retry_after = self.retry_after(error)
+            if retry_after is not None:
+                if retry_after > self.max_backoff:
+                    return None
+                return retry_after
+        delay = min(self.max_backoff, self.backoff * 2 ** (retries - 1))
+        if self.jitter:
+            delay = random.uniform(0, delay)
+        return delay
+
+__all__ = ["Retry"]
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+
+"""
+Request coalescing.
+
+With a `SingleFlight`, identical calls made at the same time by
+different threads share one request to api.klout.com: the first call
+makes the request and the others wait for its result::
+
+    from klout import Klout, SingleFlight
+
+    k = Klout('YOUR_KEY_HERE', singleflight=SingleFlight())
+
+Calls are identical when they build the same uri. Shared results must
+be treated as read-only.
+"""
+from __future__ import with_statement
+
+import socket
+import sys
+import threading
+
+
+class _Flight(object):  # pylint: disable=too-few-public-methods
+    """
+    A call in progress
+    """
+    __slots__ = ('done', 'result', 'exc_info')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.exc_info = None
+
+
+class SingleFlight(object):
+    """
+    Thread safe deduplication of concurrent identical calls.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+        self._stats = {'calls': 0, 'coalesced': 0}
+
+    def do(self, key, func, timeout=None):
+        """
+        Returns `func()`, unless a call with the same `key` is already in
+        progress in which case its result is returned (or its exception
+        raised) instead.
+
+        Calls waiting for another one raise `socket.timeout` after
+        `timeout` seconds.
+        """
+        with self._lock:
+            self._stats['calls'] += 1
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = self._flights[key] = _Flight()
+                leader = True
+            else:
+                self._stats['coalesced'] += 1
+                leader = False
+
+        if not leader:
+            if not flight.done.wait(timeout) and not flight.done.is_set():
+                raise socket.timeout('timed out')
+            if flight.exc_info is not None:
+                raise flight.exc_info[1]
+            return flight.result
+
+        try:
+            flight.result = func()
+            return flight.result
+        except BaseException:
+            flight.exc_info = sys.exc_info()
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def stats(self):
+        """
+        Returns a dict of `calls` made and `coalesced` calls which waited
+        for another one instead of making their own request
+        """
+        with self._lock:
+            return dict(self._stats)
+
+__all__ = ["SingleFlight"]
@@ -0,0 +1,294 @@
+# -*- coding: utf-8 -*-
+
+"""
+Score time series.
+
+A `ScoreStore` keeps snapshots of `user.score` results in a directory of
+fixed width binary columns (kloutId, timestamp, score, dayChange and
+monthChange), 36 bytes per snapshot::
+
+    from klout import Klout, KloutError
+    from klout.store import ScoreStore
+
+    k = Klout('YOUR_KEY_HERE', pool=True)
+    store = ScoreStore('scores')
+
+    # Daily snapshot of many users
+    store.extend((kwargs['kloutId'], result) for kwargs, result
+                 in k.user.score.many({'kloutId': kloutId}
+                                      for kloutId in kloutIds)
+                 if not isinstance(result, KloutError))
+
+    print store.percentiles((50, 90, 99))
+    print store.top_movers(10, by='dayChange')
+    print store.history('11747')['score']
+
+With NumPy installed, columns are memory-mapped and queries are
+vectorized: nothing is loaded into Python objects but the answer.
+Without it, the same queries run in pure Python, which is fine for
+smaller stores.
+
+A store has a single writer at a time; any number of processes can
+query it.
+"""
+from __future__ import with_statement
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+import math
+import os
+import struct
+import threading
+import time
+
+# (name, NumPy dtype, struct format character)
+COLUMNS = (('kloutId', '<i8', 'q'),
+           ('timestamp', '<f8', 'd'),
+           ('score', '<f8', 'd'),
+           ('dayChange', '<f4', 'f'),
+           ('monthChange', '<f4', 'f'))
+
+_SIZES = dict((name, struct.calcsize('<' + code))
+              for name, _, code in COLUMNS)
+
+
+class ScoreStore(object):
+    """
+    Append-only store of score snapshots in the directory `path`.
+
+    `use_numpy` False forces the pure Python implementation, True
+    requires NumPy; by default NumPy is used if installed. Results of
+    queries are NumPy arrays with NumPy, lists without.
+    """
+
+    # Snapshots buffered by `extend` before they are written
+    BATCH = 65536
+
+    def __init__(self, path, use_numpy=None):
+        if use_numpy and numpy is None:
+            raise ImportError("NumPy is not installed")
+        self.path = path
+        self.numpy = numpy if use_numpy is not False else None
+        self._lock = threading.Lock()
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        self._repair()
+
+    def _file(self, name):
+        return os.path.join(self.path, name + '.col')
+
+    def __len__(self):
+        rows = None
+        for name, _, _ in COLUMNS:
+            try:
+                size = os.path.getsize(self._file(name))
+            except OSError:
+                size = 0
+            count = size // _SIZES[name]
+            if rows is None or count < rows:
+                rows = count
+        return rows
+
+    def _repair(self):
+        """
+        Truncates the columns to the snapshots written in full, in case
+        a write was interrupted
+        """
+        rows = len(self)
+        for name, _, _ in COLUMNS:
+            path = self._file(name)
+            if os.path.exists(path) and \
+                    os.path.getsize(path) != rows * _SIZES[name]:
+                with open(path, 'r+b') as handle:
+                    handle.truncate(rows * _SIZES[name])
+
+    def append(self, kloutId, result, timestamp=None):
+        """
+        Stores the `user.score` `result` of `kloutId`, taken at
+        `timestamp` (now by default)
+        """
+        self.extend([(kloutId, result)], timestamp)
+
+    def extend(self, results, timestamp=None):
+        """
+        Stores the `(kloutId, result)` pairs of `results`, which may also
+        be `(kloutId, result, timestamp)` triples. Snapshots without a
+        timestamp are taken at `timestamp`, now by default. Returns the
+        number of snapshots stored.
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        columns = [[] for _ in COLUMNS]
+        count = 0
+        for item in results:
+            result = item[1]
+            delta = result['scoreDelta']
+            taken = timestamp
+            if len(item) > 2 and item[2] is not None:
+                taken = item[2]
+            columns[0].append(int(item[0]))
+            columns[1].append(float(taken))
+            columns[2].append(float(result['score']))
+            columns[3].append(float(delta['dayChange']))
+            columns[4].append(float(delta['monthChange']))
+            count += 1
+            if len(columns[0]) >= self.BATCH:
+                self._write(columns)
+                columns = [[] for _ in COLUMNS]
+        self._write(columns)
+        return count
+
+    def _write(self, columns):
+        if not columns[0]:
+            return
+        with self._lock:
+            for (name, dtype, code), values in zip(COLUMNS, columns):
+                if self.numpy is not None:
+                    data = self.numpy.asarray(values, dtype=dtype).tobytes()
+                else:
+                    data = struct.pack('<%d%s' % (len(values), code),
+                                       *values)
+                with open(self._file(name), 'ab') as handle:
+                    handle.write(data)
+
+    def columns(self):
+        """
+        Returns a dict of all the snapshots, column by column: read-only
+        memory-mapped arrays with NumPy, lists without
+        """
+        rows = len(self)
+        columns = {}
+        for name, dtype, code in COLUMNS:
+            if self.numpy is not None:
+                if rows:
+                    columns[name] = self.numpy.memmap(
+                        self._file(name), dtype=dtype, mode='r',
+                        shape=(rows,))
+                else:
+                    columns[name] = self.numpy.empty(0, dtype=dtype)
+            elif rows:
+                with open(self._file(name), 'rb') as handle:
+                    data = handle.read(rows * _SIZES[name])
+                columns[name] = list(struct.unpack(
+                    '<%d%s' % (rows, code), data))
+            else:
+                columns[name] = []
+        return columns
+
+    def _select(self, columns, start=None, end=None, latest=True):
+        """
+        Returns the indexes of the snapshots taken in [`start`, `end`),
+        only the latest one of each user if `latest`
+        """
+        ids, timestamps = columns['kloutId'], columns['timestamp']
+        if self.numpy is not None:
+            np = self.numpy
+            mask = np.ones(len(ids), dtype=bool)
+            if start is not None:
+                mask &= timestamps >= start
+            if end is not None:
+                mask &= timestamps < end
+            indexes = np.flatnonzero(mask)
+            if not latest or not len(indexes):
+                return indexes
+            # Sort by user then time (stable, so the last snapshot stored
+            # wins ties), keep the last snapshot of each user
+            order = indexes[np.lexsort((timestamps[indexes],
+                                        ids[indexes]))]
+            last = np.ones(len(order), dtype=bool)
+            last[:-1] = ids[order][1:] != ids[order][:-1]
+            return order[last]
+
+        indexes = [index for index, taken in enumerate(timestamps)
+                   if (start is None or taken >= start) and
+                   (end is None or taken < end)]
+        if not latest:
+            return indexes
+        latest_of = {}
+        for index in indexes:
+            kloutId = ids[index]
+            if kloutId not in latest_of or \
+                    timestamps[index] >= timestamps[latest_of[kloutId]]:
+                latest_of[kloutId] = index
+        return sorted(latest_of.values())
+
+    def history(self, kloutId):
+        """
+        Returns the snapshots of `kloutId` in time order, as a dict of
+        `timestamp`, `score`, `dayChange` and `monthChange` columns
+        """
+        columns = self.columns()
+        names = [name for name, _, _ in COLUMNS[1:]]
+        kloutId = int(kloutId)
+        if self.numpy is not None:
+            indexes = self.numpy.flatnonzero(columns['kloutId'] == kloutId)
+            indexes = indexes[self.numpy.argsort(
+                columns['timestamp'][indexes], kind='mergesort')]
+            return dict((name, self.numpy.array(columns[name][indexes]))
+                        for name in names)
+        indexes = [index for index, value in enumerate(columns['kloutId'])
+                   if value == kloutId]
+        indexes.sort(key=lambda index: columns['timestamp'][index])
+        return dict((name, [columns[name][index] for index in indexes])
+                    for name in names)
+
+    # pylint: disable=too-many-arguments
+    def percentiles(self, percents=(50, 90, 99), column='score',
+                    start=None, end=None, latest=True):
+        """
+        Returns the `percents` percentiles of `column` over the snapshots
+        taken in [`start`, `end`), only the latest one of each user if
+        `latest`. Percentiles are interpolated linearly, as
+        `numpy.percentile` does; None if there is no snapshot.
+        """
+        columns = self.columns()
+        indexes = self._select(columns, start, end, latest)
+        if not len(indexes):
+            return [None for _ in percents]
+        if self.numpy is not None:
+            values = columns[column][indexes].astype('<f8')
+            return [float(value) for value in
+                    self.numpy.percentile(values, list(percents))]
+        values = sorted(columns[column][index] for index in indexes)
+        result = []
+        for percent in percents:
+            position = (len(values) - 1) * percent / 100.0
+            low = int(math.floor(position))
+            high = min(low + 1, len(values) - 1)
+            result.append(values[low] +
+                          (values[high] - values[low]) * (position - low))
+        return result
+
+    # pylint: disable=too-many-arguments
+    def top_movers(self, count=10, by='dayChange', start=None, end=None,
+                   losers=False):
+        """
+        Returns `(kloutId, change)` pairs of the `count` users whose
+        latest snapshot in [`start`, `end`) has the largest `by` change
+        (`'dayChange'` or `'monthChange'`), or the smallest if `losers`
+        """
+        columns = self.columns()
+        indexes = self._select(columns, start, end, latest=True)
+        if not len(indexes) or count <= 0:
+            return []
+        if self.numpy is not None:
+            np = self.numpy
+            changes = columns[by][indexes].astype('<f8')
+            if not losers:
+                changes = -changes
+            if count < len(indexes):
+                top = np.argpartition(changes, count - 1)[:count]
+            else:
+                top = np.arange(len(indexes))
+            top = top[np.argsort(changes[top], kind='mergesort')]
+            return [(int(columns['kloutId'][indexes[index]]),
+                     float(columns[by][indexes[index]])) for index in top]
+        ranked = sorted(indexes, key=lambda index: columns[by][index],
+                        reverse=not losers)
+        return [(columns['kloutId'][index], columns[by][index])
+                for index in ranked[:count]]
+
+__all__ = ["ScoreStore"]
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+
+"""
+Incremental decoding of Klout API responses.
+
+Responses are read from the socket in `CHUNK_SIZE` blocks and gzip is
+decompressed as the blocks arrive, instead of buffering the compressed
+body, copying it and decompressing it in one go.
+
+`iter_items` goes one step further and yields the elements of a list
+in the response (e.g. `myInfluencers` of `user.influence`) one at a
+time, without ever decoding the whole document.
+"""
+
+import codecs
+import zlib
+
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
+CHUNK_SIZE = 16 * 1024
+
+_WHITESPACE = ' \t\n\r'
+_NUMBER = '0123456789.eE+-'
+
+
+def iter_body(handle, chunk_size=CHUNK_SIZE, event=None):
+    """
+    Yields the decompressed body of the response `handle` in chunks.
+
+    Timings and byte counts are added to the `RequestEvent` `event`, if
+    any.
+    """
+    if handle.info().get('Content-Encoding') == 'gzip':
+        # 16 + MAX_WBITS tells zlib to expect a gzip header
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    else:
+        decompressor = None
+
+    while True:
+        chunk = handle.read(chunk_size)
+        if event is not None:
+            event.mark('download')
+            event.bytes_received += len(chunk)
+        if not chunk:
+            break
+        if decompressor is not None:
+            chunk = decompressor.decompress(chunk)
+            if event is not None:
+                event.mark('decompress')
+        if event is not None:
+            event.bytes_decoded += len(chunk)
+        if chunk:
+            yield chunk
+
+    if decompressor is not None:
+        chunk = decompressor.flush()
+        if event is not None:
+            event.mark('decompress')
+            event.bytes_decoded += len(chunk)
+        if chunk:
+            yield chunk
+
+
+def decode(handle, chunk_size=CHUNK_SIZE, event=None):
+    """
+    Returns the decoded JSON body of the response `handle`
+    """
+    data = b''.join(iter_body(handle, chunk_size, event))
+    result = json.loads(data.decode('utf8'))
+    if event is not None:
+        event.mark('decode')
+    return result
+
+
+class _Reader(object):
+    """
+    Text buffer over a stream of utf8 encoded chunks
+    """
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.decoder = codecs.getincrementaldecoder('utf8')()
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def fill(self):
+        """
+        Appends the next chunk to the buffer, returns False at the end
+        of the stream
+        """
+        if self.eof:
+            return False
+        try:
+            chunk = next(self.chunks)
+        except StopIteration:
+            self.eof = True
+            self.buf += self.decoder.decode(b'', True)
+            return False
+        # Drop what was consumed already
+        self.buf = self.buf[self.pos:] + self.decoder.decode(chunk)
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """
+        Skips whitespace and returns the next character ('' at the end)
+        """
+        while True:
+            while self.pos < len(self.buf) and \
+                    self.buf[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill():
+                return ''
+
+    def expect(self, chars):
+        """
+        Consumes and returns the next character, which must be in `chars`
+        """
+        char = self.peek()
+        if not char or char not in chars:
+            raise ValueError("Expected one of %r at offset %d, got %r"
+                             % (chars, self.pos, char))
+        self.pos += 1
+        return char
+
+    def value(self):
+        """
+        Decodes and consumes the next JSON value
+        """
+        decoder = json.JSONDecoder()
+        self.peek()
+        while True:
+            try:
+                value, end = decoder.raw_decode(self.buf, self.pos)
+            except ValueError:
+                if not self.fill():
+                    raise
+                continue
+            # A number at the end of the buffer might be cut in half, even
+            # where what was decoded is a number of its own (3 of 3.25)
+            if self.buf[self.pos] in _NUMBER and \
+                    not self.buf[end:].strip(_NUMBER) and self.fill():
+                continue
+            self.pos = end
+            return value
+
+
+def iter_items(chunks, field=None):
+    """
+    Yields the elements of a list in a JSON document read from the
+    utf8 encoded `chunks`.
+
+    If `field` is None the document itself must be a list (like
+    `user.topics` results), otherwise it must be an object and the
+    elements of its `field` member are yielded.
+    """
+    reader = _Reader(iter(chunks))
+
+    if field is not None:
+        reader.expect('{')
+        while True:
+            if reader.peek() == '}':
+                return
+            key = reader.value()
+            reader.expect(':')
+            if key == field:
+                break
+            reader.value()
+            if reader.expect(',}') == '}':
+                return
+
+    reader.expect('[')
+    if reader.peek() == ']':
+        return
+    while True:
+        yield reader.value()
+        if reader.expect(',]') == ']':
+            return
+
+__all__ = ["iter_body", "decode", "iter_items"]
@@ -0,0 +1,332 @@
+# -*- coding: utf-8 -*-
+
+"""
+In-process fake of api.klout.com, to test and load test code using
+`Klout` without a developer key or network access::
+
+    from klout import Klout
+    from klout.testing import FakeKloutServer
+
+    with FakeKloutServer(latency=0.05, error_rate=0.01) as server:
+        k = Klout('ANY_KEY', domain=server.domain)
+        kloutId = k.identity.klout(screenName="erfaan").get('id')
+        print k.user.score(kloutId=kloutId)
+
+The server answers the `identity` resource and the `score`, `influence`
+and `topics` actions of the `user` resource with made-up but stable
+data: the same input always gets the same answer.
+"""
+from __future__ import with_statement
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    import urllib.parse as urllib_parse
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    import urlparse as urllib_parse
+
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
+from email.utils import formatdate
+
+import gzip
+import io
+import random
+import socket
+import sys
+import threading
+import time
+import zlib
+
+
+def klout_id(network, value):
+    """
+    Returns the made-up kloutId of `value` on `network`
+    """
+    return str(zlib.crc32(('%s:%s' % (network, value)).encode('utf8'))
+               & 0x7fffffff)
+
+
+def score(kloutid):
+    """
+    Returns the made-up `user.score` result of `kloutid`
+    """
+    seed = int(kloutid)
+    return {'score': 10 + (seed % 8900) / 100.0,
+            'scoreDelta': {'dayChange': (seed % 200 - 100) / 100.0,
+                           'monthChange': (seed % 2000 - 1000) / 100.0}}
+
+
+def _entity(kloutid):
+    return {'entity': {'id': kloutid,
+                       'payload': {'kloutId': kloutid,
+                                   'nick': 'user%s' % kloutid,
+                                   'score': score(kloutid)}}}
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def handle_error(self, request, client_address):
+        # Clients hanging up, such as cancelled hedged requests, are
+        # business as usual
+        if not isinstance(sys.exc_info()[1], socket.error):
+            HTTPServer.handle_error(self, request, client_address)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        pass
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """
+        Serves a Klout API request
+        """
+        fake = self.server.fake
+        fake.count_request()
+        fake.sleep()
+
+        parsed = urllib_parse.urlparse(self.path)
+        query = dict(urllib_parse.parse_qsl(parsed.query))
+        parts = parsed.path.strip('/').split('/')
+
+        key = query.get('key')
+        fake.count_key(key)
+        if not fake.accepts(key):
+            return self.reply(403, {'error': 'Invalid key'})
+        if key in fake.over_quota:
+            # Mashery, which serves api.klout.com, tells quota errors
+            # apart from other 403s with this header
+            return self.reply(403, {'error': 'Developer Over Rate'},
+                              headers=[('X-Mashery-Error-Code',
+                                        'ERR_403_DEVELOPER_OVER_RATE')])
+        if fake.error_rate and fake.random() < fake.error_rate:
+            return self.reply(503, {'error': 'Service Unavailable'})
+
+        result = fake.resolve(parts, query)
+        if result is None:
+            return self.reply(404, {'error': 'Not Found'})
+        accepts_gzip = 'gzip' in self.headers.get('Accept-Encoding', '')
+        return self.reply(200, result, fake.gzip and accepts_gzip)
+
+    def reply(self, status, result, compress=False, headers=()):
+        """
+        Sends `result` as JSON, or a 304 if the client has it already
+        """
+        body = json.dumps(result, sort_keys=True).encode('utf8')
+        fake = self.server.fake
+        validators = []
+        if status == 200 and fake.validators:
+            etag = '"%x"' % (zlib.crc32(body) & 0xffffffff)
+            validators = [('ETag', etag),
+                          ('Last-Modified', fake.last_modified)]
+            if self.headers.get('If-None-Match') == etag:
+                fake.count_not_modified()
+                self.send_response(304)
+                for header, value in validators:
+                    self.send_header(header, value)
+                # Like most servers, no Content-Length: a 304 has no body
+                self.end_headers()
+                return
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        for header, value in headers:
+            self.send_header(header, value)
+        for header, value in validators:
+            self.send_header(header, value)
+        if compress:
+            buf = io.BytesIO()
+            zip_file = gzip.GzipFile(fileobj=buf, mode='wb')
+            zip_file.write(body)
+            zip_file.close()
+            body = buf.getvalue()
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class FakeKloutServer(object):
+    """
+    Fake api.klout.com running in a background thread.
+
+    * key: developer key required in every request, or list of keys
+      accepted, None to accept any
+    * over_quota: keys answered with a quota error (403 with an
+      `X-Mashery-Error-Code` header)
+    * latency: seconds every request takes, or a `(min, max)` range
+    * gzip: whether responses are gzip compressed when asked to
+    * error_rate: fraction of requests answered with a 503
+    * influencers: number of influencers and influencees of every user
+    * topics: number of topics of every user
+    * validators: whether responses have `ETag` and `Last-Modified`
+      headers, in which case `If-None-Match` requests are answered with
+      a 304 when the response didn't change
+    * seed: seed of the random generator used for latency and errors
+
+    `requests` counts the requests served so far, `not_modified` the 304
+    responses among them and `keys` the requests made with each key.
+    """
+
+    # pylint: disable=too-many-arguments,too-many-instance-attributes
+    def __init__(self, key=None, latency=0, gzip=True, error_rate=0,
+                 influencers=10, topics=5, host='127.0.0.1', port=0,
+                 validators=True, over_quota=(), seed=None):
+        self.key = key
+        self.over_quota = set(over_quota)
+        self.latency = latency
+        self.gzip = gzip
+        self.error_rate = error_rate
+        self.influencers = influencers
+        self.topics = topics
+        self.validators = validators
+        self.last_modified = formatdate(usegmt=True)
+        self.requests = 0
+        self.not_modified = 0
+        self.keys = {}
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+        self._server = _ThreadingHTTPServer((host, port), _Handler)
+        self._server.fake = self
+        self._thread = None
+
+    @property
+    def domain(self):
+        """
+        `host:port` to pass as `domain` to `Klout`
+        """
+        host, port = self._server.server_address[:2]
+        return '%s:%d' % (host, port)
+
+    def start(self):
+        """
+        Starts serving in a background thread
+        """
+        self._thread = threading.Thread(target=self._server.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stops the server
+        """
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def count_request(self):
+        """
+        Counts a request served
+        """
+        with self._lock:
+            self.requests += 1
+
+    def accepts(self, key):
+        """
+        Returns whether `key` is a valid developer key
+        """
+        if self.key is None:
+            return True
+        if isinstance(self.key, (list, tuple, set)):
+            return key in self.key
+        return key == self.key
+
+    def count_key(self, key):
+        """
+        Counts a request made with `key`
+        """
+        with self._lock:
+            self.keys[key] = self.keys.get(key, 0) + 1
+
+    def count_not_modified(self):
+        """
+        Counts a 304 response
+        """
+        with self._lock:
+            self.not_modified += 1
+
+    def random(self):
+        """
+        Returns a random number in [0, 1)
+        """
+        with self._lock:
+            return self._random.random()
+
+    def sleep(self):
+        """
+        Waits for the configured latency
+        """
+        latency = self.latency
+        if isinstance(latency, (tuple, list)):
+            low, high = latency
+            latency = low + self.random() * (high - low)
+        if latency:
+            time.sleep(latency)
+
+    def resolve(self, parts, query):
+        """
+        Returns the result of the API call at path `parts`, None if there
+        is no such call
+        """
+        if len(parts) < 3 or parts[0] != 'v2':
+            return None
+        resource, args = parts[1], parts[2:]
+
+        if resource == 'identity.json':
+            if args == ['twitter'] and 'screenName' in query:
+                return {'id': klout_id('twitter', query['screenName']),
+                        'network': 'ks'}
+            if len(args) == 2 and args[0] in ('tw', 'gp'):
+                return {'id': klout_id(args[0], args[1]), 'network': 'ks'}
+            if len(args) == 3 and args[0] == 'klout' and \
+                    args[2] in ('tw', 'gp'):
+                return {'id': klout_id(args[2] + '-of', args[1]),
+                        'network': args[2]}
+            return None
+
+        if resource == 'user.json' and len(args) == 2 and \
+                args[0].isdigit():
+            kloutid, action = args
+            if action == 'score':
+                return score(kloutid)
+            if action == 'influence':
+                influencers = [_entity(klout_id('influencer%d' % i, kloutid))
+                               for i in range(self.influencers)]
+                influencees = [_entity(klout_id('influencee%d' % i, kloutid))
+                               for i in range(self.influencers)]
+                return {'myInfluencers': influencers,
+                        'myInfluencees': influencees,
+                        'myInfluencersCount': len(influencers),
+                        'myInfluenceesCount': len(influencees)}
+            if action == 'topics':
+                topics = []
+                for i in range(self.topics):
+                    topic_id = klout_id('topic%d' % i, kloutid)
+                    topics.append({'id': topic_id,
+                                   'displayName': 'Topic %s' % topic_id,
+                                   'name': 'topic %s' % topic_id,
+                                   'slug': 'topic-%s' % topic_id,
+                                   'displayType': 'entity',
+                                   'imageUrl': 'http://example.com/%s.png'
+                                               % topic_id})
+                return topics
+        return None
+
+__all__ = ["FakeKloutServer"]
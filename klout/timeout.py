@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+
+"""
+Per call timeouts.
+
+Timeouts are applied to the sockets of each call instead of through
+`socket.setdefaulttimeout`, so calls running in different threads never
+see each other's timeouts::
+
+    from klout import Klout, Timeout
+
+    # At most 2s to connect, 5s between two reads and 10s overall
+    k = Klout('YOUR_KEY_HERE', timeout=Timeout(connect=2, read=5, total=10))
+
+    # A plain number is both the connect and the read timeout
+    k.user.score(kloutId='11747', timeout=3)
+
+"""
+from __future__ import with_statement
+
+import errno
+import socket
+import sys
+import threading
+import time
+
+
+class Timeout(object):  # pylint: disable=too-few-public-methods
+    """
+    Timeout settings of a call, in seconds.
+
+    * connect: time allowed to open a connection (TLS handshake included)
+    * read: time allowed to wait for data from an open connection
+    * total: deadline for the whole call
+
+    None means no limit, unless `socket.setdefaulttimeout` was called in
+    which case the default socket timeout applies to connect and read.
+    """
+
+    def __init__(self, connect=None, read=None, total=None):
+        self.connect = connect
+        self.read = read
+        self.total = total
+
+    def __repr__(self):
+        return "Timeout(connect=%r, read=%r, total=%r)" % (
+            self.connect, self.read, self.total)
+
+    def start(self):
+        """
+        Returns a `TimeoutTimer` for a call starting now
+        """
+        return TimeoutTimer(self)
+
+
+class TimeoutTimer(object):
+    """
+    Tracks the time left of a single call.
+
+    `event` is the `RequestEvent` of the attempt in progress, if any:
+    transports report the phases of the request with `mark`. `sent` is
+    the time its request was sent, once done waiting for the rate limit.
+    """
+    event = None
+    cancelled = False
+    sent = None
+
+    def __init__(self, timeout):
+        self.timeout = timeout
+        self.started = time.time()
+        self.sock = None
+        self._lock = threading.Lock()
+        if timeout.total is None:
+            self.deadline = None
+        else:
+            self.deadline = self.started + timeout.total
+
+    def remaining(self):
+        """
+        Seconds left before the total deadline, None if there is none
+        """
+        if self.cancelled:
+            return 0
+        if self.deadline is None:
+            return None
+        return self.deadline - time.time()
+
+    def _bounded(self, value):
+        if self.cancelled:
+            raise socket.timeout("Cancelled")
+        remaining = self.remaining()
+        if remaining is not None:
+            if remaining <= 0:
+                raise socket.timeout("Deadline of %ss exceeded"
+                                     % self.timeout.total)
+            if value is None or remaining < value:
+                value = remaining
+        if value is None:
+            value = socket.getdefaulttimeout()
+        return value
+
+    def connect_timeout(self):
+        """
+        Socket timeout to use while connecting
+        """
+        return self._bounded(self.timeout.connect)
+
+    def read_timeout(self):
+        """
+        Socket timeout to use for the next read, raises `socket.timeout`
+        once the deadline has passed
+        """
+        return self._bounded(self.timeout.read)
+
+    def arm(self, sock=None):
+        """
+        Applies the read timeout to `sock`, or to the last socket armed
+        """
+        if sock is not None:
+            self.sock = sock
+        if self.sock is not None:
+            timeout = self.read_timeout()
+            try:
+                self.sock.settimeout(timeout)
+            except socket.error:
+                _, error, _ = sys.exc_info()
+                # Closed once the whole response was read
+                if error.errno != errno.EBADF:
+                    raise
+
+    def response_time(self):
+        """
+        Seconds since the request of the last attempt was sent
+        """
+        return time.time() - (self.sent or self.started)
+
+    def fork(self):
+        """
+        Returns a new timer with the same deadline, for another request
+        made on behalf of the same call
+        """
+        timer = TimeoutTimer(self.timeout)
+        timer.started = self.started
+        timer.deadline = self.deadline
+        return timer
+
+    def cancel(self):
+        """
+        Makes the call give up: the next socket operation, and any
+        blocked on the armed socket, fail with `socket.timeout`
+        """
+        with self._lock:
+            self.cancelled = True
+            if self.sock is not None:
+                try:
+                    self.sock.shutdown(socket.SHUT_RDWR)
+                except (socket.error, OSError):
+                    pass
+
+    def disarm(self):
+        """
+        Forgets the armed socket before its connection is reused by
+        another call. Returns False if the call was cancelled, in which
+        case the connection shouldn't be reused.
+        """
+        with self._lock:
+            self.sock = None
+            return not self.cancelled
+
+    def mark(self, phase):
+        """
+        Ends `phase` of the current request, see `RequestEvent.mark`
+        """
+        if self.event is not None:
+            self.event.mark(phase)
+
+
+def start_timer(timeout):
+    """
+    Returns a running `TimeoutTimer` for `timeout`, which may be None, a
+    number of seconds, a `Timeout` or an already running `TimeoutTimer`
+    """
+    if isinstance(timeout, TimeoutTimer):
+        return timeout
+    if not isinstance(timeout, Timeout):
+        timeout = Timeout(connect=timeout, read=timeout)
+    return timeout.start()
+
+__all__ = ["Timeout"]
@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+
+"""
+Transports send the HTTP requests of `Klout` objects.
+
+A transport is any object with the methods below, `req` being a
+`urllib` request and `timeout` a number of seconds, a `Timeout` or the
+`TimeoutTimer` of a running call::
+
+    transport.urlopen(req, timeout)   # response object
+    transport.close()
+
+`urlopen` behaves like `urllib.urlopen`: it returns an object with
+`info()`, `getcode()`, `read(amt)` and `close()` methods, raises
+`HTTPError` on HTTP error statuses and `URLError` (or `socket.error`)
+when the server can not be reached.
+
+Two transports are provided: `UrllibTransport`, the default, and
+`klout.pool.ConnectionPool` which keeps connections alive between
+calls::
+
+    from klout import Klout, ConnectionPool
+
+    k = Klout('YOUR_KEY_HERE', transport=ConnectionPool(maxsize=4))
+
+"""
+import copy
+
+try:
+    import http.client as httplib
+    import urllib.request as urllib_request
+except ImportError:
+    import httplib
+    import urllib2 as urllib_request
+
+from .timeout import start_timer
+
+
+class TimedResponse(object):
+    """
+    Wraps a response so that every read is bounded by the read timeout
+    and the deadline of the call.
+    """
+
+    def __init__(self, handle, timer):
+        self.handle = handle
+        self.timer = timer
+
+    def info(self):
+        """
+        Response headers
+        """
+        return self.handle.info()
+
+    def getcode(self):
+        """
+        HTTP status code
+        """
+        return self.handle.getcode()
+
+    def read(self, amt=None):
+        """
+        Read the response body
+        """
+        self.timer.arm()
+        if amt is None:
+            return self.handle.read()
+        # read1 returns after a single recv, so the deadline is checked
+        # again before waiting for more data
+        return getattr(self.handle, 'read1', self.handle.read)(amt)
+
+    def close(self):
+        """
+        Closes the response
+        """
+        self.handle.close()
+
+
+class _TimedHTTPConnection(httplib.HTTPConnection):
+    """
+    Connection switching from the connect timeout to the read timeout of
+    its `timer` once connected
+    """
+    timer = None
+
+    def connect(self):
+        self.timeout = self.timer.connect_timeout()
+        httplib.HTTPConnection.connect(self)
+        self.timer.mark('connect')
+        self.timer.arm(self.sock)
+
+
+class _TimedHTTPSConnection(httplib.HTTPSConnection):
+    """
+    HTTPS version of `_TimedHTTPConnection`
+    """
+    timer = None
+
+    def connect(self):
+        self.timeout = self.timer.connect_timeout()
+        httplib.HTTPSConnection.connect(self)
+        self.timer.mark('connect')
+        self.timer.arm(self.sock)
+
+
+def _connection_factory(conn_cls, timer):
+    def factory(host, **kwargs):
+        """
+        Returns a `conn_cls` connection bound to `timer`
+        """
+        conn = conn_cls(host, **kwargs)
+        conn.timer = timer
+        return conn
+    return factory
+
+
+class _HTTPHandler(urllib_request.HTTPHandler):
+    def http_open(self, req):
+        return self.do_open(
+            _connection_factory(_TimedHTTPConnection, req.timer), req)
+
+
+class _HTTPSHandler(urllib_request.HTTPSHandler):
+    def https_open(self, req):
+        kwargs = {}
+        if getattr(self, '_context', None) is not None:
+            kwargs['context'] = self._context
+        if getattr(self, '_check_hostname', None) is not None:
+            kwargs['check_hostname'] = self._check_hostname
+        return self.do_open(
+            _connection_factory(_TimedHTTPSConnection, req.timer), req,
+            **kwargs)
+
+
+def _timed_handler(handler):
+    """
+    Returns a copy of the handler `handler` of an opener, with the plain
+    HTTP and HTTPS handlers replaced by their timed versions
+    """
+    if handler.__class__ is urllib_request.HTTPHandler:
+        timed = _HTTPHandler()
+    elif handler.__class__ is urllib_request.HTTPSHandler:
+        timed = _HTTPSHandler()
+    else:
+        # The copy gets a parent of its own, the installed opener is left
+        # untouched
+        return copy.copy(handler)
+    timed.__dict__.update(handler.__dict__)
+    return timed
+
+
+# (installed opener, timed opener built from it)
+_OPENERS = (None, None)
+
+
+def _opener():
+    """
+    Returns the opener installed with `urllib.install_opener`, or the
+    default one, with timed HTTP and HTTPS handlers
+    """
+    global _OPENERS  # pylint: disable=global-statement
+    # pylint: disable=protected-access
+    installed = urllib_request._opener
+    cached, opener = _OPENERS
+    if opener is None or cached is not installed:
+        source = installed or urllib_request.build_opener()
+        opener = urllib_request.OpenerDirector()
+        for handler in source.handlers:
+            opener.add_handler(_timed_handler(handler))
+        _OPENERS = (installed, opener)
+    return opener
+
+
+class UrllibTransport(object):  # pylint: disable=too-few-public-methods
+    """
+    Default transport: one `urllib` request, and so one connection, per
+    call.
+
+    Like `urllib.urlopen`, it goes through the opener installed with
+    `urllib.install_opener` if any, so its proxy, authentication or
+    HTTPS handlers are used.
+    """
+
+    # pylint: disable=no-self-use
+    def urlopen(self, req, timeout=None):
+        """
+        `urllib.urlopen` honouring the connect, read and total timeouts of
+        `timeout`
+        """
+        timer = start_timer(timeout)
+        req.timer = timer
+        handle = _opener().open(req, timeout=timer.connect_timeout())
+        return TimedResponse(handle, timer)
+
+    def close(self):
+        """
+        Nothing to close
+        """
+        pass
+
+__all__ = ["UrllibTransport"]
@@ -20,8 +20,8 @@ else:
         raise RuntimeError("unable to find version in yourpackage/_version.py")
 
 INSTALL_REQUIRES = []
-if sys.version_info < (2, 6):
-    INSTALL_REQUIRES = ['simplejson']
+if sys.version_info < (2, 7):
+    INSTALL_REQUIRES = ['ordereddict']
 
 TEST_REQUIRE = ['nose', 'unittest2']
 if sys.version_info >= (3, 0):
@@ -43,12 +43,14 @@ setup(
         'Natural Language :: English',
         'Operating System :: OS Independent',
         'Programming Language :: Python',
-        'Programming Language :: Python :: 2.5',
         'Programming Language :: Python :: 2.6',
         'Programming Language :: Python :: 2.7',
         'Programming Language :: Python :: 3',
         'Topic :: Communications',
     ],
     install_requires=INSTALL_REQUIRES,
-    tests_require=TEST_REQUIRE
+    tests_require=TEST_REQUIRE,
+    entry_points={
+        'console_scripts': ['klout = klout.cli:main'],
+    }
 )
@@ -0,0 +1,284 @@
+"""
+Benchmarks of the client hot path, run offline against
+`klout.testing.FakeKloutServer`::
+
+    python -m tests.benchmark
+    python -m tests.benchmark --quick --save baseline.json
+    python -m tests.benchmark --compare baseline.json
+
+Every benchmark reports operations per second, the median (p50) and
+99th percentile (p99) latency of one operation and, where `tracemalloc`
+is available, the memory allocated while running one operation.
+
+With `--compare`, the run fails when a benchmark got slower than the
+saved one by more than `--tolerance`.
+"""
+from __future__ import print_function, with_statement
+
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
+import gzip
+import io
+import optparse
+import sys
+import threading
+import time
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+from klout import Klout, ConnectionPool
+from klout.lazy import decode_lazy
+from klout.pool import PooledResponse
+from klout.stream import decode
+from klout.testing import FakeKloutServer
+
+try:
+    _clock = time.perf_counter
+except AttributeError:
+    _clock = time.time
+
+KEY = 'BENCHMARK_KEY'
+
+
+def percentile(values, fraction):
+    """
+    Returns the `fraction` percentile of the sorted list `values`
+    """
+    index = min(len(values) - 1, int(len(values) * fraction))
+    return values[index]
+
+
+def allocated(func):
+    """
+    Returns the number of bytes allocated while running `func` once, or
+    None without `tracemalloc`
+    """
+    if tracemalloc is None or not hasattr(tracemalloc, 'reset_peak'):
+        return None
+    func()  # warm caches up so they don't count
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        func()
+        return tracemalloc.get_traced_memory()[1] - before
+    finally:
+        tracemalloc.stop()
+
+
+def measure(name, func, duration):
+    """
+    Runs `func` over and over for `duration` seconds, returns its stats
+    """
+    latencies = []
+    func()
+    started = _clock()
+    deadline = started + duration
+    now = started
+    while now < deadline:
+        func()
+        end = _clock()
+        latencies.append(end - now)
+        now = end
+    return report(name, latencies, now - started, allocated(func))
+
+
+def report(name, latencies, elapsed, alloc=None):
+    """
+    Returns the stats dict of benchmark `name`
+    """
+    latencies.sort()
+    return {'name': name,
+            'ops': len(latencies) / elapsed,
+            'p50': percentile(latencies, 0.50),
+            'p99': percentile(latencies, 0.99),
+            'alloc': alloc}
+
+
+def gzipped(result):
+    """
+    Returns the gzip compressed JSON encoding of `result`
+    """
+    buf = io.BytesIO()
+    zip_file = gzip.GzipFile(fileobj=buf, mode='wb')
+    zip_file.write(json.dumps(result).encode('utf8'))
+    zip_file.close()
+    return buf.getvalue()
+
+
+def bench_uri(k, duration):
+    """
+    URI construction of a call, as done by `KloutCall.__call__`
+    """
+    call = k.user.score
+    endpoint = k.endpoint('user.score')
+    yield measure('uri', lambda: call._build_uri({'kloutId': '11747'}),
+                  duration)
+    yield measure('uri.endpoint',
+                  lambda: endpoint._build_uri({'kloutId': '11747'}),
+                  duration)
+
+
+def bench_chaining(k, duration):
+    """
+    Attribute chaining through `KloutCall.__getattr__`
+    """
+    yield measure('chaining', lambda: k.user.score, duration)
+    yield measure('chaining.deep', lambda: k.identity.klout._('11747').tw,
+                  duration)
+
+
+def bench_decode(server, duration):
+    """
+    Decompression and decoding of small and large responses
+    """
+    headers = {'Content-Encoding': 'gzip'}
+    small = gzipped(server.resolve(['v2', 'user.json', '11747', 'score'],
+                                   {}))
+    influencers, server.influencers = server.influencers, 1000
+    large = gzipped(server.resolve(['v2', 'user.json', '11747',
+                                    'influence'], {}))
+    server.influencers = influencers
+    for name, body in (('decode.small', small), ('decode.large', large)):
+        yield measure(name, lambda body=body: decode(
+            PooledResponse('', 200, 'OK', headers, body)), duration)
+    yield measure('decode.small.lazy', lambda: decode_lazy(
+        PooledResponse('', 200, 'OK', headers, small), 'user.score'),
+                  duration)
+    yield measure('decode.large.lazy', lambda: decode_lazy(
+        PooledResponse('', 200, 'OK', headers, large),
+        'user.influence').get('myInfluencers'), duration)
+
+
+def bench_throughput(server, duration, concurrency_levels):
+    """
+    End to end calls through a connection pool, from `concurrency`
+    threads at once
+    """
+    for concurrency in concurrency_levels:
+        pool = ConnectionPool(maxsize=concurrency)
+        k = Klout(KEY, domain=server.domain, transport=pool)
+        k.user.score(kloutId='11747')
+        latencies = []
+        lock = threading.Lock()
+        deadline = _clock() + duration
+
+        def worker():
+            """
+            Calls the API until the deadline
+            """
+            mine = []
+            now = _clock()
+            while now < deadline:
+                k.user.score(kloutId='11747')
+                end = _clock()
+                mine.append(end - now)
+                now = end
+            with lock:
+                latencies.extend(mine)
+
+        started = _clock()
+        threads = [threading.Thread(target=worker)
+                   for _ in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = _clock() - started
+        pool.close()
+        yield report('throughput.c%d' % concurrency, latencies, elapsed)
+
+
+def run(duration, concurrency_levels):
+    """
+    Runs every benchmark, returns the list of their stats
+    """
+    results = []
+    with FakeKloutServer() as server:
+        k = Klout(KEY, domain=server.domain)
+        for benchmarks in (bench_uri(k, duration),
+                           bench_chaining(k, duration),
+                           bench_decode(server, duration),
+                           bench_throughput(server, duration,
+                                            concurrency_levels)):
+            for result in benchmarks:
+                print(format_result(result))
+                results.append(result)
+    return results
+
+
+def _format_time(seconds):
+    for unit, scale in (('s', 1), ('ms', 1e-3), ('us', 1e-6)):
+        if seconds >= scale:
+            return '%.1f%s' % (seconds / scale, unit)
+    return '%.0fns' % (seconds / 1e-9)
+
+
+def format_result(result):
+    """
+    Returns `result` as a line of the report
+    """
+    alloc = result['alloc']
+    return '%-20s %12.0f ops/s  p50 %8s  p99 %8s  alloc %s' % (
+        result['name'], result['ops'], _format_time(result['p50']),
+        _format_time(result['p99']),
+        '-' if alloc is None else '%dB' % alloc)
+
+
+def compare(results, baseline, tolerance):
+    """
+    Returns the names of the benchmarks of `results` slower than in
+    `baseline` by more than `tolerance`
+    """
+    previous = dict((result['name'], result) for result in baseline)
+    regressions = []
+    for result in results:
+        before = previous.get(result['name'])
+        if before is not None and \
+                result['ops'] < before['ops'] * (1 - tolerance):
+            print('%s regressed: %.0f ops/s, was %.0f ops/s' % (
+                result['name'], result['ops'], before['ops']))
+            regressions.append(result['name'])
+    return regressions
+
+
+def main(argv=None):
+    """
+    Command line entry point
+    """
+    parser = optparse.OptionParser(usage='%prog [options]')
+    parser.add_option('--duration', type='float', default=1.0,
+                      help='seconds spent on each benchmark')
+    parser.add_option('--quick', action='store_true',
+                      help='short run, for a smoke test')
+    parser.add_option('--concurrency', default='1,4,16',
+                      help='comma separated concurrency levels')
+    parser.add_option('--save', help='write the results to this file')
+    parser.add_option('--compare',
+                      help='fail on regressions against this file')
+    parser.add_option('--tolerance', type='float', default=0.2,
+                      help='slowdown allowed by --compare')
+    options, _ = parser.parse_args(argv)
+
+    duration = 0.1 if options.quick else options.duration
+    levels = [int(level) for level in options.concurrency.split(',')]
+    results = run(duration, levels)
+
+    if options.save:
+        with open(options.save, 'w') as results_file:
+            json.dump(results, results_file, indent=2)
+    if options.compare:
+        with open(options.compare) as baseline_file:
+            if compare(results, json.load(baseline_file),
+                       options.tolerance):
+                return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,161 @@
+"""
+Unit tests for circuit breakers
+"""
+from __future__ import with_statement
+import time
+import unittest2
+
+from klout import (Klout, CircuitBreaker, ConnectionPool, Hedge,
+                   KloutHTTPError, KloutCircuitOpenError,
+                   KloutRateLimitError, RateLimiter, Retry)
+from klout.testing import FakeKloutServer
+
+from tests import test_hedge
+
+
+class TestCircuitBreaker(unittest2.TestCase):
+    """
+    Tests the circuit breaker against the fake Klout server
+    """
+    def setUp(self):
+        self.server = FakeKloutServer(error_rate=1).start()
+        self.breaker = CircuitBreaker(min_calls=4, window=10, cooldown=0.2)
+        self.k = Klout('TEST_KEY', domain=self.server.domain,
+                       breaker=self.breaker)
+
+    def tearDown(self):
+        self.server.stop()
+
+    def fail_calls(self, count):
+        """
+        Makes `count` calls failing with 503
+        """
+        for _ in range(count):
+            with self.assertRaises(KloutHTTPError) as context:
+                self.k.user.score(kloutId='11747')
+            self.assertNotIsInstance(context.exception,
+                                     KloutCircuitOpenError)
+
+    def test_opens(self):
+        """
+        Tests an endpoint failing too often fails fast
+        """
+        self.fail_calls(4)
+        self.assertEqual(self.breaker.state('user.score'), 'open')
+        with self.assertRaises(KloutCircuitOpenError) as context:
+            self.k.user.score(kloutId='11747')
+        self.assertEqual(context.exception.endpoint, 'user.score')
+        self.assertTrue(0 < context.exception.retry_in <= 0.2)
+        self.assertEqual(self.server.requests, 4)
+
+        # Other endpoints have circuits of their own
+        self.assertEqual(self.breaker.state('user.topics'), 'closed')
+        stats = self.breaker.stats()['user.score']
+        self.assertEqual(stats['opened'], 1)
+        self.assertEqual(stats['rejected'], 1)
+
+    def test_probe(self):
+        """
+        Tests a successful probe closes the circuit, a failed one opens it
+        again
+        """
+        self.fail_calls(4)
+        time.sleep(0.25)
+        self.assertEqual(self.breaker.state('user.score'), 'half_open')
+        self.fail_calls(1)
+        self.assertEqual(self.breaker.state('user.score'), 'open')
+
+        time.sleep(0.25)
+        self.server.error_rate = 0
+        self.assertIn('score', self.k.user.score(kloutId='11747'))
+        self.assertEqual(self.breaker.state('user.score'), 'closed')
+        self.assertEqual(self.breaker.stats()['user.score']['opened'], 2)
+
+    def test_half_open_probes(self):
+        """
+        Tests only `probes` calls at a time go through while half-open
+        """
+        self.fail_calls(4)
+        time.sleep(0.25)
+        self.assertEqual(self.breaker.allow('user.score'), (None, True))
+        self.assertEqual(self.breaker.allow('user.score'), (0.0, False))
+        self.breaker.release('user.score', True)
+        self.assertEqual(self.breaker.allow('user.score'), (None, True))
+
+    def test_late_outcomes(self):
+        """
+        Tests attempts allowed while the circuit was closed don't act as
+        probes once it's half-open
+        """
+        slow, probe = self.breaker.allow('user.score')
+        self.assertEqual((slow, probe), (None, False))
+        self.fail_calls(4)
+        time.sleep(0.25)
+        self.assertEqual(self.breaker.allow('user.score'), (None, True))
+        self.breaker.record('user.score', None, probe)
+        self.assertEqual(self.breaker.state('user.score'), 'half_open')
+        self.assertEqual(self.breaker.allow('user.score'), (0.0, False))
+        self.breaker.release('user.score', probe)
+        self.assertEqual(self.breaker.allow('user.score'), (0.0, False))
+
+    def test_rate_limited(self):
+        """
+        Tests calls rejected by the client side rate limiter don't open
+        the circuit
+        """
+        self.server.error_rate = 0
+        self.k.limiter = RateLimiter(per_second=0.1, burst=1, max_wait=0)
+        self.k.user.score(kloutId='11747')
+        for _ in range(6):
+            with self.assertRaises(KloutRateLimitError):
+                self.k.user.score(kloutId='11747')
+        self.assertEqual(self.breaker.state('user.score'), 'closed')
+        self.assertEqual(self.breaker.stats()['user.score']['calls'], 1)
+
+    def test_hedge(self):
+        """
+        Tests the request cancelled when its hedged copy wins isn't a
+        failure
+        """
+        self.server.stop()
+        self.server = test_hedge.StallingServer().start()
+        breaker = CircuitBreaker(min_calls=1)
+        pool = ConnectionPool()
+        k = Klout('TEST_KEY', domain=self.server.domain, pool=pool,
+                  hedge=Hedge(delay=0.05, max_rate=1), breaker=breaker)
+        self.assertIn('score', k.user.score(kloutId='11747'))
+        time.sleep(0.1)
+        self.assertEqual(pool.stats()['discarded'], 1)
+        self.assertEqual(breaker.state('user.score'), 'closed')
+        self.assertEqual(breaker.stats()['user.score']['failures'], 0)
+        pool.close()
+
+    def test_is_failure(self):
+        """
+        Tests only server errors are failures
+        """
+        self.assertFalse(CircuitBreaker.is_failure("No developer key"))
+        self.fail_calls(1)
+        self.assertEqual(self.breaker.stats()['user.score']['failures'], 1)
+
+    def test_client_errors(self):
+        """
+        Tests 4xx errors don't open the circuit
+        """
+        self.server.error_rate = 0
+        for _ in range(6):
+            with self.assertRaises(KloutHTTPError):
+                self.k.user.missing(kloutId='11747')
+        self.assertEqual(self.breaker.state('user.missing'), 'closed')
+
+    def test_no_retry(self):
+        """
+        Tests calls rejected by an open circuit aren't retried
+        """
+        self.k.retry = Retry(total=3, backoff=0.01)
+        self.fail_calls(1)
+        self.assertEqual(self.breaker.state('user.score'), 'open')
+        started = time.time()
+        with self.assertRaises(KloutCircuitOpenError):
+            self.k.user.score(kloutId='11747')
+        self.assertTrue(time.time() - started < 0.1)
@@ -0,0 +1,193 @@
+"""
+Unit tests for Klout response caches
+"""
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+import unittest2
+
+from klout import LRUCache, DiskCache, IdentityMap
+from klout.lazy import Score
+
+
+def fill_disk_cache(args):
+    """
+    Writes results to the disk cache at `path` from another process
+    """
+    path, worker = args
+    cache = DiskCache(path)
+    for i in range(50):
+        cache.set('%d/%d' % (worker, i), {'score': i}, 'user.score')
+    cache.close()
+    return worker
+
+
+class TestLRUCache(unittest2.TestCase):
+    """
+    Tests the in-memory LRU cache
+    """
+    def test_lru_eviction(self):
+        """
+        Tests that the least recently used result is evicted first
+        """
+        cache = LRUCache(maxsize=2)
+        cache.set('a', {'score': 1}, 'user.score')
+        cache.set('b', {'score': 2}, 'user.score')
+        self.assertEqual(cache.get('a'), {'score': 1})
+        cache.set('c', {'score': 3}, 'user.score')
+
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), {'score': 1})
+        self.assertEqual(cache.get('c'), {'score': 3})
+
+        stats = cache.stats()
+        self.assertEqual(stats['hits'], 3)
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['evictions'], 1)
+        self.assertEqual(stats['size'], 2)
+
+    def test_ttls(self):
+        """
+        Tests per endpoint and per resource TTLs
+        """
+        cache = LRUCache(ttl=0.01, ttls={'identity': 60, 'user.topics': 0})
+        self.assertEqual(cache.ttl_for('identity.klout'), 60)
+        self.assertEqual(cache.ttl_for('user.score'), 0.01)
+
+        cache.set('identity', {'id': '11747'}, 'identity.klout')
+        cache.set('score', {'score': 1}, 'user.score')
+        cache.set('topics', [], 'user.topics')
+        self.assertIsNone(cache.get('topics'))
+        time.sleep(0.02)
+
+        self.assertIsNone(cache.get('score'))
+        self.assertEqual(cache.get('identity'), {'id': '11747'})
+        self.assertEqual(cache.stats()['expirations'], 1)
+
+
+class TestIdentityMap(unittest2.TestCase):
+    """
+    Tests the identity map
+    """
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_bounded(self):
+        """
+        Tests that at most maxsize identities are kept in memory
+        """
+        identities = IdentityMap(maxsize=1)
+        identities.set('a', {'id': '1'})
+        identities.set('b', {'id': '2'})
+        self.assertIsNone(identities.get('a'))
+        self.assertEqual(identities.get('b'), {'id': '2'})
+        self.assertEqual(identities.stats()['size'], 1)
+
+    def test_persistence(self):
+        """
+        Tests that identities are read back from disk
+        """
+        path = os.path.join(self.tmpdir, 'identities')
+        identities = IdentityMap(path=path)
+        identities.set('v2/identity.json/twitter?screenName=erfaan',
+                       {'id': '11747', 'network': 'ks'}, 'identity.klout')
+        identities.close()
+
+        identities = IdentityMap(path=path)
+        self.assertEqual(
+            identities.get('v2/identity.json/twitter?screenName=erfaan'),
+            {'id': '11747', 'network': 'ks'})
+        identities.close()
+
+
+class TestDiskCache(unittest2.TestCase):
+    """
+    Tests the SQLite cache
+    """
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'cache.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_persistence(self):
+        """
+        Tests that results are read back by another cache object
+        """
+        cache = DiskCache(self.path)
+        cache.set('v2/user.json/11747/score',
+                  Score.from_dict({'score': 50.5, 'scoreDelta': {
+                      'dayChange': 0.5, 'monthChange': -1.0}}),
+                  'user.score')
+        cache.close()
+
+        cache = DiskCache(self.path)
+        self.assertEqual(cache.get('v2/user.json/11747/score'),
+                         {'score': 50.5, 'scoreDelta': {
+                             'dayChange': 0.5, 'monthChange': -1.0}})
+        self.assertIsNone(cache.get('v2/user.json/635263/score'))
+        self.assertEqual(cache.stats()['hits'], 1)
+        self.assertEqual(cache.stats()['misses'], 1)
+        cache.close()
+
+    def test_ttls(self):
+        """
+        Tests expired results are missed and compacted away
+        """
+        cache = DiskCache(self.path, ttl=0.01,
+                          ttls={'identity': 60, 'user.topics': 0})
+        cache.set('score', {'score': 1}, 'user.score')
+        cache.set('identity', {'id': '11747'}, 'identity.klout')
+        cache.set('topics', [], 'user.topics')
+        self.assertIsNone(cache.get('topics'))
+        time.sleep(0.02)
+
+        self.assertIsNone(cache.get('score'))
+        self.assertEqual(cache.get('identity'), {'id': '11747'})
+        self.assertEqual(len(cache), 2)
+        cache.compact(vacuum=True)
+        self.assertEqual(len(cache), 1)
+        cache.close()
+
+    def test_max_bytes(self):
+        """
+        Tests results closest to expiring are evicted past max_bytes
+        """
+        cache = DiskCache(self.path, max_bytes=1000, compact_every=10)
+        for i in range(20):
+            cache.set('%02d' % i, {'payload': 'x' * 80}, 'user.score')
+        stats = cache.stats()
+        self.assertLessEqual(stats['bytes'], 1000)
+        self.assertEqual(stats['evictions'] + stats['size'], 20)
+        self.assertIsNone(cache.get('00'))
+        self.assertIsNotNone(cache.get('19'))
+        cache.close()
+
+    def test_processes(self):
+        """
+        Tests that several processes can write at the same time
+        """
+        DiskCache(self.path).close()
+        pool = multiprocessing.Pool(4)
+        try:
+            workers = pool.map(fill_disk_cache,
+                               [(self.path, worker) for worker in range(4)])
+        finally:
+            pool.close()
+            pool.join()
+        self.assertEqual(workers, [0, 1, 2, 3])
+
+        cache = DiskCache(self.path)
+        self.assertEqual(len(cache), 200)
+        self.assertEqual(cache.get('3/49'), {'score': 49})
+        cache.close()
+
+
+if __name__ == '__main__':
+    unittest2.main()
@@ -0,0 +1,136 @@
+"""
+Unit tests for the command line bulk runner
+"""
+from __future__ import with_statement
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest2
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+from klout.cli import main, read_identities
+from klout.testing import FakeKloutServer, klout_id
+
+
+class TestReadIdentities(unittest2.TestCase):
+    """
+    Tests reading the input formats
+    """
+    def test_lines(self):
+        """
+        Tests empty lines are skipped
+        """
+        self.assertEqual(list(read_identities(['erfaan\n', ' \n', 'foo'])),
+                         ['erfaan', 'foo'])
+
+    def test_csv(self):
+        """
+        Tests CSV columns are picked by name or type
+        """
+        lines = ['name,kloutId\n', 'erfaan,11747\n', 'foo,\n', 'bar,42\n']
+        self.assertEqual(list(read_identities(lines, 'csv')),
+                         ['erfaan', 'foo', 'bar'])
+        self.assertEqual(list(read_identities(lines, 'csv',
+                                              kind='kloutId')),
+                         ['11747', '42'])
+        with self.assertRaises(ValueError):
+            list(read_identities(lines, 'csv', column='missing'))
+
+    def test_ndjson(self):
+        """
+        Tests NDJSON fields are picked by name or type
+        """
+        lines = ['{"screenName": "erfaan", "id": 11747}\n', '\n',
+                 '{"screenName": "foo"}\n']
+        self.assertEqual(list(read_identities(lines, 'ndjson')),
+                         ['erfaan', 'foo'])
+        self.assertEqual(list(read_identities(lines, 'ndjson',
+                                              column='id')), ['11747'])
+
+
+class TestMain(unittest2.TestCase):
+    """
+    Tests runs against the fake Klout server
+    """
+    def setUp(self):
+        self.server = FakeKloutServer().start()
+        self.directory = tempfile.mkdtemp()
+        self.input = os.path.join(self.directory, 'names.txt')
+        self.output = os.path.join(self.directory, 'scores.ndjson')
+        self.checkpoint = os.path.join(self.directory, 'checkpoint')
+        self.names = ['user%d' % index for index in range(10)]
+        with open(self.input, 'w') as handle:
+            handle.write('\n'.join(self.names) + '\n')
+        self.stderr = sys.stderr
+        sys.stderr = StringIO()
+
+    def tearDown(self):
+        sys.stderr = self.stderr
+        self.server.stop()
+        shutil.rmtree(self.directory)
+
+    def run_main(self, *args):
+        """
+        Runs the command, returns its exit status and output rows
+        """
+        status = main(['--key', 'TEST_KEY', '--domain', self.server.domain,
+                       '-i', self.input, '-o', self.output] + list(args))
+        with open(self.output) as handle:
+            return status, [json.loads(line) for line in handle]
+
+    def test_run(self):
+        """
+        Tests every input gets a row, in order
+        """
+        status, rows = self.run_main('-r', 'score,topics', '-c', '4')
+        self.assertEqual(status, 0)
+        self.assertEqual([row['input'] for row in rows], self.names)
+        for row in rows:
+            self.assertEqual(row['kloutId'],
+                             klout_id('twitter', row['input']))
+            self.assertIn('score', row['score'])
+            self.assertEqual(len(row['topics']), 5)
+        self.assertTrue(sys.stderr.getvalue().startswith(
+            '10 rows, 0 errors'))
+
+    def test_errors(self):
+        """
+        Tests failed rows carry their error
+        """
+        status, rows = self.run_main('-r', 'missing')
+        self.assertEqual(status, 0)
+        self.assertEqual(len(rows), 10)
+        for row in rows:
+            self.assertIn('404', row['error'])
+        self.assertTrue(sys.stderr.getvalue().startswith(
+            '10 rows, 10 errors'))
+
+    def test_resume(self):
+        """
+        Tests a run resumes after the last checkpoint, dropping the rows
+        written after it
+        """
+        with open(self.output, 'w') as handle:
+            handle.write('{"input": "user0"}\n{"input": "user1"}\n')
+            offset = handle.tell()
+            handle.write('{"input": "user2", "sco')
+        with open(self.checkpoint, 'w') as handle:
+            json.dump({'rows': 2, 'offset': offset}, handle)
+
+        status, rows = self.run_main('--checkpoint', self.checkpoint)
+        self.assertEqual(status, 0)
+        self.assertEqual([row['input'] for row in rows], self.names)
+        self.assertEqual(self.server.requests, 2 * 8)
+        with open(self.checkpoint) as handle:
+            self.assertEqual(json.load(handle)['rows'], 10)
+
+        # Nothing is left to do
+        status, rows = self.run_main('--checkpoint', self.checkpoint)
+        self.assertEqual(len(rows), 10)
+        self.assertEqual(self.server.requests, 2 * 8)
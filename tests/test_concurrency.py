@@ -0,0 +1,248 @@
+"""
+Unit tests for adaptive concurrency
+"""
+from __future__ import with_statement
+import random
+import time
+import unittest2
+
+from klout import (Klout, AdaptiveConcurrency, ConnectionPool, Hedge,
+                   KloutHTTPError, KloutRateLimitError, RateLimiter,
+                   Timeout)
+from klout.testing import FakeKloutServer
+
+from tests import test_hedge
+
+try:
+    import asyncio
+    from klout import AsyncKlout
+except ImportError:
+    AsyncKlout = None
+
+try:
+    import urllib.error as urllib_error
+except ImportError:
+    import urllib2 as urllib_error
+
+
+class TestAdaptiveConcurrency(unittest2.TestCase):
+    """
+    Tests the AIMD limit on its own
+    """
+    def test_acquire(self):
+        """
+        Tests no more slots than the limit are handed out
+        """
+        limit = AdaptiveConcurrency(initial=2)
+        self.assertTrue(limit.acquire())
+        self.assertTrue(limit.try_acquire())
+        woken = []
+        self.assertFalse(limit.try_acquire(lambda: woken.append(True)))
+        self.assertFalse(limit.acquire(0.05))
+        limit.release('user.score')
+        self.assertEqual(woken, [True])
+        self.assertTrue(limit.acquire(0))
+
+    def test_increase(self):
+        """
+        Tests the limit grows by about `increase` per round of requests
+        """
+        limit = AdaptiveConcurrency(initial=2, max_limit=4)
+        for _ in range(10):
+            for _ in range(limit.limit):
+                limit.acquire()
+            for _ in range(limit.limit):
+                limit.release('user.score', time.time())
+        self.assertEqual(limit.limit, 4)
+        self.assertEqual(limit.stats()['decreases'], 0)
+
+    def test_decrease_once_per_round(self):
+        """
+        Tests errors of requests sent before the last decrease don't
+        decrease the limit again
+        """
+        limit = AdaptiveConcurrency(initial=8)
+        started = time.time()
+        error = urllib_error.URLError('timed out')
+        for _ in range(8):
+            limit.acquire()
+        for _ in range(8):
+            limit.release('user.score', started, error)
+        self.assertEqual(limit.limit, 4)
+
+        limit.acquire()
+        limit.release('user.score', time.time(), error)
+        self.assertEqual(limit.limit, 2)
+        self.assertEqual(limit.stats()['decreases'], 2)
+
+    def test_client_errors(self):
+        """
+        Tests 4xx errors other than 429 don't decrease the limit
+        """
+        limit = AdaptiveConcurrency(initial=8)
+        limit.acquire()
+        limit.release('user.score', time.time(),
+                      urllib_error.HTTPError('', 404, 'Not Found', {}, None))
+        self.assertEqual(limit.limit, 8)
+        limit.acquire()
+        limit.release('user.score', time.time(),
+                      urllib_error.HTTPError('', 429, 'Too Many', {}, None))
+        self.assertEqual(limit.limit, 4)
+        self.assertFalse(limit.is_congestion("Rate limit exceeded"))
+
+    def test_latency(self):
+        """
+        Tests an attempt much slower than the usual ones decreases the
+        limit
+        """
+        limit = AdaptiveConcurrency(initial=8, latency_tolerance=3)
+        for elapsed in (0.05, 0.06, 0.1):
+            limit.acquire()
+            limit.release('user.score', time.time() - elapsed)
+        self.assertEqual(limit.limit, 8)
+        limit.acquire()
+        limit.release('user.score', time.time() - 0.2)
+        self.assertEqual(limit.limit, 4)
+
+        # Endpoints are compared with themselves only
+        limit.acquire()
+        limit.release('user.topics', time.time() - 1)
+        self.assertEqual(limit.limit, 4)
+
+    def test_jitter(self):
+        """
+        Tests latencies varying within their usual range don't decrease
+        the limit
+        """
+        limit = AdaptiveConcurrency(initial=8, max_limit=8)
+        jitter = random.Random(0)
+        for _ in range(300):
+            limit.acquire()
+            elapsed = jitter.choice((0.01, 0.02, 0.05)) + \
+                jitter.random() * 0.05
+            limit.release('user.score', time.time() - elapsed)
+        self.assertEqual(limit.stats()['decreases'], 0)
+        self.assertEqual(limit.limit, 8)
+
+
+class TestKloutConcurrency(unittest2.TestCase):
+    """
+    Tests adaptive concurrency against the fake Klout server
+    """
+    def setUp(self):
+        self.server = FakeKloutServer(latency=0.02).start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_many(self):
+        """
+        Tests the limit grows while the server keeps up, and bounds the
+        requests in flight
+        """
+        limit = AdaptiveConcurrency(initial=2, max_limit=8)
+        k = Klout('TEST_KEY', domain=self.server.domain, pool=True,
+                  concurrency=limit)
+        results = list(k.user.score.many(
+            [{'kloutId': str(kloutId)} for kloutId in range(100)],
+            concurrency=16))
+        self.assertEqual(len(results), 100)
+        stats = limit.stats()
+        self.assertTrue(stats['limit'] > 2, stats)
+        self.assertTrue(stats['max_in_flight'] <= 8, stats)
+        self.assertEqual(stats['in_flight'], 0)
+
+    def test_errors(self):
+        """
+        Tests server errors shrink the limit
+        """
+        self.server.error_rate = 1
+        limit = AdaptiveConcurrency(initial=8)
+        k = Klout('TEST_KEY', domain=self.server.domain, concurrency=limit)
+        for _ in range(3):
+            with self.assertRaises(KloutHTTPError):
+                k.user.score(kloutId='11747')
+        self.assertEqual(limit.limit, 1)
+
+    def test_no_slot(self):
+        """
+        Tests a call fails once no slot is free before its deadline
+        """
+        limit = AdaptiveConcurrency(initial=1, max_limit=1)
+        k = Klout('TEST_KEY', domain=self.server.domain, concurrency=limit)
+        limit.acquire()
+        with self.assertRaises(KloutRateLimitError):
+            k.user.score(kloutId='11747', timeout=Timeout(total=0.1))
+        limit.release('user.score')
+        self.assertIn('score', k.user.score(kloutId='11747'))
+
+    def test_rate_limited(self):
+        """
+        Tests calls rejected by the client side rate limiter free their
+        slot without decreasing the limit
+        """
+        limit = AdaptiveConcurrency(initial=8)
+        k = Klout('TEST_KEY', domain=self.server.domain, concurrency=limit,
+                  limiter=RateLimiter(per_second=0.1, burst=1, max_wait=0))
+        k.user.score(kloutId='11747')
+        for _ in range(3):
+            with self.assertRaises(KloutRateLimitError):
+                k.user.score(kloutId='11747')
+        stats = limit.stats()
+        self.assertEqual(stats['limit'], 8)
+        self.assertEqual(stats['decreases'], 0)
+        self.assertEqual(stats['in_flight'], 0)
+
+    def test_hedge(self):
+        """
+        Tests the request cancelled when its hedged copy wins frees its
+        slot without decreasing the limit
+        """
+        self.server.stop()
+        self.server = test_hedge.StallingServer().start()
+        limit = AdaptiveConcurrency(initial=8)
+        pool = ConnectionPool()
+        k = Klout('TEST_KEY', domain=self.server.domain, pool=pool,
+                  hedge=Hedge(delay=0.05, max_rate=1), concurrency=limit)
+        self.assertIn('score', k.user.score(kloutId='11747'))
+        time.sleep(0.1)
+        self.assertEqual(pool.stats()['discarded'], 1)
+        stats = limit.stats()
+        self.assertEqual(stats['decreases'], 0)
+        self.assertEqual(stats['in_flight'], 0)
+        pool.close()
+
+
+@unittest2.skipIf(AsyncKlout is None, "asyncio is not available")
+class TestAsyncConcurrency(unittest2.TestCase):
+    """
+    Tests adaptive concurrency with asyncio
+    """
+    def setUp(self):
+        self.server = FakeKloutServer(latency=0.02).start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_gather(self):
+        """
+        Tests concurrent calls wait for a slot of the limit
+        """
+        limit = AdaptiveConcurrency(initial=2, max_limit=4)
+        k = AsyncKlout('TEST_KEY', domain=self.server.domain,
+                       concurrency=limit)
+        self.assertEqual(k.pool.maxsize, 4)
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            results = loop.run_until_complete(asyncio.gather(*[
+                k.user.score(kloutId=str(kloutId))
+                for kloutId in range(40)]))
+            self.assertEqual(len(results), 40)
+            stats = limit.stats()
+            self.assertTrue(stats['max_in_flight'] <= 4, stats)
+            self.assertEqual(stats['in_flight'], 0)
+            loop.run_until_complete(k.close())
+        finally:
+            asyncio.set_event_loop(None)
+            loop.close()
@@ -0,0 +1,110 @@
+"""
+Unit tests for conditional requests, run against the fake Klout server
+"""
+import unittest2
+
+from klout import Klout, ConnectionPool, Hooks, ValidatorCache
+from klout.testing import FakeKloutServer
+
+try:
+    import asyncio
+    from klout import AsyncKlout
+except ImportError:
+    AsyncKlout = None
+
+
+class TestConditional(unittest2.TestCase):
+    """
+    Tests revalidating results with ETags
+    """
+    def setUp(self):
+        self.server = FakeKloutServer().start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def check_revalidation(self, transport):
+        """
+        Tests unchanged results are reused and changed ones downloaded
+        """
+        validators = ValidatorCache()
+        k = Klout('TEST_KEY', domain=self.server.domain,
+                  transport=transport, validators=validators)
+
+        influence = k.user.influence(kloutId='11747')
+        self.assertIs(k.user.influence(kloutId='11747'), influence)
+        self.assertEqual(self.server.not_modified, 1)
+
+        self.server.influencers = 3
+        changed = k.user.influence(kloutId='11747')
+        self.assertEqual(changed['myInfluencersCount'], 3)
+        self.assertIs(k.user.influence(kloutId='11747'), changed)
+        self.assertEqual(self.server.not_modified, 2)
+
+        self.assertEqual(validators.stats(),
+                         {'conditional': 3, 'not_modified': 2, 'size': 1})
+
+    def test_urllib(self):
+        """
+        Tests the default transport, which raises on 304 responses
+        """
+        self.check_revalidation(None)
+
+    def test_pool(self):
+        """
+        Tests the pooled transport
+        """
+        pool = ConnectionPool()
+        self.check_revalidation(pool)
+        pool.close()
+
+    @unittest2.skipIf(AsyncKlout is None, "asyncio is not available")
+    def test_async(self):
+        """
+        Tests the asyncio transport reads 304 responses, which have no
+        Content-Length, without waiting for the connection to close
+        """
+        k = AsyncKlout('TEST_KEY', domain=self.server.domain,
+                       validators=True)
+        loop = asyncio.new_event_loop()
+        try:
+            influence = loop.run_until_complete(
+                k.user.influence(kloutId='11747'))
+            self.assertIs(loop.run_until_complete(asyncio.wait_for(
+                k.user.influence(kloutId='11747'), 2)), influence)
+            self.assertEqual(self.server.not_modified, 1)
+            self.assertEqual(k.pool.stats()['created'], 1)
+            loop.run_until_complete(k.close())
+        finally:
+            loop.close()
+
+    def test_no_validators(self):
+        """
+        Tests responses without validators are not remembered
+        """
+        self.server.validators = False
+        k = Klout('TEST_KEY', domain=self.server.domain, validators=True)
+        k.user.score(kloutId='11747')
+        k.user.score(kloutId='11747')
+        self.assertEqual(self.server.not_modified, 0)
+        self.assertEqual(len(k.validators), 0)
+
+    def test_hooks(self):
+        """
+        Tests 304 responses are reported to hooks
+        """
+        statuses = []
+
+        class Statuses(Hooks):
+            """
+            Keeps the status of every response
+            """
+            def after_response(self, event):
+                statuses.append((event.status, event.bytes_received))
+
+        k = Klout('TEST_KEY', domain=self.server.domain, validators=True,
+                  hooks=Statuses())
+        k.user.score(kloutId='11747')
+        k.user.score(kloutId='11747')
+        self.assertEqual(statuses[1], (304, 0))
+        self.assertEqual(statuses[0][0], 200)
@@ -0,0 +1,186 @@
+"""
+Unit tests for hedged requests
+"""
+from __future__ import with_statement
+import threading
+import time
+import unittest2
+
+from klout import (Klout, ConnectionPool, Hedge, KloutHTTPError,
+                   MetricsCollector, RateLimiter)
+from klout.testing import FakeKloutServer
+
+try:
+    import asyncio
+    from klout import AsyncKlout
+except ImportError:
+    AsyncKlout = None
+
+
+class StallingServer(FakeKloutServer):
+    """
+    Fake Klout server answering its first `stalls` requests after
+    `stall` seconds
+    """
+    def __init__(self, stalls=1, stall=1.0, **kwargs):
+        FakeKloutServer.__init__(self, **kwargs)
+        self.stalls = stalls
+        self.stall = stall
+        self._stall_lock = threading.Lock()
+
+    def sleep(self):
+        with self._stall_lock:
+            stalled = self.stalls > 0
+            self.stalls -= 1
+        if stalled:
+            time.sleep(self.stall)
+        else:
+            FakeKloutServer.sleep(self)
+
+
+class TestHedge(unittest2.TestCase):
+    """
+    Tests hedged calls against the fake Klout server
+    """
+    def setUp(self):
+        self.server = StallingServer().start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_hedge_wins(self):
+        """
+        Tests a stalled request is overtaken by its copy
+        """
+        hedge = Hedge(delay=0.05, max_rate=1)
+        pool = ConnectionPool()
+        k = Klout('TEST_KEY', domain=self.server.domain, pool=pool,
+                  hedge=hedge)
+        started = time.time()
+        result = k.user.score(kloutId='11747')
+        elapsed = time.time() - started
+
+        self.assertIn('score', result)
+        self.assertTrue(elapsed < 0.5, elapsed)
+        self.assertEqual(self.server.requests, 2)
+        stats = hedge.stats()
+        self.assertEqual(stats['hedged'], 1)
+        self.assertEqual(stats['hedge_wins'], 1)
+
+        # The stalled request was cancelled, its connection closed
+        time.sleep(0.1)
+        self.assertEqual(pool.stats()['discarded'], 1)
+        pool.close()
+
+    def test_hooks(self):
+        """
+        Tests the cancelled request isn't reported to hooks as an error
+        """
+        metrics = MetricsCollector()
+        k = Klout('TEST_KEY', domain=self.server.domain,
+                  pool=ConnectionPool(), hedge=Hedge(delay=0.05, max_rate=1),
+                  hooks=metrics)
+        k.user.score(kloutId='11747')
+        time.sleep(0.1)
+        snapshot = metrics.snapshot()['user.score']
+        self.assertEqual(snapshot['requests'], 1)
+        self.assertEqual(snapshot['errors'], 0)
+        self.assertEqual(snapshot['statuses'], {200: 1})
+        k.pool.close()
+
+    def test_fast_calls(self):
+        """
+        Tests calls answered before the delay aren't hedged
+        """
+        self.server.stalls = 0
+        hedge = Hedge(delay=0.5, max_rate=1)
+        k = Klout('TEST_KEY', domain=self.server.domain, hedge=hedge)
+        for _ in range(3):
+            k.user.score(kloutId='11747')
+        self.assertEqual(self.server.requests, 3)
+        self.assertEqual(hedge.stats()['hedged'], 0)
+
+    def test_max_rate(self):
+        """
+        Tests the share of hedged calls is capped
+        """
+        self.server.stalls = 0
+        self.server.latency = 0.05
+        hedge = Hedge(delay=0.01, max_rate=0.25)
+        k = Klout('TEST_KEY', domain=self.server.domain, hedge=hedge)
+        for _ in range(8):
+            k.user.score(kloutId='11747')
+        self.assertEqual(hedge.stats()['hedged'], 2)
+        self.assertEqual(self.server.requests, 10)
+
+    def test_adaptive_delay(self):
+        """
+        Tests calls are hedged once the latencies of the endpoint are
+        known
+        """
+        self.server.stalls = 0
+        hedge = Hedge(min_samples=5, min_delay=0.05)
+        k = Klout('TEST_KEY', domain=self.server.domain, hedge=hedge)
+        for _ in range(4):
+            k.user.score(kloutId='11747')
+            self.assertEqual(hedge.delay_for('user.score'), None)
+        k.user.score(kloutId='11747')
+        self.assertEqual(hedge.stats()['delays'], {'user.score': 0.05})
+        self.assertEqual(hedge.delay_for('user.topics'), None)
+
+    def test_response_time(self):
+        """
+        Tests the delay is computed from the time requests take, not
+        from the time spent waiting for the rate limit
+        """
+        self.server.stalls = 0
+        hedge = Hedge(min_samples=5, min_delay=0.001)
+        k = Klout('TEST_KEY', domain=self.server.domain, hedge=hedge,
+                  limiter=RateLimiter(per_second=10, burst=1))
+        for _ in range(5):
+            k.user.score(kloutId='11747')
+        self.assertTrue(hedge.delay_for('user.score') < 0.05,
+                        hedge.stats())
+
+    def test_errors(self):
+        """
+        Tests a call fails only once both requests failed
+        """
+        self.server.stalls = 0
+        self.server.latency = 0.1
+        hedge = Hedge(delay=0.01, max_rate=1)
+        k = Klout('TEST_KEY', domain=self.server.domain, hedge=hedge)
+        with self.assertRaises(KloutHTTPError):
+            k.user.missing(kloutId='11747')
+        self.assertEqual(self.server.requests, 2)
+
+
+@unittest2.skipIf(AsyncKlout is None, "asyncio is not available")
+class TestAsyncHedge(unittest2.TestCase):
+    """
+    Tests hedged calls with asyncio
+    """
+    def setUp(self):
+        self.server = StallingServer().start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_hedge_wins(self):
+        """
+        Tests a stalled request is overtaken by its copy, and cancelled
+        """
+        hedge = Hedge(delay=0.05, max_rate=1)
+        k = AsyncKlout('TEST_KEY', domain=self.server.domain, hedge=hedge)
+        loop = asyncio.new_event_loop()
+        try:
+            started = time.time()
+            result = loop.run_until_complete(k.user.score(kloutId='11747'))
+            elapsed = time.time() - started
+            self.assertIn('score', result)
+            self.assertTrue(elapsed < 0.5, elapsed)
+            self.assertEqual(hedge.stats()['hedge_wins'], 1)
+            self.assertEqual(k.pool.stats()['discarded'], 1)
+            loop.run_until_complete(k.close())
+        finally:
+            loop.close()
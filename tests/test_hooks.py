@@ -0,0 +1,106 @@
+"""
+Unit tests for instrumentation hooks, run against the fake Klout server
+"""
+import unittest2
+
+from klout import (Klout, ConnectionPool, Hooks, KloutHTTPError,
+                   MetricsCollector, Retry)
+from klout.testing import FakeKloutServer
+
+
+class Recorder(Hooks):
+    """
+    Hook keeping every event it's told about
+    """
+    def __init__(self):
+        self.calls = []
+
+    def before_request(self, event):
+        self.calls.append(('before_request', event))
+
+    def after_response(self, event):
+        self.calls.append(('after_response', event))
+
+    def on_error(self, event):
+        self.calls.append(('on_error', event))
+
+
+class TestHooks(unittest2.TestCase):
+    """
+    Tests the events reported to hooks
+    """
+    def setUp(self):
+        self.server = FakeKloutServer().start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_events(self):
+        """
+        Tests the timings and byte counts of successful requests
+        """
+        recorder = Recorder()
+        pool = ConnectionPool()
+        k = Klout('TEST_KEY', domain=self.server.domain, transport=pool,
+                  hooks=recorder)
+        k.user.influence(kloutId='11747')
+        k.endpoint('user.score')(kloutId='11747')
+        pool.close()
+
+        self.assertEqual([name for name, _ in recorder.calls],
+                         ['before_request', 'after_response'] * 2)
+        event = recorder.calls[1][1]
+        self.assertEqual(event.endpoint, 'user.influence')
+        self.assertEqual(event.status, 200)
+        self.assertEqual(event.attempt, 1)
+        self.assertTrue(0 < event.bytes_received < event.bytes_decoded)
+        for phase in ('wait', 'connect', 'ttfb', 'download', 'decompress',
+                      'decode'):
+            self.assertIn(phase, event.phases)
+        self.assertTrue(sum(event.phases.values()) <= event.elapsed)
+
+        event = recorder.calls[3][1]
+        self.assertEqual(event.endpoint, 'user.score')
+        self.assertNotIn('connect', event.phases)
+
+    def test_errors(self):
+        """
+        Tests every failed attempt is reported
+        """
+        self.server.error_rate = 1
+        recorder = Recorder()
+        k = Klout('TEST_KEY', domain=self.server.domain, hooks=recorder,
+                  retry=Retry(total=1, backoff=0))
+        with self.assertRaises(KloutHTTPError):
+            k.user.score(kloutId='11747')
+
+        errors = [event for name, event in recorder.calls
+                  if name == 'on_error']
+        self.assertEqual([event.attempt for event in errors], [1, 2])
+        self.assertEqual(errors[0].status, 503)
+        self.assertEqual(errors[0].error.code, 503)
+
+    def test_metrics(self):
+        """
+        Tests the histograms of the metrics collector
+        """
+        metrics = MetricsCollector(buckets=(0.001, 10))
+        k = Klout('TEST_KEY', domain=self.server.domain,
+                  hooks=[metrics, Recorder()])
+        for _ in range(3):
+            k.user.score(kloutId='11747')
+        with self.assertRaises(KloutHTTPError):
+            k.user.missing(kloutId='11747')
+
+        snapshot = metrics.snapshot()
+        score = snapshot['user.score']
+        self.assertEqual(score['requests'], 3)
+        self.assertEqual(score['errors'], 0)
+        self.assertEqual(score['statuses'], {200: 3})
+        self.assertEqual(score['latency']['count'], 3)
+        self.assertEqual(score['latency']['buckets'][-1], (10, 3))
+        self.assertEqual(score['phases']['decode']['count'], 3)
+        self.assertEqual(snapshot['user.missing']['statuses'], {404: 1})
+
+        metrics.reset()
+        self.assertEqual(metrics.snapshot(), {})
@@ -0,0 +1,162 @@
+"""
+Unit tests for spreading calls over several developer keys
+"""
+import time
+import unittest2
+
+from klout import Klout, KeyPool, KloutHTTPError, KloutRateLimitError
+from klout.testing import FakeKloutServer
+
+
+class TestKeyPool(unittest2.TestCase):
+    """
+    Tests picking keys
+    """
+    def test_round_robin(self):
+        """
+        Tests keys are used in turn
+        """
+        keys = KeyPool(['a', 'b', 'c'])
+        picked = []
+        for _ in range(6):
+            key = keys.acquire()
+            picked.append(key)
+            keys.release(key)
+        self.assertEqual(picked, ['a', 'b', 'c', 'a', 'b', 'c'])
+
+    def test_least_used(self):
+        """
+        Tests the key with the fewest requests in flight is picked
+        """
+        keys = KeyPool(['a', 'b'], policy='least_used')
+        self.assertEqual(keys.acquire(), 'a')
+        self.assertEqual(keys.acquire(), 'b')
+        keys.release('b')
+        self.assertEqual(keys.acquire(), 'b')
+        self.assertEqual(keys.stats()['b']['in_flight'], 1)
+
+    def test_quota(self):
+        """
+        Tests daily quotas and per second limits
+        """
+        keys = KeyPool(['a', 'b'], policy='quota', per_day=2,
+                       per_second=1000)
+        picked = [keys.acquire() for _ in range(4)]
+        self.assertEqual(sorted(picked), ['a', 'a', 'b', 'b'])
+        self.assertIsNone(keys.acquire())
+        self.assertEqual(keys.stats()['a']['today'], 2)
+
+    def test_sideline(self):
+        """
+        Tests keys answered with quota errors are sidelined
+        """
+        class QuotaError(Exception):
+            """
+            HTTPError stand-in
+            """
+            code = 429
+            hdrs = {'Retry-After': '0.05'}
+
+        keys = KeyPool(['a', 'b'])
+        self.assertTrue(keys.release(keys.acquire(), QuotaError()))
+        self.assertEqual([keys.acquire(), keys.acquire()], ['b', 'b'])
+        self.assertTrue(0 < keys.stats()['a']['sidelined'] <= 0.05)
+        time.sleep(0.06)
+        self.assertEqual(keys.acquire(), 'a')
+
+        # The Retry-After of the last key tells when a key is available
+        keys = KeyPool(['a'])
+        error = QuotaError()
+        self.assertTrue(keys.release(keys.acquire(), error))
+        self.assertIs(keys.last_quota_error, error)
+        self.assertTrue(0 < keys.retry_in() <= 0.05)
+
+    def test_quota_errors(self):
+        """
+        Tests which errors are quota errors
+        """
+        class Forbidden(Exception):
+            """
+            HTTPError stand-in
+            """
+            code = 403
+            msg = 'Forbidden'
+            hdrs = {}
+
+        keys = KeyPool(['a'])
+        error = Forbidden()
+        self.assertFalse(keys.is_quota_error(error))
+        error.msg = 'Developer Over Rate'
+        self.assertTrue(keys.is_quota_error(error))
+        error.msg = 'Forbidden'
+        error.hdrs = {'X-Mashery-Error-Code': 'ERR_403_DEVELOPER_OVER_QPS'}
+        self.assertTrue(keys.is_quota_error(error))
+
+        self.assertFalse(keys.release(keys.acquire(), Forbidden()))
+        self.assertEqual(keys.retry_in(), 0)
+        self.assertIsNone(keys.last_quota_error)
+
+    def test_policy(self):
+        """
+        Tests unknown policies are refused
+        """
+        with self.assertRaises(ValueError):
+            KeyPool(['a'], policy='random')
+
+
+class TestKeysKlout(unittest2.TestCase):
+    """
+    Tests calls made with several keys against the fake Klout server
+    """
+    def setUp(self):
+        self.server = FakeKloutServer(key=['KEY_1', 'KEY_2', 'KEY_3'],
+                                      over_quota=['KEY_2']).start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_failover(self):
+        """
+        Tests over quota keys are skipped after their first failure
+        """
+        k = Klout(['KEY_1', 'KEY_2', 'KEY_3'], domain=self.server.domain)
+        for _ in range(6):
+            self.assertIn('score', k.user.score(kloutId='11747'))
+
+        self.assertEqual(self.server.keys,
+                         {'KEY_1': 3, 'KEY_2': 1, 'KEY_3': 3})
+        stats = k.key.stats()
+        self.assertEqual(stats['KEY_2']['quota_errors'], 1)
+        self.assertTrue(stats['KEY_2']['sidelined'] > 0)
+        self.assertEqual(stats['KEY_1']['in_flight'], 0)
+
+    def test_exhausted(self):
+        """
+        Tests calls fail once every key is over quota
+        """
+        self.server.over_quota.update(['KEY_1', 'KEY_3'])
+        k = Klout(['KEY_1', 'KEY_2', 'KEY_3'], domain=self.server.domain)
+        with self.assertRaises(KloutRateLimitError) as context:
+            k.user.score(kloutId='11747')
+        # The quota error of the last key is kept
+        self.assertEqual(context.exception.errors.code, 403)
+        self.assertTrue(55 < context.exception.retry_in <= 60)
+        with self.assertRaises(KloutRateLimitError) as context:
+            k.user.score(kloutId='11747')
+        self.assertEqual(context.exception.errors.code, 403)
+        self.assertEqual(sum(self.server.keys.values()), 3)
+
+    def test_invalid_key(self):
+        """
+        Tests a key answered with a plain 403 isn't sidelined
+        """
+        k = Klout(['BAD_KEY'], domain=self.server.domain)
+        for _ in range(2):
+            with self.assertRaises(KloutHTTPError) as context:
+                k.user.score(kloutId='11747')
+            self.assertNotIsInstance(context.exception, KloutRateLimitError)
+            self.assertEqual(context.exception.errors.code, 403)
+        stats = k.key.stats()['BAD_KEY']
+        self.assertEqual(stats['quota_errors'], 0)
+        self.assertEqual(stats['sidelined'], 0)
+        self.assertEqual(self.server.keys['BAD_KEY'], 2)
@@ -2,10 +2,17 @@
 Unit tests for Klout API
 """
 from __future__ import with_statement
+import socket
 import time
 import unittest2
 
-from klout import Klout, KloutHTTPError
+from klout import Klout, KloutHTTPError, ConnectionPool, Timeout
+
+try:
+    import asyncio
+    from klout import AsyncKlout
+except ImportError:
+    AsyncKlout = None
 
 
 class KloutBaseTest(unittest2.TestCase):
@@ -28,6 +35,32 @@ class TestKlout(unittest2.TestCase):
         with self.assertRaises(TypeError):
             Klout()  # pylint: disable=no-value-for-parameter
 
+    def test_endpoint(self):
+        """
+        Tests that bound endpoints build the same uris as chained calls
+        """
+        # pylint: disable=protected-access
+        k = Klout('KEY', secure=True)
+        score = k.endpoint('user.score')
+        self.assertEqual(
+            score._build_uri({'kloutId': 11747}),
+            ('v2/user.json/11747/score?key=KEY',
+             'https://api.klout.com/v2/user.json/11747/score?key=KEY',
+             'v2/user.json/11747/score'))
+        self.assertEqual(score._build_uri({'kloutId': 11747}),
+                         k.user.score._build_uri({'kloutId': 11747}))
+
+        identity = k.endpoint('identity.klout')
+        self.assertEqual(
+            identity._build_uri({'screenName': 'erfaan'}),
+            ('v2/identity.json/twitter?screenName=erfaan&key=KEY',
+             'https://api.klout.com/v2/identity.json/twitter'
+             '?screenName=erfaan&key=KEY',
+             'v2/identity.json/twitter?screenName=erfaan'))
+        self.assertEqual(
+            k.endpoint('identity.gp')._build_uri({'klout': 11747})[0],
+            'v2/identity.json/klout/11747/gp?key=KEY')
+
 
 class TestKloutIdentity(KloutBaseTest):
     """
@@ -173,6 +206,23 @@ class TestTimeout(KloutBaseTest):
             result = k.user.score(kloutId=11747, timeout=0.001)
         time.sleep(1)
 
+    def test_timeout_settings(self):
+        """
+        Tests separate connect, read and total timeouts which don't
+        change the default socket timeout
+        """
+        k = Klout(self.key, timeout=Timeout(connect=10, read=0.001))
+        with self.assertRaises(KloutHTTPError):
+            k.user.score(kloutId=11747)
+
+        result = k.user.score(kloutId=11747, timeout=Timeout(total=60))
+        self.assertIn('score', result)
+
+        with self.assertRaises(KloutHTTPError):
+            k.user.score(kloutId=11747, timeout=Timeout(total=0.001))
+        self.assertIsNone(socket.getdefaulttimeout())
+        time.sleep(1)
+
 
 class TestSecure(KloutBaseTest):
     """
@@ -188,5 +238,77 @@ class TestSecure(KloutBaseTest):
         time.sleep(1)
 
 
+class TestPool(KloutBaseTest):
+    """
+    Tests sharing keep-alive connections between calls
+    """
+    def test_pool_reuses_connection(self):
+        """
+        Tests that consecutive calls reuse a pooled connection
+        """
+        k = Klout(self.key, pool=ConnectionPool(maxsize=2))
+        result = k.identity.klout(screenName='erfaan')
+        self.assertIn('id', result)
+        result = k.user.score(kloutId=result['id'])
+        self.assertIn('score', result)
+
+        stats = k.pool.stats()
+        self.assertEqual(stats['requests'], 2)
+        self.assertEqual(stats['created'], 1)
+        self.assertEqual(stats['reused'], 1)
+        self.assertLessEqual(stats['open'], 2)
+        time.sleep(1)
+
+
+class TestMany(KloutBaseTest):
+    """
+    Tests making many calls in parallel
+    """
+    def test_many(self):
+        """
+        Tests that results are yielded in input order with errors inline
+        """
+        k = Klout(self.key)
+        params = [{'kloutId': 11747}, {'kloutId': '11747'},
+                  {'kloutId': 11747, 'timeout': 0.001}]
+        results = list(k.user.score.many(params, concurrency=2))
+        self.assertEqual([kwargs for kwargs, _ in results], params)
+        self.assertIn('score', results[0][1])
+        self.assertIn('score', results[1][1])
+        self.assertIsInstance(results[2][1], KloutHTTPError)
+        time.sleep(1)
+
+
+@unittest2.skipIf(AsyncKlout is None, "asyncio is not available")
+class TestAsync(KloutBaseTest):
+    """
+    Tests calling Klout API with asyncio
+    """
+    def test_async_score(self):
+        """
+        Tests that concurrent calls share the pooled connections
+        """
+        k = AsyncKlout(self.key, concurrency=2)
+        loop = asyncio.new_event_loop()
+        try:
+            results = loop.run_until_complete(asyncio.gather(
+                k.user.score(kloutId=11747),
+                k.user.score(kloutId='11747'),
+                k.user.score(kloutId=11747)))
+            for result in results:
+                self.assertIn('score', result)
+
+            with self.assertRaises(KloutHTTPError):
+                loop.run_until_complete(
+                    k.user.score(kloutId=11747, timeout=0.001))
+
+            stats = k.pool.stats()
+            self.assertLessEqual(stats['created'], 3)
+            loop.run_until_complete(k.close())
+        finally:
+            loop.close()
+        time.sleep(1)
+
+
 if __name__ == '__main__':
     unittest2.main()
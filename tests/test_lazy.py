@@ -0,0 +1,101 @@
+"""
+Unit tests for lazy results
+"""
+import json
+import unittest2
+
+from klout import Klout
+from klout.lazy import Identity, LazyObject, Score
+from klout.testing import FakeKloutServer
+
+
+class TestLazyObject(unittest2.TestCase):
+    """
+    Tests decoding members on demand
+    """
+    def test_lookup(self):
+        """
+        Tests lookups only decode the members they need
+        """
+        data = {'first': 1, 'nested': {'a': [1, 2, {'b': None}]},
+                'text': '"quoted" ,} text', 'last': [True, False]}
+        lazy = LazyObject(json.dumps(data, indent=1))
+        first_key = json.loads(lazy.raw, object_pairs_hook=list)[0][0]
+        self.assertEqual(lazy[first_key], data[first_key])
+        self.assertEqual(len(lazy._state[1]), 1)
+
+        self.assertEqual(lazy.get('text'), data['text'])
+        self.assertEqual(lazy.get('missing', 'default'), 'default')
+        self.assertNotIn('missing', lazy)
+        self.assertEqual(sorted(lazy), sorted(data))
+        self.assertEqual(len(lazy), 4)
+        self.assertEqual(lazy, data)
+        self.assertEqual(dict(lazy.items()), data)
+
+    def test_empty(self):
+        """
+        Tests empty objects and documents which aren't objects
+        """
+        self.assertEqual(LazyObject(' { } '), {})
+        with self.assertRaises(KeyError):
+            LazyObject('{}')['key']
+        with self.assertRaises(ValueError):
+            LazyObject('[1, 2]')
+
+
+class TestRecords(unittest2.TestCase):
+    """
+    Tests records of known shapes
+    """
+    def test_score(self):
+        """
+        Tests a score record behaves like the decoded dict
+        """
+        data = {'score': 50.5,
+                'scoreDelta': {'dayChange': 0.5, 'monthChange': -1.0}}
+        score = Score.from_dict(data)
+        self.assertEqual(score.score, 50.5)
+        self.assertEqual(score['scoreDelta'].dayChange, 0.5)
+        self.assertEqual(score.get('scoreDelta').get('monthChange'), -1.0)
+        self.assertEqual(score, data)
+        with self.assertRaises(AttributeError):
+            score.score = 10
+        with self.assertRaises(KeyError):
+            score['missing']
+
+    def test_shape(self):
+        """
+        Tests objects of another shape don't make records
+        """
+        self.assertIsNone(Identity.from_dict({'id': '1'}))
+        self.assertIsNone(Identity.from_dict({'id': '1', 'other': 2}))
+        self.assertIsNone(Score.from_dict({'score': 1, 'scoreDelta': {}}))
+
+
+class TestLazyKlout(unittest2.TestCase):
+    """
+    Tests lazy calls against the fake Klout server
+    """
+    def test_calls(self):
+        """
+        Tests lazy results equal the decoded ones
+        """
+        with FakeKloutServer() as server:
+            k = Klout('TEST_KEY', domain=server.domain)
+            lazy = Klout('TEST_KEY', domain=server.domain, lazy=True)
+
+            identity = lazy.identity.klout(screenName="erfaan")
+            self.assertIsInstance(identity, Identity)
+            self.assertEqual(identity, k.identity.klout(screenName="erfaan"))
+
+            score = lazy.user.score(kloutId=identity.id)
+            self.assertIsInstance(score, Score)
+            self.assertEqual(score, k.user.score(kloutId=identity.id))
+
+            influence = lazy.user.influence(kloutId=identity.id)
+            self.assertIsInstance(influence, LazyObject)
+            self.assertEqual(influence,
+                             k.user.influence(kloutId=identity.id))
+
+            self.assertEqual(lazy.user.topics(kloutId=identity.id),
+                             k.user.topics(kloutId=identity.id))
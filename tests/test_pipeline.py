@@ -0,0 +1,74 @@
+"""
+Unit tests for streaming pipelines, run against the fake Klout server
+"""
+import itertools
+import unittest2
+
+from klout import Klout, KloutHTTPError
+from klout.testing import FakeKloutServer, klout_id
+
+
+class TestPipeline(unittest2.TestCase):
+    """
+    Tests resolving and fetching feeds of identities
+    """
+    def setUp(self):
+        self.server = FakeKloutServer().start()
+        self.k = Klout('TEST_KEY', domain=self.server.domain)
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_resolve_and_fetch(self):
+        """
+        Tests every input comes out with its results
+        """
+        feed = ['erfaan\n', '\n', {'tw': '11158872'}, '  user2 ']
+        records = list(self.k.pipeline(feed, concurrency=2, ordered=True)
+                       .resolve_identity()
+                       .fetch('user.score', 'user.topics'))
+
+        self.assertEqual([record['input'] for record in records],
+                         ['erfaan', {'tw': '11158872'}, 'user2'])
+        self.assertEqual(records[0]['kloutId'],
+                         klout_id('twitter', 'erfaan'))
+        self.assertEqual(records[1]['kloutId'], klout_id('tw', '11158872'))
+        for record in records:
+            self.assertEqual(record['user.score'],
+                             self.k.user.score(kloutId=record['kloutId']))
+            self.assertEqual(len(record['user.topics']), 5)
+
+    def test_errors(self):
+        """
+        Tests failed records skip the next stages but are yielded
+        """
+        seen = []
+        records = list(self.k.pipeline(['11747', '635263'])
+                       .fetch('user.missing')
+                       .map(seen.append))
+        self.assertEqual(len(records), 2)
+        for record in records:
+            self.assertIsInstance(record['error'], KloutHTTPError)
+        self.assertEqual(seen, [])
+
+    def test_backpressure(self):
+        """
+        Tests an endless feed is only read as far as needed
+        """
+        read = []
+
+        def feed():
+            """
+            Endless feed of kloutIds
+            """
+            for i in itertools.count():
+                read.append(i)
+                yield str(i)
+
+        results = self.k.pipeline(feed(), concurrency=2, window=4) \
+            .fetch('user.score').map(lambda record: None).results()
+        records = list(itertools.islice(results, 10))
+        self.assertEqual(len(records), 10)
+        # Each stage holds at most its window
+        self.assertLessEqual(len(read), 10 + 4 + 4 + 1)
+        results.close()
@@ -0,0 +1,48 @@
+"""
+Unit tests for fetching the parts of a profile at the same time
+"""
+import time
+import unittest2
+
+from klout import Klout, ConnectionPool, KloutHTTPError
+from klout.testing import FakeKloutServer, klout_id
+
+
+class TestProfile(unittest2.TestCase):
+    """
+    Tests profiles against the fake Klout server
+    """
+    def setUp(self):
+        self.server = FakeKloutServer(latency=0.2).start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_concurrent(self):
+        """
+        Tests the parts are fetched at the same time
+        """
+        pool = ConnectionPool()
+        k = Klout('TEST_KEY', domain=self.server.domain, transport=pool)
+        started = time.time()
+        profile = k.profile(screenName='erfaan')
+        elapsed = time.time() - started
+        pool.close()
+
+        # identity, then the three parts at once
+        self.assertTrue(elapsed < 0.2 * 3, elapsed)
+        self.assertEqual(profile['kloutId'], klout_id('twitter', 'erfaan'))
+        self.assertIn('score', profile['score'])
+        self.assertEqual(profile['influence']['myInfluencersCount'], 10)
+        self.assertEqual(len(profile['topics']), 5)
+        self.assertEqual(profile['errors'], {})
+
+    def test_errors(self):
+        """
+        Tests a failed part doesn't fail the others
+        """
+        k = Klout('TEST_KEY', domain=self.server.domain)
+        profile = k.profile(kloutId='11747', parts=['score', 'missing'])
+        self.assertIn('score', profile['score'])
+        self.assertNotIn('missing', profile)
+        self.assertIsInstance(profile['errors']['missing'], KloutHTTPError)
@@ -0,0 +1,95 @@
+"""
+Unit tests for client side rate limiting
+"""
+import time
+import unittest2
+
+from klout import RateLimiter
+from klout.ratelimit import DailyQuota
+
+
+class TestRateLimiter(unittest2.TestCase):
+    """
+    Tests the token bucket rate limiter
+    """
+    def test_burst_then_rate(self):
+        """
+        Tests that calls beyond the burst are spaced out
+        """
+        limiter = RateLimiter(per_second=100, burst=2)
+        self.assertEqual(limiter.reserve(), 0)
+        self.assertEqual(limiter.reserve(), 0)
+        wait = limiter.reserve()
+        self.assertGreater(wait, 0)
+        self.assertLessEqual(wait, 0.01)
+
+        stats = limiter.stats()
+        self.assertEqual(stats['calls'], 3)
+        self.assertEqual(stats['delayed'], 1)
+
+    def test_max_wait(self):
+        """
+        Tests that calls which would wait too long are rejected
+        """
+        limiter = RateLimiter(per_second=1, per_day=2, max_wait=0.5)
+        self.assertTrue(limiter.acquire())
+        self.assertFalse(limiter.acquire())
+        self.assertIsNone(limiter.reserve(max_wait=10))
+        self.assertEqual(limiter.stats()['rejected'], 2)
+
+    def test_acquire_blocks(self):
+        """
+        Tests that acquire sleeps until a call is allowed
+        """
+        limiter = RateLimiter(per_second=20, burst=1)
+        started = time.time()
+        for _ in range(3):
+            self.assertTrue(limiter.acquire())
+        self.assertGreaterEqual(time.time() - started, 0.09)
+
+
+class TestDailyQuota(unittest2.TestCase):
+    """
+    Tests the calendar day quota
+    """
+    def test_calendar_day(self):
+        """
+        Tests the quota is reset at midnight UTC, not refilled over time
+        """
+        quota = DailyQuota(2)
+        now = 100 * 86400 + 3600
+        self.assertEqual(quota.take(now), 0)
+        self.assertEqual(quota.take(now), 0)
+        self.assertEqual(quota.take(now + 3600), 101 * 86400 - now - 3600)
+        quota.give_back()
+        # Time alone doesn't give calls back within the day
+        self.assertGreater(quota.take(now + 80000), 0)
+        quota.give_back()
+        # The next day has its full quota
+        self.assertEqual(quota.take(101 * 86400), 0)
+        self.assertEqual(quota.take(101 * 86400 + 1), 0)
+        self.assertGreater(quota.take(101 * 86400 + 2), 0)
+
+    def test_reserved_ahead(self):
+        """
+        Tests calls reserved for the next day count against its quota
+        """
+        quota = DailyQuota(1)
+        now = 100 * 86400 + 50000
+        self.assertEqual(quota.take(now), 0)
+        self.assertEqual(quota.take(now), 101 * 86400 - now)
+        self.assertEqual(quota.take(now), 102 * 86400 - now)
+        self.assertEqual(quota.take(101 * 86400), 2 * 86400)
+
+    def test_limiter(self):
+        """
+        Tests the limiter rejects calls beyond the daily quota
+        """
+        limiter = RateLimiter(per_day=3, max_wait=1)
+        for _ in range(3):
+            self.assertTrue(limiter.acquire())
+        self.assertFalse(limiter.acquire())
+
+
+if __name__ == '__main__':
+    unittest2.main()
@@ -0,0 +1,65 @@
+"""
+Unit tests for the retry policy
+"""
+import unittest2
+
+try:
+    import urllib.error as urllib_error
+except ImportError:
+    import urllib2 as urllib_error
+
+from klout import Retry
+
+
+def http_error(code, headers=None):
+    """
+    Returns an HTTPError with status `code`
+    """
+    return urllib_error.HTTPError('http://api.klout.com/v2/user.json',
+                                  code, 'error', headers or {}, None)
+
+
+class TestRetry(unittest2.TestCase):
+    """
+    Tests the retry policy
+    """
+    def test_exponential_backoff(self):
+        """
+        Tests that delays double up to max_backoff
+        """
+        retry = Retry(total=5, backoff=1, max_backoff=5, jitter=False)
+        error = http_error(503)
+        self.assertEqual([retry.delay(n, error) for n in range(1, 7)],
+                         [1, 2, 4, 5, 5, None])
+
+        retry = Retry(backoff=1)
+        for _ in range(20):
+            self.assertLessEqual(retry.delay(2, error), 2)
+
+    def test_retryable(self):
+        """
+        Tests which errors are retried
+        """
+        retry = Retry()
+        self.assertIsNotNone(retry.delay(1, http_error(503)))
+        self.assertIsNotNone(retry.delay(1, http_error(429)))
+        self.assertIsNone(retry.delay(1, http_error(404)))
+        self.assertIsNotNone(retry.delay(1, urllib_error.URLError('reset')))
+        retry = Retry(connection_errors=False)
+        self.assertIsNone(retry.delay(1, urllib_error.URLError('reset')))
+
+    def test_retry_after(self):
+        """
+        Tests that Retry-After is honoured
+        """
+        retry = Retry(max_backoff=10)
+        self.assertEqual(
+            retry.delay(1, http_error(429, {'Retry-After': '7'})), 7)
+        self.assertIsNone(
+            retry.delay(1, http_error(429, {'Retry-After': '3600'})))
+        self.assertEqual(retry.delay(1, http_error(
+            503, {'Retry-After': 'Wed, 21 Oct 2015 07:28:00 GMT'})), 0)
+
+
+if __name__ == '__main__':
+    unittest2.main()
@@ -0,0 +1,84 @@
+"""
+Unit tests for request coalescing
+"""
+import socket
+import threading
+import time
+import unittest2
+
+from klout import SingleFlight
+
+
+class TestSingleFlight(unittest2.TestCase):
+    """
+    Tests sharing one call between threads
+    """
+    def test_coalesce(self):
+        """
+        Tests that concurrent calls with the same key run func once
+        """
+        flights = SingleFlight()
+        calls = []
+        results = []
+
+        def func():
+            """
+            Slow call
+            """
+            calls.append(1)
+            time.sleep(0.1)
+            return {'score': 50.0}
+
+        threads = [threading.Thread(
+            target=lambda: results.append(flights.do('key', func)))
+                   for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len(results), 5)
+        for result in results:
+            self.assertIs(result, results[0])
+        self.assertEqual(flights.stats(), {'calls': 5, 'coalesced': 4})
+
+        # Nothing in flight anymore, a new call runs func again
+        flights.do('key', func)
+        self.assertEqual(len(calls), 2)
+
+    def test_errors_and_timeout(self):
+        """
+        Tests that errors are shared and waiting calls can time out
+        """
+        flights = SingleFlight()
+        errors = []
+
+        def func():
+            """
+            Slow failing call
+            """
+            time.sleep(0.1)
+            raise ValueError('boom')
+
+        def call():
+            """
+            Call and record the error
+            """
+            try:
+                flights.do('key', func)
+            except ValueError:
+                errors.append(1)
+
+        thread = threading.Thread(target=call)
+        thread.start()
+        time.sleep(0.02)
+        with self.assertRaises(socket.timeout):
+            flights.do('key', func, timeout=0.01)
+        call()
+        thread.join()
+        self.assertEqual(len(errors), 2)
+
+
+if __name__ == '__main__':
+    unittest2.main()
@@ -0,0 +1,106 @@
+"""
+Unit tests for the score time series store
+"""
+from __future__ import with_statement
+import os
+import shutil
+import tempfile
+import unittest2
+
+from klout.lazy import Score
+from klout.store import ScoreStore, numpy
+
+
+def snapshot(score, day, month=0.0):
+    """
+    Returns a `user.score` result
+    """
+    return {'score': score,
+            'scoreDelta': {'dayChange': day, 'monthChange': month}}
+
+
+class TestScoreStore(unittest2.TestCase):
+    """
+    Tests the pure Python store
+    """
+    use_numpy = False
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.store = ScoreStore(self.directory, use_numpy=self.use_numpy)
+        # Two days of snapshots of three users
+        self.store.extend([('1', snapshot(40.0, 0.5), 1000),
+                           ('2', snapshot(60.0, -1.25), 1000),
+                           ('3', snapshot(80.0, 2.0), 1000)])
+        self.store.extend([('1', snapshot(42.0, 2.0, 4.5)),
+                           ('2', snapshot(50.0, -10.0)),
+                           ('3', snapshot(81.0, 1.0))], timestamp=2000)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_append(self):
+        """
+        Tests snapshots are stored, lazy results included
+        """
+        self.assertEqual(len(self.store), 6)
+        self.store.append(11747, Score.from_dict(snapshot(55.5, 0.25)),
+                          3000)
+        self.assertEqual(len(ScoreStore(self.directory)), 7)
+        self.assertEqual(list(self.store.history('11747')['score']), [55.5])
+        self.assertEqual(os.path.getsize(
+            os.path.join(self.directory, 'score.col')), 7 * 8)
+
+    def test_history(self):
+        """
+        Tests the snapshots of a user are returned in time order
+        """
+        self.store.append('1', snapshot(41.0, -1.0), 1500)
+        history = self.store.history('1')
+        self.assertEqual(list(history['timestamp']), [1000, 1500, 2000])
+        self.assertEqual(list(history['score']), [40.0, 41.0, 42.0])
+        self.assertEqual(list(history['monthChange']), [0.0, 0.0, 4.5])
+        self.assertEqual(list(self.store.history('4')['score']), [])
+
+    def test_percentiles(self):
+        """
+        Tests percentiles over the latest snapshots, or all of them
+        """
+        self.assertEqual(self.store.percentiles((0, 50, 100)),
+                         [42.0, 50.0, 81.0])
+        self.assertEqual(self.store.percentiles((25,), latest=False),
+                         [44.0])
+        self.assertEqual(self.store.percentiles((50,), end=2000),
+                         [60.0])
+        self.assertEqual(self.store.percentiles((50,), start=3000), [None])
+
+    def test_top_movers(self):
+        """
+        Tests gainers and losers of the latest snapshots
+        """
+        self.assertEqual(self.store.top_movers(2), [(1, 2.0), (3, 1.0)])
+        self.assertEqual(self.store.top_movers(1, losers=True),
+                         [(2, -10.0)])
+        self.assertEqual(self.store.top_movers(5, end=2000),
+                         [(3, 2.0), (1, 0.5), (2, -1.25)])
+        self.assertEqual(self.store.top_movers(1, by='monthChange'),
+                         [(1, 4.5)])
+
+    def test_repair(self):
+        """
+        Tests a partly written snapshot is dropped
+        """
+        with open(os.path.join(self.directory, 'kloutId.col'), 'ab') as handle:
+            handle.write(b'\x01\x02\x03\x04\x05\x06\x07\x08\x09')
+        store = ScoreStore(self.directory, use_numpy=self.use_numpy)
+        self.assertEqual(len(store), 6)
+        store.append('4', snapshot(10.0, 0.0), 3000)
+        self.assertEqual(list(store.history('4')['score']), [10.0])
+
+
+@unittest2.skipIf(numpy is None, "NumPy is not installed")
+class TestNumpyScoreStore(TestScoreStore):
+    """
+    Tests the NumPy store
+    """
+    use_numpy = True
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for incremental decoding of Klout API responses
+"""
+import gzip
+import io
+import json
+import unittest2
+
+from klout.stream import decode, iter_body, iter_items
+
+
+class FakeResponse(object):
+    """
+    Minimal response object with a gzip encoded body
+    """
+    def __init__(self, data):
+        buf = io.BytesIO()
+        zip_file = gzip.GzipFile(fileobj=buf, mode='wb')
+        zip_file.write(json.dumps(data).encode('utf8'))
+        zip_file.close()
+        self.body = io.BytesIO(buf.getvalue())
+
+    def info(self):
+        """
+        Response headers
+        """
+        return {'Content-Encoding': 'gzip'}
+
+    def read(self, amt=None):
+        """
+        Read the response body
+        """
+        return self.body.read(amt)
+
+
+INFLUENCE = {
+    'myInfluencersCount': 2,
+    'myInfluencers': [{'entity': {'id': '1', 'payload': {'nick': u'é'}}},
+                      {'entity': {'id': '2', 'payload': {'score': 12.5}}}],
+    'myInfluencees': [10, 200, 3000],
+}
+
+
+class TestStream(unittest2.TestCase):
+    """
+    Tests decoding responses in chunks
+    """
+    def test_decode(self):
+        """
+        Tests that gzip bodies are decompressed in chunks
+        """
+        self.assertEqual(decode(FakeResponse(INFLUENCE), chunk_size=7),
+                         INFLUENCE)
+
+    def test_iter_items(self):
+        """
+        Tests that list members are yielded one by one
+        """
+        for field in INFLUENCE:
+            if not isinstance(INFLUENCE[field], list):
+                continue
+            chunks = iter_body(FakeResponse(INFLUENCE), chunk_size=3)
+            self.assertEqual(list(iter_items(chunks, field)),
+                             INFLUENCE[field])
+
+        chunks = iter_body(FakeResponse(INFLUENCE))
+        self.assertEqual(list(iter_items(chunks, 'missing')), [])
+
+        chunks = iter_body(FakeResponse([{'id': 1}, {'id': 2}]))
+        self.assertEqual(list(iter_items(chunks)), [{'id': 1}, {'id': 2}])
+
+    def test_split_numbers(self):
+        """
+        Tests that numbers cut across chunks are decoded whole
+        """
+        for chunks in ([b'[3.', b'25]'], [b'[3', b'.25]'], [b'[3.2', b'5]'],
+                       [b'[1e', b'2, -', b'4]'], [b'[12', b'3', b'4]']):
+            self.assertEqual(list(iter_items(chunks)),
+                             json.loads(b''.join(chunks).decode('utf8')))
+
+
+if __name__ == '__main__':
+    unittest2.main()
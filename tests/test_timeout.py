@@ -0,0 +1,80 @@
+"""
+Unit tests for timeouts, run against a slow fake Klout server
+"""
+import threading
+import time
+import unittest2
+
+from klout import Klout, ConnectionPool, KloutHTTPError, Timeout
+from klout.testing import FakeKloutServer
+
+
+class TestTimeout(unittest2.TestCase):
+    """
+    Tests connect, read and total timeouts with each transport
+    """
+    def setUp(self):
+        self.server = FakeKloutServer(latency=0.5).start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def check_timeout(self, timeout, pool=None):
+        """
+        Checks a call with `timeout` fails well before the server answers
+        """
+        k = Klout('TEST_KEY', domain=self.server.domain, transport=pool)
+        started = time.time()
+        with self.assertRaises(KloutHTTPError):
+            k.user.score(kloutId='11747', timeout=timeout)
+        self.assertTrue(time.time() - started < 0.4)
+
+    def test_read(self):
+        """
+        Tests the read timeout
+        """
+        self.check_timeout(Timeout(read=0.1))
+        self.check_timeout(Timeout(read=0.1), ConnectionPool())
+
+    def test_number(self):
+        """
+        Tests a number is both the connect and the read timeout
+        """
+        self.check_timeout(0.1)
+        self.check_timeout(0.1, ConnectionPool())
+
+    def test_total(self):
+        """
+        Tests the deadline of the whole call
+        """
+        self.check_timeout(Timeout(read=5, total=0.2))
+        self.check_timeout(Timeout(read=5, total=0.2), ConnectionPool())
+
+    def test_connect(self):
+        """
+        Tests the connect timeout doesn't apply to reads
+        """
+        self.server.latency = 0.2
+        for pool in (None, ConnectionPool()):
+            k = Klout('TEST_KEY', domain=self.server.domain, transport=pool)
+            self.assertIn('score', k.user.score(
+                kloutId='11747', timeout=Timeout(connect=0.1, read=1)))
+
+    def test_pool_wait(self):
+        """
+        Tests waiting for a free pooled connection is bounded by the
+        deadline
+        """
+        pool = ConnectionPool(maxsize=1)
+        k = Klout('TEST_KEY', domain=self.server.domain, transport=pool)
+        busy = threading.Thread(target=k.user.score,
+                                kwargs={'kloutId': '11747'})
+        busy.start()
+        time.sleep(0.1)
+        started = time.time()
+        with self.assertRaises(KloutHTTPError):
+            k.user.score(kloutId='11747', timeout=Timeout(total=0.2))
+        self.assertTrue(time.time() - started < 0.35)
+        busy.join()
+        self.assertEqual(pool.stats()['created'], 1)
+        pool.close()
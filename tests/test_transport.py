@@ -0,0 +1,118 @@
+"""
+Unit tests for transports, run against the fake Klout server
+"""
+import unittest2
+
+try:
+    import urllib.request as urllib_request
+except ImportError:
+    import urllib2 as urllib_request
+
+from klout import Klout, ConnectionPool, KloutHTTPError, UrllibTransport
+from klout.testing import FakeKloutServer
+
+
+class TestTransport(unittest2.TestCase):
+    """
+    Tests calls made through each transport
+    """
+    def setUp(self):
+        self.server = FakeKloutServer(key='TEST_KEY').start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def check_calls(self, transport):
+        """
+        Makes the calls of a typical session through `transport`
+        """
+        k = Klout('TEST_KEY', domain=self.server.domain, transport=transport)
+        kloutId = k.identity.klout(screenName="erfaan").get('id')
+        self.assertEqual(k.identity.klout(screenName="erfaan").get('id'),
+                         kloutId)
+
+        score = k.user.score(kloutId=kloutId)
+        self.assertIn('score', score)
+        self.assertTrue(10 <= score['score'] < 100)
+
+        influence = k.user.influence(kloutId=kloutId)
+        self.assertEqual(influence['myInfluencersCount'], 10)
+
+        topics = k.user.topics(kloutId=kloutId)
+        self.assertEqual(len(topics), 5)
+
+        with self.assertRaises(KloutHTTPError) as context:
+            k.user.missing(kloutId=kloutId)
+        self.assertEqual(context.exception.errors.code, 404)
+
+        bad = Klout('BAD_KEY', domain=self.server.domain, transport=transport)
+        with self.assertRaises(KloutHTTPError) as context:
+            bad.user.score(kloutId=kloutId)
+        self.assertEqual(context.exception.errors.code, 403)
+
+    def test_urllib(self):
+        """
+        Tests the default transport
+        """
+        self.check_calls(UrllibTransport())
+
+    def test_installed_opener(self):
+        """
+        Tests the default transport goes through the opener installed
+        with `install_opener`, here a proxy to the fake server
+        """
+        # pylint: disable=protected-access
+        installed = urllib_request._opener
+        urllib_request.install_opener(urllib_request.build_opener(
+            urllib_request.ProxyHandler(
+                {'http': 'http://%s' % self.server.domain})))
+        try:
+            k = Klout('TEST_KEY', domain='api.klout.invalid')
+            self.assertIn('score', k.user.score(kloutId='11747'))
+            self.assertEqual(self.server.requests, 1)
+        finally:
+            urllib_request.install_opener(installed)
+        with self.assertRaises(KloutHTTPError):
+            k.user.score(kloutId='11747', timeout=1)
+
+    def test_pool(self):
+        """
+        Tests the pooled transport reuses its connection
+        """
+        pool = ConnectionPool()
+        self.check_calls(pool)
+        self.assertEqual(pool.stats()['created'], 1)
+        pool.close()
+
+    def test_errors(self):
+        """
+        Tests injected errors
+        """
+        self.server.error_rate = 1
+        k = Klout('TEST_KEY', domain=self.server.domain)
+        with self.assertRaises(KloutHTTPError) as context:
+            k.user.score(kloutId='11747')
+        self.assertEqual(context.exception.errors.code, 503)
+
+    def test_pool_errors(self):
+        """
+        Tests HTTP errors through the pool carry a readable response
+        """
+        self.server.error_rate = 1
+        pool = ConnectionPool()
+        k = Klout('TEST_KEY', domain=self.server.domain, transport=pool)
+        with self.assertRaises(KloutHTTPError) as context:
+            k.user.score(kloutId='11747')
+        errors = context.exception.errors
+        self.assertEqual(errors.code, 503)
+        self.assertIn(b'Service Unavailable', errors.readline())
+        pool.close()
+
+    def test_gzip(self):
+        """
+        Tests compressed and uncompressed responses decode the same
+        """
+        k = Klout('TEST_KEY', domain=self.server.domain)
+        compressed = k.user.influence(kloutId='11747')
+        self.server.gzip = False
+        self.assertEqual(k.user.influence(kloutId='11747'), compressed)